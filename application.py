@@ -1,52 +1,212 @@
-from flask  import Flask, render_template , request
-import joblib
+from flask  import Flask, render_template , request, jsonify, g, Response
+import time
+import numpy as np
 from config.paths_config import *
+from config.serving_config import SERVING_CONFIG
+from src.micro_batcher import MicroBatcher
+from src.prediction_cache import PredictionCache
+from src.model_reloader import ModelReloader
+from src.logger import get_logger
+from src.metrics import MetricsRegistry, CONTENT_TYPE, BATCH_SIZE_BUCKETS
+from utils.helpers import INPUT_FIELDS, records_to_columns, build_feature_row, build_feature_matrix
 
 app = Flask(__name__)
 
-model = joblib.load(MODEL_SAVE_PATH)
+## one line per served prediction, rate limited in config/logging_config.py
+prediction_logger = get_logger("predictions")
 
-@app.route("/" , methods = ["GET" , "POST"])
-def home():
-    if request.method=="POST":
-        try:
+## request / model telemetry for GET /metrics
+metrics = MetricsRegistry(SERVING_CONFIG["metrics_multiprocess_dir"], flush_interval = SERVING_CONFIG["metrics_flush_interval"])
+REQUEST_LATENCY = metrics.histogram("airline_request_latency_seconds", "Time spent handling a request", ["endpoint", "method", "status"])
+PREDICT_LATENCY = metrics.histogram("airline_predict_latency_seconds", "Time spent in the model call", ["path"])
+BATCH_SIZE = metrics.histogram("airline_batch_size_rows", "Rows scored per model call", ["source"], buckets = BATCH_SIZE_BUCKETS)
+ERRORS = metrics.counter("airline_errors", "Requests that ended in an error", ["endpoint"])
+PREDICTIONS = metrics.counter("airline_predictions", "Predictions served, by predicted class", ["endpoint", "prediction"])
+CACHE_LOOKUPS = metrics.counter("airline_prediction_cache_lookups", "Prediction cache lookups", ["result"])
+MODEL_RELOADS = metrics.counter("airline_model_reloads", "Model hot reloads", ["result"])
+
+## the model, its array-compiled copy (None if missing or stale) and the fitted preprocessor (None for
+## older models) live in one bundle; new versions are validated on the canary batch and swapped in whole
+def on_model_swap(previous, bundle):
+    MODEL_RELOADS.labels("ok").inc()
+    if cache is not None:
+        cache.clear()
+
+reloader = ModelReloader(
+    MODEL_SAVE_PATH,
+    COMPILED_MODEL_PATH,
+    PREPROCESSOR_PATH,
+    CANARY_BATCH_PATH,
+    check_interval = SERVING_CONFIG["model_reload_interval"],
+    on_swap = on_model_swap,
+    on_failure = lambda error : MODEL_RELOADS.labels("failed").inc()
+)
+
+## optional: queue concurrent form rows and score them as one batch
+batcher = None
+if SERVING_CONFIG["micro_batching"]:
+    def observe_micro_batch(rows, seconds):
+        BATCH_SIZE.labels("micro_batcher").observe(rows)
+        PREDICT_LATENCY.labels("micro_batch").observe(seconds)
 
-            departure_delay = float(request.form["Departure Delay"])
-            arrival_delay = float(request.form["Arrival Delay"])
+    ## always the current model; a batch that straddles a swap is scored by the new one
+    batcher = MicroBatcher(lambda rows : reloader.bundle.model.predict(rows), max_batch_size = SERVING_CONFIG["max_batch_size"], max_wait_ms = SERVING_CONFIG["max_wait_ms"], on_flush = observe_micro_batch,
+                           timeout = SERVING_CONFIG["micro_batch_timeout"])
 
-            flight_distance = float(request.form["Flight Distance"])
+## optional: LRU cache of form predictions, emptied when the model file changes
+## (keys carry the model checksum too, so a request finishing after a swap cannot leave a stale entry)
+cache = None
+if SERVING_CONFIG["prediction_cache"]:
+    cache = PredictionCache(
+        MODEL_SAVE_PATH,
+        max_entries = SERVING_CONFIG["cache_max_entries"],
+        delay_ratio_decimals = SERVING_CONFIG["cache_delay_ratio_decimals"],
+        distance_step = SERVING_CONFIG["cache_distance_step"]
+    )
 
-            delay_ratio = (departure_delay+arrival_delay) / (flight_distance+1)
+## children resolved once so the request path skips the label lookup
+ROW_PREDICT_LATENCY = {path : PREDICT_LATENCY.labels(path) for path in ("micro_batcher", "compiled", "lightgbm")}
+CACHE_HIT, CACHE_MISS = CACHE_LOOKUPS.labels("hit"), CACHE_LOOKUPS.labels("miss")
 
+def predict_row(data, bundle = None):
+    bundle = bundle or reloader.bundle
+    start = time.perf_counter()
+    if batcher is not None:
+        output, path = batcher.predict(data), "micro_batcher"
+    elif bundle.compiled_model is not None:
+        output, path = bundle.compiled_model.predict_one(data), "compiled"
+    else:
+        output, path = bundle.model.predict([data])[0], "lightgbm"
+    ROW_PREDICT_LATENCY[path].observe(time.perf_counter() - start)
+    return output
 
+@app.before_request
+def start_timer():
+    metrics.start()
+    reloader.start()
+    g.request_started = time.perf_counter()
 
-            data = [
-                int(request.form["Online Boarding"]),
-                delay_ratio,
-                int(request.form["Inflight wifi service"]),
-                int(request.form["Class"]),
-                int(request.form["Type of Travel"]),
-                int(request.form["Inflight entertainment"]),
-                flight_distance,
-                int(request.form["Seat comfort"]),
-                int(request.form["Leg room service"]),
-                int(request.form["On-board service"]),
-                int(request.form["Cleanliness"]),
-                int(request.form["Ease of Online Booking"]),
-            ]
+@app.after_request
+def record_request(response):
+    started = g.get("request_started")
+    if started is not None:
+        REQUEST_LATENCY.labels(request.endpoint or "unknown", request.method, response.status_code).observe(time.perf_counter() - started)
+    if response.status_code >= 400:
+        ERRORS.labels(request.endpoint or "unknown").inc()
+    return response
 
+@app.route("/" , methods = ["GET" , "POST"])
+def home():
+    if request.method=="POST":
+        try:
+            ## one model version for the whole request, even if a reload swaps it meanwhile
+            bundle = reloader.bundle
 
-            prediction = model.predict([data])
-            output = prediction[0]
-            print(output)
+            values = {field : request.form[field] for field in INPUT_FIELDS}
+            if bundle.preprocessor is not None:
+                values = bundle.preprocessor.transform_row(values)
+
+            data = build_feature_row(values)
+
+            if cache is not None:
+                key = bundle.cache_tag + cache.key(data)
+                output = cache.get(key)
+                if output is None:
+                    CACHE_MISS.inc()
+                    output = predict_row(data, bundle)
+                    cache.put(key, output)
+                else:
+                    CACHE_HIT.inc()
+            else:
+                output = predict_row(data, bundle)
+            PREDICTIONS.labels("home", output).inc()
+            prediction_logger.info("prediction : %s", output)
 
             return render_template("index.html" , prediction = output )
         
         except Exception as e:
+            ## the page still renders with a 200, so count the failure here
+            ERRORS.labels("home").inc()
             return render_template("index.html" , error = str(e))
         
 
     return render_template("index.html", prediction=None, error=None)
 
+@app.route("/predict/batch", methods = ["POST"])
+def predict_batch():
+    ## accepts {"records": [{field: value, ...}, ...]} or {"columns": {field: [values, ...]}}
+    try:
+        bundle = reloader.bundle
+        payload = request.get_json(force=True)
+
+        if "columns" in payload:
+            columns = payload["columns"]
+        else:
+            columns = records_to_columns(payload["records"])
+
+        if bundle.preprocessor is not None:
+            columns = bundle.preprocessor.transform_columns(columns)
+
+        X = build_feature_matrix(columns)
+
+        start = time.perf_counter()
+        probabilities = bundle.model.predict_proba(X)
+        PREDICT_LATENCY.labels("batch").observe(time.perf_counter() - start)
+        BATCH_SIZE.labels("predict_batch").observe(X.shape[0])
+
+        predictions = bundle.model.classes_[probabilities.argmax(axis=1)]
+        for label, count in zip(*np.unique(predictions, return_counts=True)):
+            PREDICTIONS.labels("predict_batch", label).inc(int(count))
+
+        return jsonify({
+            "count" : int(X.shape[0]),
+            "predictions" : predictions.tolist(),
+            "probabilities" : probabilities[:, 1].tolist()
+        })
+
+    except KeyError as e:
+        return jsonify({"error" : f"missing field: {e}"}), 400
+
+    except Exception as e:
+        return jsonify({"error" : str(e)}), 400
+
+@app.route("/batching/stats")
+def batching_stats():
+    if batcher is None:
+        return jsonify({"micro_batching" : False})
+    return jsonify({"micro_batching" : True, **batcher.stats()})
+
+@app.route("/cache/stats")
+def cache_stats():
+    if cache is None:
+        return jsonify({"prediction_cache" : False})
+    return jsonify({"prediction_cache" : True, **cache.stats()})
+
+def is_admin():
+    token = SERVING_CONFIG["admin_token"]
+    if token is None:
+        return request.remote_addr in ("127.0.0.1", "::1")
+    return request.headers.get("X-Admin-Token") == token
+
+@app.route("/admin/reload", methods = ["POST"])
+def admin_reload():
+    ## load, validate and swap in the current model files now; the old model keeps serving until then
+    if not is_admin():
+        return jsonify({"error" : "forbidden"}), 403
+    try:
+        start = time.perf_counter()
+        bundle = reloader.reload()
+        return jsonify({"reloaded" : True, "model_checksum" : bundle.checksum, "seconds" : time.perf_counter() - start})
+    except Exception as e:
+        return jsonify({"reloaded" : False, "error" : str(e), "model_checksum" : reloader.bundle.checksum}), 409
+
+@app.route("/admin/model")
+def admin_model():
+    return jsonify(reloader.stats())
+
+@app.route("/metrics")
+def prometheus_metrics():
+    return Response(metrics.render(), content_type = CONTENT_TYPE)
+
 if __name__=="__main__":
     app.run(host="0.0.0.0", port=5000)
\ No newline at end of file
@@ -0,0 +1,224 @@
+### Serving benchmark for application.py. Drives the Flask app through its test client and through a local WSGI
+### server at several concurrency levels, times each step of a form request and compares single row against
+### batched scoring. Everything runs offline against the model in artifacts/model and is written as JSON.
+
+import argparse
+import json
+import os
+import platform
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from flask import request, render_template
+from werkzeug.serving import make_server
+import application
+from config.paths_config import *
+from src.logger import get_logger, LOG_MODE
+from utils.helpers import INPUT_FIELDS, DELAY_FIELDS, DISTANCE_FIELD, build_feature_row, build_feature_matrix, records_to_columns, file_checksum
+
+logger = get_logger(__name__)
+
+## value ranges of the form fields (Class has 3 codes, Type of Travel 2, ratings 0-5)
+FIELD_CHOICES = {"Class" : 3, "Type of Travel" : 2}
+
+def sample_forms(n, seed=42):
+    ## n reproducible form posts, values as strings like the browser sends them
+    rng = np.random.default_rng(seed)
+    forms = []
+    for _ in range(n):
+        form = {field : str(int(rng.integers(0, 300))) for field in DELAY_FIELDS}
+        form[DISTANCE_FIELD] = str(int(rng.integers(30, 5000)))
+        for field in INPUT_FIELDS:
+            if field not in form:
+                form[field] = str(int(rng.integers(0, FIELD_CHOICES.get(field, 6))))
+        forms.append(form)
+    return forms
+
+def summarize(latencies, seconds):
+    latencies_ms = np.asarray(latencies) * 1000
+    return {
+        "requests" : len(latencies),
+        "p50_ms" : float(np.percentile(latencies_ms, 50)),
+        "p95_ms" : float(np.percentile(latencies_ms, 95)),
+        "p99_ms" : float(np.percentile(latencies_ms, 99)),
+        "mean_ms" : float(latencies_ms.mean()),
+        "requests_per_sec" : len(latencies) / seconds,
+    }
+
+def run_load(make_sender, forms, concurrency):
+    ## each worker thread gets its own sender and works through its share of the forms
+    shares = [forms[i::concurrency] for i in range(concurrency)]
+
+    def worker(share):
+        send = make_sender()
+        latencies = []
+        for form in share:
+            start = time.perf_counter()
+            send(form)
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = [latency for share in pool.map(worker, shares) for latency in share]
+    return summarize(latencies, time.perf_counter() - start)
+
+def bench_test_client(forms, levels):
+    def make_sender():
+        client = application.app.test_client()
+        def send(form):
+            response = client.post("/", data=form)
+            assert response.status_code == 200
+        return send
+
+    return {str(level) : run_load(make_sender, forms, level) for level in levels}
+
+def bench_wsgi(forms, levels):
+    ## werkzeug's threaded server on a free local port, one HTTP request per form
+    server = make_server("127.0.0.1", 0, application.app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_port}/"
+
+    def make_sender():
+        def send(form):
+            with urllib.request.urlopen(url, data=urllib.parse.urlencode(form).encode()) as response:
+                response.read()
+        return send
+
+    try:
+        return {str(level) : run_load(make_sender, forms, level) for level in levels}
+    finally:
+        server.shutdown()
+
+def bench_breakdown(forms):
+    ## the steps of home(), timed one by one inside a request context
+    bundle = application.reloader.bundle
+    steps = {"form_parsing" : [], "feature_building" : [], "predict_row" : [], "model_predict" : [], "log_prediction" : [], "render_template" : []}
+
+    for form in forms:
+        with application.app.test_request_context("/", method="POST", data=form):
+            start = time.perf_counter()
+            values = {field : request.form[field] for field in INPUT_FIELDS}
+            if bundle.preprocessor is not None:
+                values = bundle.preprocessor.transform_row(values)
+            steps["form_parsing"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            data = build_feature_row(values)
+            steps["feature_building"].append(time.perf_counter() - start)
+
+            ## what home() calls (compiled model / micro-batcher when enabled) and the plain LightGBM call
+            start = time.perf_counter()
+            output = application.predict_row(data)
+            steps["predict_row"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            bundle.model.predict([data])
+            steps["model_predict"].append(time.perf_counter() - start)
+
+            ## the rate-limited prediction line and an unsampled one, which is where LOG_MODE shows
+            start = time.perf_counter()
+            application.prediction_logger.info("prediction : %s", output)
+            logger.info(f"benchmark prediction : {output}")
+            steps["log_prediction"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            render_template("index.html", prediction=output)
+            steps["render_template"].append(time.perf_counter() - start)
+
+    return {step : summarize(latencies, sum(latencies)) for step, latencies in steps.items()}
+
+def bench_batching(forms, batch_sizes, min_seconds=0.2):
+    ## per-row cost of one predict_proba call on a batch vs one predict_row call per row
+    bundle = application.reloader.bundle
+    rows = [build_feature_row(bundle.preprocessor.transform_row(form) if bundle.preprocessor is not None else form) for form in forms]
+    client = application.app.test_client()
+    results = {}
+
+    for size in batch_sizes:
+        batch_forms = [forms[i % len(forms)] for i in range(size)]
+        columns = records_to_columns(batch_forms)
+        if bundle.preprocessor is not None:
+            columns = bundle.preprocessor.transform_columns(columns)
+        X = build_feature_matrix(columns)
+
+        calls, start = 0, time.perf_counter()
+        while calls == 0 or time.perf_counter() - start < min_seconds:
+            bundle.model.predict_proba(X)
+            calls += 1
+        batched_seconds = (time.perf_counter() - start) / calls
+
+        start = time.perf_counter()
+        for i in range(size):
+            application.predict_row(rows[i % len(rows)])
+        single_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        response = client.post("/predict/batch", json={"records" : batch_forms})
+        endpoint_seconds = time.perf_counter() - start
+        assert response.status_code == 200
+
+        results[str(size)] = {
+            "batched_ms_per_row" : batched_seconds * 1000 / size,
+            "single_row_ms_per_row" : single_seconds * 1000 / size,
+            "speedup" : single_seconds / batched_seconds,
+            "endpoint_ms" : endpoint_seconds * 1000,
+            "endpoint_rows_per_sec" : size / endpoint_seconds,
+        }
+    return results
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the Flask serving path")
+    parser.add_argument("--requests", type=int, default=500, help="form posts per concurrency level")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma separated concurrency levels")
+    parser.add_argument("--batch-sizes", default="1,8,64,512,4096")
+    parser.add_argument("--cache", action="store_true", help="keep the prediction cache on (off by default so the model is measured)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help=f"JSON file, default {BENCHMARK_DIR}/serving_<model checksum>.json")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    levels = [int(level) for level in args.concurrency.split(",")]
+    batch_sizes = [int(size) for size in args.batch_sizes.split(",")]
+
+    if not args.cache:
+        application.cache = None
+
+    forms = sample_forms(args.requests, seed=args.seed)
+    ## warm up imports, template compilation and the model
+    application.app.test_client().post("/", data=forms[0])
+
+    checksum = file_checksum(MODEL_SAVE_PATH)
+    report = {
+        "model_checksum" : checksum,
+        "timestamp" : time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python" : platform.python_version(),
+        "cpu_count" : os.cpu_count(),
+        "compiled_model" : application.reloader.bundle.compiled_model is not None,
+        "micro_batching" : application.batcher is not None,
+        "prediction_cache" : application.cache is not None,
+        "log_mode" : LOG_MODE,
+        "requests_per_level" : args.requests,
+    }
+
+    logger.info("benchmarking the test client")
+    report["test_client"] = bench_test_client(forms, levels)
+    logger.info("benchmarking the local WSGI server")
+    report["wsgi_server"] = bench_wsgi(forms, levels)
+    logger.info("timing the steps of a form request")
+    report["breakdown"] = bench_breakdown(forms)
+    logger.info("comparing single row and batched scoring")
+    report["batching"] = bench_batching(forms, batch_sizes)
+
+    output = args.output or os.path.join(BENCHMARK_DIR, f"serving_{checksum[:12]}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=4)
+
+    logger.info(f"benchmark written to {output}")
+    print(json.dumps({level : result["p99_ms"] for level, result in report["wsgi_server"].items()}, indent=4))
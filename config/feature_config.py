@@ -0,0 +1,15 @@
+FEATURE_SELECTION_CONFIG = {
+    ## keep the features with the highest mutual information with satisfaction
+    "top_k" : 12,
+    "test_size" : 0.2,
+    "random_state" : 42,
+
+    ## stratified subsample of the train split used for the MI scores (None = use all rows)
+    "sample_size" : None,
+
+    ## threads used to score features, 0 = all cores
+    "n_jobs" : 0,
+
+    ## reuse the ranking when the data and this config have not changed
+    "cache" : True
+}
@@ -0,0 +1,19 @@
+LOGGING_CONFIG = {
+    ## "async" : records go through a queue and a background thread writes them in batches
+    ## "sync"  : every record is written to the file by the thread that logs it
+    ## (the LOG_MODE environment variable overrides this, e.g. LOG_MODE=sync python benchmark.py)
+    "mode" : "async",
+    "queue_size" : 100000,
+    "batch_size" : 500,
+    ## how long the writer waits for more records before writing a batch
+    "flush_interval" : 0.05,
+
+    ## one JSON object per line instead of "time - level - message"
+    "json" : False,
+
+    ## per-logger sampling for hot-path messages : keep 1 in `every` records and at most
+    ## `per_second` per second (None = no limit); warnings and errors always pass
+    "sampling" : {
+        "predictions" : {"every" : 1, "per_second" : 20}
+    }
+}
@@ -0,0 +1,15 @@
+MODEL_SELECTION_CONFIG = {
+    ## candidates are fitted in parallel processes, 0 = all cores; slower ones are killed after timeout seconds
+    "n_workers" : 0,
+    "timeout" : 600,
+
+    ## single-row predict calls timed per candidate for the p50/p99 latency
+    "latency_rows" : 200,
+
+    ## pick the best `metric` among candidates whose single-row p99 latency is at most max_p99_ms
+    ## (None = no latency limit); if none qualifies the fastest model on the Pareto front is used
+    "policy" : {
+        "metric" : "f1_score",
+        "max_p99_ms" : 1.0
+    }
+}
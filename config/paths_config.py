@@ -1,17 +1,54 @@
 import os 
 
 ARTIFACTS_DIR = "./artifacts"
+
+## file format of the data passed between pipeline stages: "csv", "parquet" or "feather"
+## (parquet/feather keep dtypes, can be read column by column and memory-mapped; they need pyarrow)
+ARTIFACT_FORMAT = "csv"
+
 RAW_DATA_PATH = os.path.join(ARTIFACTS_DIR, "raw", "data.csv")
+
+## incremental extraction: one file per extracted id range, plus the last extracted id
+RAW_PARTITIONS_DIR = os.path.join(ARTIFACTS_DIR, "raw", "partitions")
+WATERMARK_PATH = os.path.join(ARTIFACTS_DIR, "raw", "watermark.json")
+
+## parallel extraction: one file per key range plus manifest.json
+RAW_PARTS_DIR = os.path.join(ARTIFACTS_DIR, "raw", "parts")
+RAW_MANIFEST_PATH = os.path.join(RAW_PARTS_DIR, "manifest.json")
 INGESTED_DATA_PATH = os.path.join (ARTIFACTS_DIR, "ingested_data")
 
-TRAIN_DATA_PATH = os.path.join(INGESTED_DATA_PATH, "train.csv")
-TEST_DATA_PATH = os.path.join(INGESTED_DATA_PATH, "test.csv")
+TRAIN_DATA_PATH = os.path.join(INGESTED_DATA_PATH, f"train.{ARTIFACT_FORMAT}")
+TEST_DATA_PATH = os.path.join(INGESTED_DATA_PATH, f"test.{ARTIFACT_FORMAT}")
+INGESTION_STATE_PATH = os.path.join(INGESTED_DATA_PATH, "ingested_partitions.json")
 
 PROCESSED_DIR = os.path.join(ARTIFACTS_DIR, "processed_data")
-PROCESSED_DATA_PATH = os.path.join(ARTIFACTS_DIR, "processed_data", "prcessed_data.csv")
+PROCESSED_DATA_PATH = os.path.join(ARTIFACTS_DIR, "processed_data", f"prcessed_data.{ARTIFACT_FORMAT}")
 
 ENGINEERED_DATA = os.path.join(ARTIFACTS_DIR, "engineered_data")
-ENGINEERED_DATA_PATH = os.path.join(ARTIFACTS_DIR, "engineered_data", "final_df.csv")
+ENGINEERED_DATA_PATH = os.path.join(ARTIFACTS_DIR, "engineered_data", f"final_df.{ARTIFACT_FORMAT}")
 
 PARAMS_PATH = os.path.join("./config","params.json")
-MODEL_SAVE_PATH = os.path.join(ARTIFACTS_DIR, "model", "trained_model.pkl")
\ No newline at end of file
+MODEL_SAVE_PATH = os.path.join(ARTIFACTS_DIR, "model", "trained_model.pkl")
+COMPILED_MODEL_PATH = os.path.join(ARTIFACTS_DIR, "model", "compiled_model.npz")
+## a few test rows and the saved model's probabilities on them, checked by the serving app before it swaps a model in
+CANARY_BATCH_PATH = os.path.join(ARTIFACTS_DIR, "model", "canary_batch.npz")
+
+## fitted preprocessing statistics, built up stage by stage and shipped next to the model
+PROCESSED_PREPROCESSOR_PATH = os.path.join(PROCESSED_DIR, "preprocessor.pkl")
+ENGINEERED_PREPROCESSOR_PATH = os.path.join(ENGINEERED_DATA, "preprocessor.pkl")
+PREPROCESSOR_PATH = os.path.join(ARTIFACTS_DIR, "model", "preprocessor.pkl")
+
+## mutual information rankings keyed by a hash of the data and the feature selection config
+MUTUAL_INFO_CACHE_PATH = os.path.join(ARTIFACTS_DIR, "cache", "mutual_info.json")
+
+## model selection report and the (unfitted) model it picked, read by ModelTraining
+MODEL_SELECTION_DIR = os.path.join(ARTIFACTS_DIR, "model_selection")
+MODEL_SELECTION_REPORT_PATH = os.path.join(MODEL_SELECTION_DIR, "selection_report.json")
+SELECTED_MODEL_PATH = os.path.join(MODEL_SELECTION_DIR, "selected_model.pkl")
+
+## JSON results of benchmark.py, one file per model checksum
+BENCHMARK_DIR = os.path.join(ARTIFACTS_DIR, "benchmarks")
+
+## per-stage timing / memory report of the last main.py run, and cProfile dumps (main.py train --profile)
+PROFILE_REPORT_PATH = os.path.join(ARTIFACTS_DIR, "profiles", "pipeline_profile.json")
+PROFILE_DIR = os.path.join(ARTIFACTS_DIR, "profiles")
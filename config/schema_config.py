@@ -0,0 +1,55 @@
+## Column dtypes applied when the pipeline loads data. Ratings are 0-5 and ages < 128,
+## so int8 is enough; delays and distance are whole numbers that fit float32 exactly.
+
+RATING_COLUMNS = [
+    "Inflight wifi service",
+    "Departure/Arrival time convenient",
+    "Ease of Online booking",
+    "Gate location",
+    "Food and drink",
+    "Online boarding",
+    "Seat comfort",
+    "Inflight entertainment",
+    "On-board service",
+    "Leg room service",
+    "Baggage handling",
+    "Checkin service",
+    "Inflight service",
+    "Cleanliness",
+]
+
+CATEGORICAL_COLUMNS = ["Gender", "Customer Type", "Type of Travel", "Class", "satisfaction"]
+
+FLOAT_COLUMNS = ["Flight Distance", "Departure Delay in Minutes", "Arrival Delay in Minutes"]
+
+## columns clipped to their IQR bounds by data processing
+OUTLIER_COLUMNS = ["Flight Distance", "Departure Delay in Minutes", "Arrival Delay in Minutes", "Checkin service"]
+
+## clip bounds can be fractional (e.g. 1.5), so clipped ratings are no longer whole numbers
+CLIPPED_RATING_COLUMNS = [column for column in RATING_COLUMNS if column in OUTLIER_COLUMNS]
+
+## raw and ingested data: text categories kept as pandas categoricals
+RAW_DTYPES = {
+    "MyUnknownColumn" : "int32",
+    "id" : "int32",
+    "Age" : "int8",
+    **{column : "int8" for column in RATING_COLUMNS},
+    **{column : "category" for column in CATEGORICAL_COLUMNS},
+    **{column : "float32" for column in FLOAT_COLUMNS},
+}
+
+## processed data: as raw, but clipped ratings stay float64 like the values the preprocessor gives at serving
+PROCESSED_DTYPES = {
+    **RAW_DTYPES,
+    **{column : "float64" for column in CLIPPED_RATING_COLUMNS},
+}
+
+## engineered data: categories are already label encoded; Delay Ratio stays float64 to match serving
+ENGINEERED_DTYPES = {
+    "Age" : "int8",
+    **{column : "int8" for column in RATING_COLUMNS},
+    **{column : "float64" for column in CLIPPED_RATING_COLUMNS},
+    **{column : "int8" for column in CATEGORICAL_COLUMNS + ["Age Group"]},
+    **{column : "float32" for column in FLOAT_COLUMNS + ["Total Delay"]},
+    "Delay Ratio" : "float64",
+}
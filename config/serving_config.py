@@ -0,0 +1,24 @@
+SERVING_CONFIG = {
+    ## coalesce concurrent form requests into one model call
+    "micro_batching" : False,
+    "max_batch_size" : 64,
+    "max_wait_ms" : 5,
+    ## seconds a request waits for its micro batch before failing
+    "micro_batch_timeout" : 10.0,
+
+    ## LRU cache of form predictions (None = exact key, no rounding)
+    "prediction_cache" : True,
+    "cache_max_entries" : 100000,
+    "cache_delay_ratio_decimals" : None,
+    "cache_distance_step" : None,
+
+    ## GET /metrics : with several worker processes (gunicorn -w N) point this at a shared, empty
+    ## directory so every worker's counters end up in each scrape (None = this process only)
+    "metrics_multiprocess_dir" : None,
+    "metrics_flush_interval" : 1.0,
+
+    ## hot reload : poll the model files every N seconds (None = only POST /admin/reload)
+    "model_reload_interval" : 2.0,
+    ## POST /admin/reload needs this in the X-Admin-Token header (None = loopback clients only)
+    "admin_token" : None
+}
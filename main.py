@@ -1,37 +1,209 @@
 ### This is the simple method to run the entire pipeline. This is the main file which will be executed to run the entire pipeline. This file will call the other files in the src folder to run the pipeline. This file will call the DataIngestion, DataProcessor, FeatureEngineering and ModelTraining classes to run the pipeline. This file will also handle the exceptions and log the errors.
 
 
-from src.data_ingestion import DataIngestion
+from src.data_ingestion import DataIngestion, raw_data_source
 from src.data_processing import DataProcessor
 from src.feature_engineering import FeaturEngineering
 from src.model_training import ModelTraining
+from src.batch_scoring import BatchScorer
+from src.preprocessor import FittedPreprocessor
 from src.custom_exception import CustomException
 from config.paths_config import *
 from src.logger import get_logger
+from src.profiler import profiler
+from utils.helpers import BackgroundWriter, model_feature_names
+import argparse
+import mlflow
+import json
+import joblib
+import pandas as pd
+import os
+import sys
 
 logger = get_logger(__name__)
 
-if __name__ == "__main__":
-    try:
+def parse_args():
+    parser = argparse.ArgumentParser(description="Airline customer satisfaction pipeline")
+    subparsers = parser.add_subparsers(dest="command")
 
-        ## Data Ingestion
-        ingestion = DataIngestion(raw_data_path=RAW_DATA_PATH, ingested_data_path=INGESTED_DATA_PATH)
+    parser.set_defaults(in_memory=False, write_artifacts="async", incremental=False, out_of_core=False, warm_start=False, chunk_size=100000, workers=1,
+                        profile="", profile_dir=PROFILE_DIR)
+
+    train_parser = subparsers.add_parser("train", help="run the full training pipeline (default)")
+    train_parser.add_argument("--in-memory", action="store_true", help="pass DataFrames between stages instead of files")
+    train_parser.add_argument("--write-artifacts", choices=["none", "end", "async"], default="async",
+                              help="with --in-memory: when to write the intermediate files (the model is always saved)")
+    train_parser.add_argument("--incremental", action="store_true", help="ingest only new raw partitions (see database_extraction.py --incremental)")
+    train_parser.add_argument("--warm-start", action="store_true",
+                              help="ingest new raw partitions and continue boosting the saved model on just those rows (see \"warm_start\" in params.json)")
+    train_parser.add_argument("--out-of-core", action="store_true", help="process the train split in chunks with approximate quantiles")
+    train_parser.add_argument("--chunk-size", type=int, default=100000)
+    train_parser.add_argument("--workers", type=int, default=1, help="process pool size for the quantile pass, 0 = all cores")
+
+    train_parser.add_argument("--profile", default="", metavar="STAGES",
+                              help="comma separated stages or sub-steps to run under cProfile (e.g. feature_selection,train_model), or 'all'")
+    train_parser.add_argument("--profile-dir", default=PROFILE_DIR, help="where the .prof files are written")
+
+    score_parser = subparsers.add_parser("score", help="score a CSV/Parquet file in chunks")
+    score_parser.add_argument("--input", required=True, help="input .csv or .parquet file")
+    score_parser.add_argument("--output", required=True, help="output .csv or .parquet file")
+    score_parser.add_argument("--model", default=MODEL_SAVE_PATH)
+    score_parser.add_argument("--preprocessor", default=None, help="defaults to preprocessor.pkl next to --model")
+    score_parser.add_argument("--chunk-size", type=int, default=100000)
+    score_parser.add_argument("--workers", type=int, default=1, help="process pool size, 0 = all cores")
+
+    args = parser.parse_args()
+
+    ## the in-memory and warm-start paths have their own ingestion / processing, these flags would be ignored
+    if args.in_memory and (args.incremental or args.out_of_core or args.warm_start):
+        parser.error("--in-memory cannot be combined with --incremental, --out-of-core or --warm-start")
+    if args.warm_start and (args.incremental or args.out_of_core):
+        parser.error("--warm-start already ingests the new partitions and cannot be combined with --incremental or --out-of-core")
+
+    return args
+
+def run_training(incremental=False, out_of_core=False, chunk_size=100000, n_workers=1):
+    ## Data Ingestion
+    with profiler.stage("data_ingestion"):
+        ingestion = DataIngestion(raw_data_path=raw_data_source(), ingested_data_path=INGESTED_DATA_PATH)
         ingestion.create_ingested_data_dir()
-        ingestion.split_data(train_path=TRAIN_DATA_PATH,test_path=TEST_DATA_PATH)
+        if incremental:
+            ingestion.ingest_partitions()
+        else:
+            ingestion.split_data(train_path=TRAIN_DATA_PATH,test_path=TEST_DATA_PATH)
 
 
-        ## Data Processing
+    ## Data Processing
+    with profiler.stage("data_processing"):
         processor = DataProcessor()
-        processor.run()
+        if out_of_core:
+            processor.run_out_of_core(chunk_size=chunk_size, n_workers=n_workers)
+        else:
+            processor.run()
 
 
-        ## Feature Engineering
+    ## Feature Engineering
+    with profiler.stage("feature_engineering"):
         feature_engineer = FeaturEngineering()
         feature_engineer.run()
 
-        ## Model Training
+    ## Model Training
+    with profiler.stage("model_training"):
         modeltrainer = ModelTraining(data_path = ENGINEERED_DATA_PATH, params_path = PARAMS_PATH, model_save_path = MODEL_SAVE_PATH)
         modeltrainer.run()
+    return modeltrainer
+
+def warm_start_columns(model_path):
+    ## the saved model's own input columns plus the target; pickles from older LightGBM versions carry no
+    ## feature_names_in_, their booster still knows the names (with underscores for spaces)
+    names = model_feature_names(joblib.load(model_path))
+    if names is None:
+        raise CustomException(f"{model_path} does not record its feature names, retrain it with 'python main.py train' before warm starting", sys)
+    return names + ['satisfaction']
+
+def run_warm_start():
+    ## only the newly ingested rows go through preprocessing and training
+    with profiler.stage("data_ingestion"):
+        ingestion = DataIngestion(raw_data_path=RAW_DATA_PATH, ingested_data_path=INGESTED_DATA_PATH)
+        if not ingestion.ingest_partitions():
+            return None
+
+    with open(PARAMS_PATH) as f:
+        options = json.load(f).get("warm_start", {})
+
+    with profiler.stage("feature_engineering"):
+        columns = warm_start_columns(MODEL_SAVE_PATH)
+        feature_engineer = FeaturEngineering(preprocessor=FittedPreprocessor.load(PREPROCESSOR_PATH))
+        new_data = feature_engineer.transform_new_data(pd.concat(ingestion.new_train_data), columns)
+        holdout_data = feature_engineer.transform_new_data(pd.concat(ingestion.new_test_data), columns)
+
+    with profiler.stage("model_training"):
+        modeltrainer = ModelTraining(data_path = ENGINEERED_DATA_PATH, params_path = PARAMS_PATH, model_save_path = MODEL_SAVE_PATH,
+                                     preprocessor = feature_engineer.preprocessor)
+        modeltrainer.run_warm_start(new_data, holdout_data, options)
+    return modeltrainer
+
+def run_training_in_memory(write_artifacts="async"):
+    ## same stages as run_training, but each stage hands its DataFrame straight to the next one
+    writer = BackgroundWriter()
+    pending = []
+
+    def save(fn, *args, preprocessor=None, preprocessor_path=None):
+        ## the preprocessor is written right away on this thread: the next stage keeps adding to it, and
+        ## a background pickle could capture it half-fitted or land after the model that ships with it
+        if write_artifacts == "none":
+            return
+        if preprocessor is not None:
+            preprocessor.save(preprocessor_path)
+        if write_artifacts == "async":
+            writer.submit(fn, *args)
+        else:
+            pending.append((fn, args))
+
+    try:
+        with profiler.stage("data_ingestion"):
+            ingestion = DataIngestion(raw_data_path=raw_data_source(), ingested_data_path=INGESTED_DATA_PATH)
+            train_data, test_data = ingestion.run(save=False)
+            save(ingestion.save_data, train_data, test_data)
+
+        with profiler.stage("data_processing"):
+            processor = DataProcessor()
+            processed = processor.run(df=train_data, save=False)
+            if processed is None:
+                raise CustomException("data processing failed, see the log above", sys)
+            save(processor.save_data, processed, False, preprocessor=processor.preprocessor, preprocessor_path=PROCESSED_PREPROCESSOR_PATH)
+
+        with profiler.stage("feature_engineering"):
+            feature_engineer = FeaturEngineering(preprocessor=processor.preprocessor)
+            engineered = feature_engineer.run(df=processed, save=False)
+            save(feature_engineer.save_data, engineered, False, preprocessor=feature_engineer.preprocessor, preprocessor_path=ENGINEERED_PREPROCESSOR_PATH)
+
+        with profiler.stage("model_training"):
+            ## save_model pickles this same (now complete) preprocessor next to the model, never a file still being written
+            modeltrainer = ModelTraining(data_path = ENGINEERED_DATA_PATH, params_path = PARAMS_PATH, model_save_path = MODEL_SAVE_PATH,
+                                         preprocessor = feature_engineer.preprocessor)
+            modeltrainer.run(data=engineered)
+
+        with profiler.stage("write_artifacts"):
+            for fn, args in pending:
+                fn(*args)
+            writer.wait()
+
+        return modeltrainer
+
+    finally:
+        writer.wait()
+
+def save_profile(modeltrainer):
+    ## JSON report next to the artifacts, and attached to the training MLflow run when there was one
+    profiler.save(PROFILE_REPORT_PATH)
+    if modeltrainer is not None and modeltrainer.run_id is not None:
+        with mlflow.start_run(run_id=modeltrainer.run_id):
+            profiler.log_to_mlflow()
+
+def run_scoring(args):
+    scorer = BatchScorer(input_path=args.input, output_path=args.output, model_path=args.model,
+                         chunk_size=args.chunk_size, n_workers=args.workers or os.cpu_count(), preprocessor_path=args.preprocessor)
+    scorer.run()
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    try:
+        if args.command == "score":
+            run_scoring(args)
+        else:
+            if args.profile:
+                profiler.enable_cprofile(args.profile.split(","), args.profile_dir)
+
+            if args.warm_start:
+                modeltrainer = run_warm_start()
+            elif args.in_memory:
+                modeltrainer = run_training_in_memory(write_artifacts=args.write_artifacts)
+            else:
+                modeltrainer = run_training(incremental=args.incremental, out_of_core=args.out_of_core,
+                                            chunk_size=args.chunk_size, n_workers=args.workers or os.cpu_count())
+            save_profile(modeltrainer)
 
     except CustomException as e:
-        logger.error({str(e)})
\ No newline at end of file
+        logger.error({str(e)})
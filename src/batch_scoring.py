@@ -0,0 +1,124 @@
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import joblib
+import pandas as pd
+from src.logger import get_logger
+from src.custom_exception import CustomException
+from config.paths_config import *
+from src.preprocessor import FittedPreprocessor
+from utils.helpers import frame_to_columns, build_feature_matrix, iter_artifact_chunks, ChunkedArtifactWriter
+
+logger = get_logger(__name__)
+
+## model and preprocessor loaded once per pool worker
+_worker_model = None
+_worker_preprocessor = None
+
+def _init_worker(model_path, preprocessor_path):
+    global _worker_model, _worker_preprocessor
+    _worker_model = joblib.load(model_path)
+    _worker_preprocessor = load_preprocessor(preprocessor_path)
+
+def _score_in_worker(chunk):
+    return score_chunk(_worker_model, chunk, _worker_preprocessor)
+
+def load_preprocessor(preprocessor_path):
+    if preprocessor_path and os.path.exists(preprocessor_path):
+        return FittedPreprocessor.load(preprocessor_path)
+    return None
+
+def score_chunk(model, chunk, preprocessor = None):
+    columns = frame_to_columns(chunk, encode_categories = preprocessor is None)
+    if preprocessor is not None:
+        columns = preprocessor.transform_columns(columns)
+
+    X = build_feature_matrix(columns)
+    probabilities = model.predict_proba(X)
+
+    result = pd.DataFrame(index=chunk.index)
+    if "id" in chunk.columns:
+        result["id"] = chunk["id"].to_numpy()
+    result["prediction"] = model.classes_[probabilities.argmax(axis=1)]
+    result["probability"] = probabilities[:, 1]
+    return result
+
+
+def paired_preprocessor_path(model_path):
+    ## training saves the preprocessor next to the model it was fitted for (ModelTraining.save_model)
+    return os.path.join(os.path.dirname(model_path), os.path.basename(PREPROCESSOR_PATH))
+
+
+class BatchScorer:
+
+    def __init__(self, input_path, output_path, model_path = MODEL_SAVE_PATH, chunk_size = 100000, n_workers = 1, preprocessor_path = None):
+        self.input_path = input_path
+        self.output_path = output_path
+        self.model_path = model_path
+        ## default: the preprocessor shipped with this model, not the one of the default model
+        self.preprocessor_path = preprocessor_path if preprocessor_path is not None else paired_preprocessor_path(model_path)
+        self.chunk_size = int(chunk_size)
+        self.n_workers = int(n_workers)
+
+        self.writer = ChunkedArtifactWriter(output_path)
+
+    @property
+    def rows(self):
+        return self.writer.rows
+
+    def read_chunks(self):
+        return iter_artifact_chunks(self.input_path, self.chunk_size)
+
+    def write_chunk(self, result):
+        self.writer.write(result)
+
+    def close(self):
+        self.writer.close()
+
+    def score_serial(self):
+        model = joblib.load(self.model_path)
+        preprocessor = load_preprocessor(self.preprocessor_path)
+        for chunk in self.read_chunks():
+            self.write_chunk(score_chunk(model, chunk, preprocessor))
+            logger.info(f"Scored {self.rows} rows")
+
+    def score_parallel(self):
+        ## at most 2 chunks per worker in flight so memory stays flat; results are written in input order
+        with ProcessPoolExecutor(max_workers=self.n_workers, initializer=_init_worker, initargs=(self.model_path, self.preprocessor_path)) as pool:
+            pending = deque()
+            for chunk in self.read_chunks():
+                pending.append(pool.submit(_score_in_worker, chunk))
+                if len(pending) >= 2 * self.n_workers:
+                    self.write_chunk(pending.popleft().result())
+                    logger.info(f"Scored {self.rows} rows")
+
+            while pending:
+                self.write_chunk(pending.popleft().result())
+                logger.info(f"Scored {self.rows} rows")
+
+    def run(self):
+        try:
+            logger.info(f"Batch scoring started : {self.input_path} -> {self.output_path} , chunk_size : {self.chunk_size} , workers : {self.n_workers}")
+            start = time.perf_counter()
+
+            output_dir = os.path.dirname(self.output_path)
+            if output_dir:
+                os.makedirs(output_dir, exist_ok=True)
+
+            if self.n_workers > 1:
+                self.score_parallel()
+            else:
+                self.score_serial()
+
+            elapsed = time.perf_counter() - start
+            logger.info(f"Batch scoring completed : {self.rows} rows in {elapsed:.2f}s ({self.rows / max(elapsed, 1e-9):.0f} rows/sec)")
+            return self.rows
+
+        except Exception as e:
+            logger.error(f"Error in batch scoring: {e}")
+            raise CustomException(f"Error in batch scoring: {e}", sys)
+
+        finally:
+            self.close()
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+
+class CategoricalEncoder:
+    """Label encoder for several columns at once, built on pandas categorical codes.
+
+    Categories are sorted the same way LabelEncoder sorts its classes, so the codes
+    match what the model was trained with. Values not seen during fit (and missing
+    values) become unknown_value instead of raising; NaN lets LightGBM send them
+    down its missing-value branch.
+
+    Only the category lists are pickled, the {category: code} lookups used for single
+    rows are rebuilt on load.
+    """
+
+    def __init__(self, unknown_value = np.nan):
+        self.unknown_value = unknown_value
+        self.categories = {}
+        self._lookup = {}
+
+    def fit(self, df, columns):
+        for col in columns:
+            values = df[col]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                ## only the categories that actually occur, like LabelEncoder would see them
+                categories = values.cat.remove_unused_categories().cat.categories
+            else:
+                categories = pd.Index(values.dropna().unique())
+            self.set_categories(col, categories.sort_values())
+        return self
+
+    def set_categories(self, column, categories):
+        categories = pd.Index(categories)
+        self.categories[column] = categories
+        self._lookup[column] = {(key.item() if hasattr(key, "item") else key) : code for code, key in enumerate(categories)}
+
+    def mapping(self, column):
+        return dict(self._lookup[column])
+
+    def encode(self, column, values):
+        ## array-like in, NumPy codes out; integer codes unless something was unknown and unknown_value is NaN
+        codes = pd.Categorical(values, categories=self.categories[column]).codes
+        unknown = codes < 0
+        if not unknown.any():
+            return codes
+        if self.unknown_value != self.unknown_value:
+            codes = codes.astype(np.float64)
+        codes[unknown] = self.unknown_value
+        return codes
+
+    def transform(self, df):
+        ## encodes every fitted column present in df, returns a new DataFrame
+        encoded = {col : self.encode(col, df[col]) for col in self.categories if col in df.columns}
+        return df.assign(**encoded)
+
+    def fit_transform(self, df, columns):
+        return self.fit(df, columns).transform(df)
+
+    def encode_value(self, column, value):
+        return self._lookup[column].get(value, self.unknown_value)
+
+    def transform_row(self, row):
+        return {name : (self.encode_value(name, value) if name in self._lookup else value) for name, value in row.items()}
+
+    def __contains__(self, column):
+        return column in self.categories
+
+    def __getstate__(self):
+        return {"unknown_value" : self.unknown_value, "categories" : {col : categories.tolist() for col, categories in self.categories.items()}}
+
+    def __setstate__(self, state):
+        self.unknown_value = state["unknown_value"]
+        self.categories = {}
+        self._lookup = {}
+        for col, categories in state["categories"].items():
+            self.set_categories(col, categories)
@@ -1,13 +1,61 @@
 import os 
 import sys
+import json
+import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from src.custom_exception import CustomException
 from src.logger import get_logger
+from src.profiler import profiled
 from config.paths_config import *
+from config.schema_config import RAW_DTYPES
+from utils.helpers import read_artifact, write_artifact, apply_dtypes, atomic_write, log_memory_footprint
 
 logger = get_logger(__name__)
 
+def partition_bounds(name):
+    ## (low, high) key bounds of "part-<low>-<high>.<ext>" ; older unpadded names used "start" for the first one
+    low, high = os.path.splitext(name)[0].split("-")[1:3]
+    return (-1 if low == "start" else int(low), int(high))
+
+def raw_data_source(data_path=RAW_DATA_PATH, manifest_path=RAW_MANIFEST_PATH):
+    ## data.csv from a plain extraction or the manifest of a parallel one (database_extraction.py --parallel),
+    ## whichever the last extraction wrote
+    if os.path.exists(manifest_path) and (not os.path.exists(data_path) or os.path.getmtime(manifest_path) > os.path.getmtime(data_path)):
+        return manifest_path
+    return data_path
+
+def read_raw_data(path, dtypes=RAW_DTYPES):
+    ## a raw data file, or a manifest.json whose part files are read in key order
+    if not path.endswith(".json"):
+        return read_artifact(path, dtypes=dtypes)
+
+    with open(path) as f:
+        manifest = json.load(f)
+    if not manifest["partitions"]:
+        raise ValueError(f"{path} lists no partitions")
+
+    parts = []
+    for partition in sorted(manifest["partitions"], key=lambda partition : partition["start"]):
+        part = read_artifact(os.path.join(os.path.dirname(path), partition["file"]), dtypes=dtypes)
+        if len(part) != partition["rows"]:
+            raise ValueError(f"{partition['file']} has {len(part)} rows, {path} expects {partition['rows']}")
+        parts.append(part)
+    ## each part has its own categories, so the plan is applied again to the combined frame
+    return apply_dtypes(pd.concat(parts, ignore_index=True), dtypes)
+
+def replace_artifact(df, path):
+    ## rewrite a pipeline artifact through a temp file with the same extension and one rename
+    root, extension = os.path.splitext(path)
+    tmp_path = f"{root}.tmp{extension}"
+    write_artifact(df, tmp_path)
+    os.replace(tmp_path, path)
+
+def write_state(state_path, partitions, pending):
+    with atomic_write(state_path) as tmp_path:
+        with open(tmp_path, "w") as f:
+            json.dump({"partitions" : partitions, "pending" : pending}, f)
+
 class DataIngestion:
 
     def __init__(self, raw_data_path, ingested_data_path):
@@ -23,29 +71,141 @@ class DataIngestion:
         except Exception as e:
             raise CustomException("error while creating directory", sys)
         
-    def split_data(self,train_path,test_path,test_size=0.2, random_state= 42):
+    @profiled()
+    def split_data(self,train_path,test_path,test_size=0.2, random_state= 42, data=None, save=True):
 
         try:
-            data= pd.read_csv(self.raw_data_path)
+            if data is None:
+                data= read_raw_data(self.raw_data_path)
             logger.info(f"Raw data has been loaded successfully with shape: {data.shape}")
+            log_memory_footprint(logger, data, "Raw data")
 
             train_data, test_data = train_test_split(data, test_size=test_size, random_state=random_state)
             logger.info("data been splited successfully")
 
-            train_data.to_csv(train_path, index = False)
-            test_data.to_csv(test_path, index = False)
-            logger.info("training and testing data saved successfully")
+            if save:
+                self.save_data(train_data, test_data, train_path, test_path)
+
+            return train_data, test_data
 
         except Exception as e:
             raise CustomException ("error while splitting the data", sys)
+
+    @profiled()
+    def save_data(self, train_data, test_data, train_path=TRAIN_DATA_PATH, test_path=TEST_DATA_PATH):
+        try:
+            os.makedirs(self.ingested_data_path, exist_ok=True)
+            write_artifact(train_data, train_path)
+            write_artifact(test_data, test_path)
+            logger.info("training and testing data saved successfully")
+
+        except Exception as e:
+            raise CustomException ("error while saving the split data", sys)
+
+    def hash_split(self, data, key="id", test_size=0.2):
+        ## train/test assignment from a stable hash of the key, so a row's side never changes between runs
+        buckets = pd.util.hash_pandas_object(data[key], index=False).to_numpy() % np.uint64(10000)
+        is_test = buckets < np.uint64(int(test_size * 10000))
+        return data[~is_test], data[is_test]
+
+    def append_data(self, data, path):
+        ## CSV grows in place; columnar files cannot be appended to, they are rewritten through a temp file
+        if path.endswith(".csv") and os.path.exists(path):
+            data.to_csv(path, mode="a", header=False, index=False)
+        elif not os.path.exists(path):
+            write_artifact(data, path)
+        else:
+            replace_artifact(pd.concat([read_artifact(path, dtypes=RAW_DTYPES), data], ignore_index=True), path)
+
+    def remove_partition_rows(self, names, paths, key="id"):
+        ## undo a batch of partitions that may be half appended: drop rows whose key falls in their ranges
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            data = read_artifact(path, dtypes=RAW_DTYPES)
+            in_batch = np.zeros(len(data), dtype=bool)
+            for name in names:
+                low, high = partition_bounds(name)
+                in_batch |= ((data[key] > low) & (data[key] <= high)).to_numpy()
+            if in_batch.any():
+                replace_artifact(data[~in_batch], path)
+                logger.info(f"Removed {in_batch.sum()} rows of unfinished partitions {names} from {path}")
+
+    @profiled()
+    def ingest_partitions(self, partitions_dir=RAW_PARTITIONS_DIR, state_path=INGESTION_STATE_PATH, train_path=TRAIN_DATA_PATH, test_path=TEST_DATA_PATH,
+                          key="id", test_size=0.2):
+        ## split only the raw partitions not ingested yet and append them to the train/test files
+        ## RAW_DATA_PATH is left as it is : partitions are only read by the incremental path
+        ## the state file names a batch as pending before its rows are appended and as ingested after, so rows
+        ## left by a crash in between are removed by key on the next run instead of being appended twice
+        try:
+            os.makedirs(self.ingested_data_path, exist_ok=True)
+
+            state = {"partitions" : [], "pending" : []}
+            if os.path.exists(state_path):
+                with open(state_path) as f:
+                    state.update(json.load(f))
+            ingested = state["partitions"]
+
+            if state["pending"]:
+                self.remove_partition_rows(state["pending"], [train_path, test_path], key=key)
+                write_state(state_path, ingested, [])
+
+            new_partitions = sorted((name for name in os.listdir(partitions_dir) if name.startswith("part-") and name not in ingested), key=partition_bounds)
+            ## the rows added by this call, for warm-start retraining on just the delta
+            self.new_train_data, self.new_test_data = [], []
+            if not new_partitions:
+                logger.info("No new raw partitions to ingest")
+                return 0
+
+            ## CSV appends one partition at a time; a columnar file is rewritten once for all the new partitions
+            if train_path.endswith(".csv") and test_path.endswith(".csv"):
+                batches = [[name] for name in new_partitions]
+            else:
+                batches = [new_partitions]
+
+            rows = 0
+            for batch in batches:
+                train_parts, test_parts = [], []
+                for name in batch:
+                    data = read_artifact(os.path.join(partitions_dir, name), dtypes=RAW_DTYPES)
+                    train_data, test_data = self.hash_split(data, key=key, test_size=test_size)
+                    train_parts.append(train_data)
+                    test_parts.append(test_data)
+                    rows += len(data)
+                    logger.info(f"Ingesting partition {name} : train : {len(train_data)} , test : {len(test_data)}")
+
+                write_state(state_path, ingested, batch)
+                self.append_data(pd.concat(train_parts, ignore_index=True), train_path)
+                self.append_data(pd.concat(test_parts, ignore_index=True), test_path)
+                ingested = ingested + batch
+                write_state(state_path, ingested, [])
+
+                self.new_train_data += train_parts
+                self.new_test_data += test_parts
+
+            return rows
+
+        except Exception as e:
+            logger.error(f"Error while ingesting partitions: {e}")
+            raise CustomException ("error while ingesting the raw partitions", sys)
+
+    def run(self, data=None, save=True):
+        ## in-memory entry point: returns (train, test); writes them only when save is True
+        if save:
+            self.create_ingested_data_dir()
+        return self.split_data(train_path=TRAIN_DATA_PATH, test_path=TEST_DATA_PATH, data=data, save=save)
         
 
 if __name__ == "__main__":
 
     try:
-        ingestion = DataIngestion(raw_data_path=RAW_DATA_PATH, ingested_data_path=INGESTED_DATA_PATH)
+        ingestion = DataIngestion(raw_data_path=raw_data_source(), ingested_data_path=INGESTED_DATA_PATH)
         ingestion.create_ingested_data_dir()
-        ingestion.split_data(train_path=TRAIN_DATA_PATH,test_path=TEST_DATA_PATH)
+        if "--incremental" in sys.argv:
+            ingestion.ingest_partitions()
+        else:
+            ingestion.split_data(train_path=TRAIN_DATA_PATH,test_path=TEST_DATA_PATH)
 
     except CustomException as ce:
         logger.info(str(ce))
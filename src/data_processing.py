@@ -1,32 +1,57 @@
-import pandas as pd 
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from config.paths_config import *
+from config.schema_config import RAW_DTYPES, PROCESSED_DTYPES, OUTLIER_COLUMNS
 from src.logger import get_logger
+from src.profiler import profiled
 from src.custom_exception import CustomException
+from src.preprocessor import FittedPreprocessor
+from src.quantile_sketch import QuantileSketch
+from utils.helpers import read_artifact, write_artifact, apply_dtypes, iter_artifact_chunks, ChunkedArtifactWriter, log_memory_footprint
 import sys 
 
 logger = get_logger(__name__)
 
+DROP_COLUMNS = ["MyUnknownColumn","id"]
+NULL_COLUMN = 'Arrival Delay in Minutes'
+
+## what the stage reads from the train split; the id columns would only be dropped again
+PROCESSING_COLUMNS = [column for column in RAW_DTYPES if column not in DROP_COLUMNS]
+
+## chunks are read and written without categoricals, whose categories would differ from chunk to chunk
+CHUNK_DTYPES = {column : dtype for column, dtype in RAW_DTYPES.items() if dtype != "category"}
+PROCESSED_CHUNK_DTYPES = {column : dtype for column, dtype in PROCESSED_DTYPES.items() if dtype != "category"}
+
+def sketch_chunk(chunk, columns, epsilon):
+    ## one sketch per column for a single chunk; runs in pool workers, merged by the parent
+    return {column : QuantileSketch(epsilon).update(chunk[column].to_numpy()) for column in columns}
+
 class DataProcessor:
     
     def __init__(self):
         self.train_path = TRAIN_DATA_PATH
         self.processed_data_path = PROCESSED_DATA_PATH
+        self.preprocessor = FittedPreprocessor()
 
-    def load_data(self):
+    @profiled()
+    def load_data(self, columns=PROCESSING_COLUMNS):
         try:
             logger.info(f"Data Processing started")
-            df = pd.read_csv(self.train_path)
+            df = read_artifact(self.train_path, columns=columns, dtypes=RAW_DTYPES)
             logger.info(f"Data read successfully : Data Shape : {df.shape}")
+            log_memory_footprint(logger, df, "Train data")
             return df 
         
         except Exception as e :
             logger.error("Problem While Loading Data")
             raise CustomException("error while loading data:", sys)
         
+    @profiled()
     def drop_unnecessory_columns(self, df, columns):
         try:
             logger.info(f"Drop unnecessory columns started : {columns}")
-            df = df.drop(columns= columns, axis=1)
+            ## a frame read with PROCESSING_COLUMNS no longer has them, one handed over by ingestion still does
+            df = df.drop(columns= columns, axis=1, errors='ignore')
             logger.info(f"Drop unnecessory columns completed : Shape : {df.shape}")
             return df 
         
@@ -34,6 +59,7 @@ class DataProcessor:
             logger.error("problem while droppinf columns")
             raise CustomException ("Error while dropping columns", sys)
         
+    @profiled()
     def handle_outliers(self, df, columns):
         try:
             logger.info(f"Handling Outliers started : {columns}")
@@ -46,6 +72,7 @@ class DataProcessor:
                 lower_bound = Q1 - 1.5 * IQR
                 upper_bound = Q3 + 1.5 * IQR
                 df[column] = df[column].clip(lower = lower_bound, upper = upper_bound)
+                self.preprocessor.fit_clip_bounds(column, lower_bound, upper_bound)
             
             logger.info(f"Handling Outliers completed : Shape : {df.shape}")
             return df 
@@ -54,10 +81,18 @@ class DataProcessor:
             logger.error("problem while handling outliers")
             raise CustomException ("Error while handling Outliers", sys)
         
+    @profiled()
     def handle_null_values(self, df, columns):
         try:
             logger.info(f"Handling the null values has been started : {columns}")
-            df[columns] = df[columns].fillna(df[columns].median())
+            medians = df[columns].median()
+            df[columns] = df[columns].fillna(medians)
+
+            if isinstance(columns, str):
+                self.preprocessor.fit_fill_value(columns, medians)
+            else:
+                for column in columns:
+                    self.preprocessor.fit_fill_value(column, medians[column])
             logger.info(f"handling the null values been successfully completed : Shape : {df.shape}")
             return df 
         
@@ -65,35 +100,116 @@ class DataProcessor:
             logger.errro("problem While Handling the null Values")
             raise CustomException ("Error while handling the null values", sys)
         
-    def save_data(self, df):
+    @profiled()
+    def save_data(self, df, save_preprocessor=True):
+        ## save_preprocessor=False when the caller writes the preprocessor itself (in-memory runs save it synchronously)
         try:
             logger.info (f"saving the data been started")
             os.makedirs(PROCESSED_DIR, exist_ok=True)
-            df.to_csv(self.processed_data_path, index=False)
+            write_artifact(df, self.processed_data_path)
+            if save_preprocessor:
+                self.preprocessor.save(PROCESSED_PREPROCESSOR_PATH)
             logger.info(f"data has been saved Succesfully")
 
         except Exception as e:
             logger.error("problem while saving the data")
             raise CustomException("Error while saving the data", sys)
         
-    def run(self):
+    def run(self, df=None, save=True):
+        ## pass df to skip reading the train split from disk, save=False to skip writing the result
         try:
             logger.info("Data Processing pipeline has been satrted")
 
-            df = self.load_data()
-            df = self.drop_unnecessory_columns(df, ["MyUnknownColumn","id"])
-            columns_to_handle = ['Flight Distance','Departure Delay in Minutes','Arrival Delay in Minutes', 'Checkin service']
+            if df is None:
+                df = self.load_data()
+            df = self.drop_unnecessory_columns(df, DROP_COLUMNS)
+            columns_to_handle = OUTLIER_COLUMNS
             df = self.handle_outliers(df, columns_to_handle)
 
-            df = self.handle_null_values(df, 'Arrival Delay in Minutes')
+            df = self.handle_null_values(df, NULL_COLUMN)
+            ## same dtypes whether or not a clip bound happened to be a whole number
+            df = apply_dtypes(df, PROCESSED_DTYPES)
+
+            log_memory_footprint(logger, df, "Processed data")
 
-            self.save_data(df)
+            if save:
+                self.save_data(df)
 
             logger.info("Data Processing Pipeline has been completed")
+            return df
 
         except CustomException as ce:
             logger.error(f"Problem while running the data processing pipeline : {str(ce)}")
 
+    @profiled()
+    def sketch_quantiles(self, columns, chunk_size=100000, n_workers=1, epsilon=0.005):
+        ## pass 1: Q1/Q3/median sketches for all columns in a single read of the file
+        sketches = {column : QuantileSketch(epsilon) for column in columns}
+
+        def merge(partial):
+            for column, sketch in partial.items():
+                sketches[column].merge(sketch)
+
+        chunks = iter_artifact_chunks(self.train_path, chunk_size, columns=columns, dtypes=CHUNK_DTYPES)
+        if n_workers > 1:
+            with ProcessPoolExecutor(max_workers=n_workers) as pool:
+                pending = deque()
+                for chunk in chunks:
+                    pending.append(pool.submit(sketch_chunk, chunk, columns, epsilon))
+                    if len(pending) >= 2 * n_workers:
+                        merge(pending.popleft().result())
+                while pending:
+                    merge(pending.popleft().result())
+        else:
+            for chunk in chunks:
+                merge(sketch_chunk(chunk, columns, epsilon))
+
+        return sketches
+
+    def run_out_of_core(self, chunk_size=100000, n_workers=1, epsilon=0.005):
+        ## same steps as run(), but the train split is never fully in memory:
+        ## pass 1 sketches the quantiles, pass 2 clips/fills chunk by chunk and appends to the output
+        writer = None
+        try:
+            logger.info(f"Out-of-core data processing started : chunk_size : {chunk_size} , workers : {n_workers} , epsilon : {epsilon}")
+
+            sketch_columns = list(dict.fromkeys(OUTLIER_COLUMNS + [NULL_COLUMN]))
+            sketches = self.sketch_quantiles(sketch_columns, chunk_size=chunk_size, n_workers=n_workers, epsilon=epsilon)
+
+            for column in OUTLIER_COLUMNS:
+                Q1, Q3 = sketches[column].quantiles([0.25, 0.75])
+                IQR = Q3 - Q1
+                self.preprocessor.fit_clip_bounds(column, Q1 - 1.5 * IQR, Q3 + 1.5 * IQR)
+                logger.info(f"Approximate bounds for {column} : {self.preprocessor.clip_bounds[column]}")
+
+            ## clipping is monotonic, so the median of the clipped column is the clipped median
+            median = sketches[NULL_COLUMN].quantile(0.5)
+            if NULL_COLUMN in self.preprocessor.clip_bounds:
+                lower, upper = self.preprocessor.clip_bounds[NULL_COLUMN]
+                median = min(max(median, lower), upper)
+            self.preprocessor.fit_fill_value(NULL_COLUMN, median)
+
+            os.makedirs(PROCESSED_DIR, exist_ok=True)
+            writer = ChunkedArtifactWriter(self.processed_data_path, dtypes=PROCESSED_CHUNK_DTYPES)
+            for chunk in iter_artifact_chunks(self.train_path, chunk_size, columns=PROCESSING_COLUMNS, dtypes=CHUNK_DTYPES):
+                for column, (lower, upper) in self.preprocessor.clip_bounds.items():
+                    chunk[column] = chunk[column].clip(lower=lower, upper=upper)
+                chunk[NULL_COLUMN] = chunk[NULL_COLUMN].fillna(self.preprocessor.fill_values[NULL_COLUMN])
+                writer.write(chunk)
+
+            writer.close()
+            writer = None
+            self.preprocessor.save(PROCESSED_PREPROCESSOR_PATH)
+            logger.info(f"Out-of-core data processing completed : {self.processed_data_path}")
+
+        except Exception as e:
+            logger.error(f"Problem while running out-of-core data processing : {e}")
+            raise CustomException(f"Error while running out-of-core data processing : {e}", sys)
+
+        finally:
+            if writer is not None:
+                writer.close()
+
 
 if __name__ == "__main__":
     processor = DataProcessor()
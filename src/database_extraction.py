@@ -1,8 +1,16 @@
 import os
+import sys
 import csv
+import time
+import json
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 import mysql.connector
+import mysql.connector.pooling
 from mysql.connector import Error
 from config.db_config import DB_CONFIG
+from config.paths_config import *
+from config.schema_config import RAW_DTYPES
 from src.logger import get_logger
 from src.custom_exception import CustomException
 
@@ -10,13 +18,18 @@ logger = get_logger(__name__)
 
 class MySQLDataExtractor:
 
-    def __init__(self,db_config):
+    def __init__(self,db_config, connection=None, connection_factory=None):
         self.host = db_config["host"]
         self.user = db_config["user"]
         self.password = db_config["password"]
         self.database = db_config["database"]
         self.table_name = db_config["table_name"]
-        self.connection = None
+        ## an already open DB-API connection (e.g. sqlite3 for local testing) can be passed in
+        self.connection = connection
+        ## a connection passed in belongs to the caller : it is reused across extractions and never closed here
+        self.owns_connection = connection is None
+        ## callable returning a new connection, used by extract_parallel instead of a MySQL pool
+        self.connection_factory = connection_factory
 
         logger.info("Your Databse configuration has been set up")
 
@@ -28,20 +41,32 @@ class MySQLDataExtractor:
                 password = self.password,
                 database = self.database
             )
-            if self.connection.is_connected():
+            self.owns_connection = True
+            if self.is_connected():
                 logger.info("Succesfully connected to the Databse")
 
         except Error as e:
             raise CustomException(f"Error while connectig to the Database : {e}")
     
+    def is_connected(self):
+        if self.connection is None:
+            return False
+        if hasattr(self.connection, "is_connected"):
+            return self.connection.is_connected()
+        return True
+
     def disconnect(self):
-        if self.connection and self.connection.is_connected():
+        if not self.owns_connection:
+            return
+        if self.is_connected():
             self.connection.close()
             logger.info("Disconnected to the Database")
+        ## the next extraction opens a new connection instead of reusing the closed one
+        self.connection = None
 
     def extract_to_csv(self , output_folder = "./artifacts/raw"):
         try:
-            if not self.connection or not self.connection.is_connected():
+            if not self.is_connected():
                 self.connect()
 
             cursor = self.connection.cursor()
@@ -76,10 +101,289 @@ class MySQLDataExtractor:
                 cursor.close()
             self.disconnect()
 
+    def streaming_cursor(self):
+        ## unbuffered cursor: MySQL sends rows as they are fetched instead of all at once
+        if hasattr(self.connection, "is_connected"):
+            return self.connection.cursor(buffered=False)
+        return self.connection.cursor()
+
+    def placeholder(self, connection=None):
+        ## query parameter marker of the connection's driver
+        connection = connection if connection is not None else self.connection
+        return "?" if type(connection).__module__ == "sqlite3" else "%s"
+
+    def extract_streaming(self, output_folder = "./artifacts/raw", batch_size = 10000, file_format = "csv", query = None, params = (), file_name = "data"):
+        ## fetchmany batches written as they arrive, so memory stays at one batch; file_format is "csv" or "parquet"
+        writer = None
+        try:
+            if not self.is_connected():
+                self.connect()
+
+            cursor = self.streaming_cursor()
+            cursor.execute(query or f"SELECT * FROM {self.table_name}", params)
+            columns = [desc[0] for desc in cursor.description]
+
+            os.makedirs(output_folder , exist_ok=True)
+            file_path = os.path.join(output_folder, f"{file_name}.{file_format}")
+
+            writer = StreamingFileWriter(file_path, columns, file_format)
+
+            start = time.perf_counter()
+            rows = stream_to_file(cursor, writer, batch_size)
+
+            writer.close()
+            writer = None
+            logger.info(f"Data Succesfully saved to {file_path} : {rows} rows in {time.perf_counter() - start:.2f}s")
+            return rows
+
+        except Exception as e:
+            logger.error(f"Error in streaming extraction : {e}")
+            raise CustomException(f"Error in streaming extraction : {e}", sys)
+
+        finally:
+            if writer is not None:
+                writer.close()
+            if 'cursor' in locals():
+                cursor.close()
+            self.disconnect()
+
+    def read_watermark(self, watermark_path):
+        if not os.path.exists(watermark_path):
+            return None
+        with open(watermark_path) as f:
+            return json.load(f)["value"]
+
+    def write_watermark(self, watermark_path, key, value):
+        ## write to a temp file then rename, so a crash never leaves a half-written watermark
+        os.makedirs(os.path.dirname(watermark_path), exist_ok=True)
+        tmp_path = watermark_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"key" : key, "value" : value}, f)
+        os.replace(tmp_path, watermark_path)
+
+    def extract_incremental(self, partitions_dir = RAW_PARTITIONS_DIR, watermark_path = WATERMARK_PATH, key = "id", batch_size = 10000, file_format = "csv"):
+        ## fetch only rows with key above the stored high-water mark into a new partition file
+        try:
+            if not self.is_connected():
+                self.connect()
+
+            low = self.read_watermark(watermark_path)
+
+            ## pin the upper bound first so rows landing during the extraction go to the next run
+            cursor = self.connection.cursor()
+            if low is None:
+                cursor.execute(f"SELECT MAX({key}) FROM {self.table_name}")
+            else:
+                cursor.execute(f"SELECT MAX({key}) FROM {self.table_name} WHERE {key} > {self.placeholder()}", (low,))
+            high = cursor.fetchone()[0]
+            cursor.close()
+
+            if high is None:
+                logger.info(f"No new rows above watermark {key} = {low}")
+                self.disconnect()
+                return None
+
+            marker = self.placeholder()
+            if low is None:
+                query = f"SELECT * FROM {self.table_name} WHERE {key} <= {marker} ORDER BY {key}"
+                params = (high,)
+            else:
+                query = f"SELECT * FROM {self.table_name} WHERE {key} > {marker} AND {key} <= {marker} ORDER BY {key}"
+                params = (low, high)
+
+            ## zero-padded bounds so the names also sort in key order ; 0 marks the first extraction
+            file_name = f"part-{low if low is not None else 0:012d}-{high:012d}"
+            rows = self.extract_streaming(output_folder=partitions_dir, batch_size=batch_size, file_format=file_format,
+                                          query=query, params=params, file_name=file_name)
+
+            ## only move the watermark once the partition is fully written
+            self.write_watermark(watermark_path, key, high)
+            logger.info(f"Incremental extraction done : {rows} rows , watermark {key} : {low} -> {high}")
+            return os.path.join(partitions_dir, f"{file_name}.{file_format}")
+
+        except CustomException:
+            raise
+
+        except Exception as e:
+            logger.error(f"Error in incremental extraction : {e}")
+            raise CustomException(f"Error in incremental extraction : {e}", sys)
+
+    def connection_pool(self, size):
+        ## returns a function handing out connections: the injected factory, or a MySQL pool of `size` connections
+        if self.connection_factory is not None:
+            return self.connection_factory
+
+        pool = mysql.connector.pooling.MySQLConnectionPool(
+            pool_name = f"extract_{self.table_name}",
+            pool_size = size,
+            host = self.host,
+            user = self.user,
+            password = self.password,
+            database = self.database
+        )
+        return pool.get_connection
+
+    def key_ranges(self, connection, key, n_partitions):
+        cursor = connection.cursor()
+        cursor.execute(f"SELECT MIN({key}), MAX({key}) FROM {self.table_name}")
+        low, high = cursor.fetchone()
+        cursor.close()
+
+        if low is None:
+            return []
+
+        ## equal-width [start, end) ranges, the last one closed on the right
+        step = max((high - low + 1) // n_partitions, 1)
+        bounds = list(range(low, high + 1, step))[:n_partitions] + [high + 1]
+        return [(bounds[i], bounds[i + 1]) for i in range(len(bounds) - 1)]
+
+    def extract_range(self, get_connection, key, start, end, file_path, batch_size, file_format):
+        connection = get_connection()
+        try:
+            placeholder = self.placeholder(connection)
+            cursor = connection.cursor(buffered=False) if hasattr(connection, "is_connected") else connection.cursor()
+            cursor.execute(f"SELECT * FROM {self.table_name} WHERE {key} >= {placeholder} AND {key} < {placeholder} ORDER BY {key}", (start, end))
+
+            writer = StreamingFileWriter(file_path, [desc[0] for desc in cursor.description], file_format)
+            try:
+                rows = stream_to_file(cursor, writer, batch_size, log_prefix=os.path.basename(file_path))
+            finally:
+                writer.close()
+                cursor.close()
+            return rows
+
+        finally:
+            ## pooled connections go back to the pool on close
+            connection.close()
+
+    def extract_parallel(self, output_folder = RAW_PARTS_DIR, n_workers = 4, n_partitions = None, key = "id", batch_size = 10000, file_format = "csv"):
+        ## split the table into key ranges and read them concurrently, one part file per range plus a manifest
+        try:
+            n_partitions = n_partitions or n_workers
+            get_connection = self.connection_pool(n_workers)
+
+            connection = get_connection()
+            try:
+                ranges = self.key_ranges(connection, key, n_partitions)
+            finally:
+                connection.close()
+
+            os.makedirs(output_folder, exist_ok=True)
+            start_time = time.perf_counter()
+
+            with ThreadPoolExecutor(max_workers=n_workers, thread_name_prefix="extract") as pool:
+                futures = []
+                for idx, (start, end) in enumerate(ranges):
+                    file_path = os.path.join(output_folder, f"part-{idx:05d}.{file_format}")
+                    futures.append((idx, start, end, file_path, pool.submit(self.extract_range, get_connection, key, start, end, file_path, batch_size, file_format)))
+
+                partitions = []
+                for idx, start, end, file_path, future in futures:
+                    partitions.append({"file" : os.path.basename(file_path), "key" : key, "start" : start, "end" : end, "rows" : future.result()})
+
+            elapsed = time.perf_counter() - start_time
+            total_rows = sum(partition["rows"] for partition in partitions)
+            manifest = {"table" : self.table_name, "format" : file_format, "rows" : total_rows, "seconds" : round(elapsed, 3), "partitions" : partitions}
+
+            ## written last and renamed into place : ingestion reads the parts only through a complete manifest
+            manifest_path = os.path.join(output_folder, "manifest.json")
+            with open(manifest_path + ".tmp", "w") as f:
+                json.dump(manifest, f, indent=2)
+            os.replace(manifest_path + ".tmp", manifest_path)
+
+            logger.info(f"Parallel extraction done : {total_rows} rows in {len(partitions)} parts with {n_workers} workers , {elapsed:.2f}s ({total_rows / max(elapsed, 1e-9):.0f} rows/sec)")
+            return manifest
+
+        except Exception as e:
+            logger.error(f"Error in parallel extraction : {e}")
+            raise CustomException(f"Error in parallel extraction : {e}", sys)
+
+
+def stream_to_file(cursor, writer, batch_size, log_prefix = "Extracted"):
+    ## fetchmany loop shared by the streaming, incremental and parallel modes
+    rows = 0
+    start = time.perf_counter()
+    while True:
+        batch = cursor.fetchmany(batch_size)
+        if not batch:
+            break
+
+        writer.write(batch)
+        rows += len(batch)
+
+        elapsed = time.perf_counter() - start
+        logger.info(f"{log_prefix} : {rows} rows ({rows / max(elapsed, 1e-9):.0f} rows/sec)")
+    return rows
+
+
+def parquet_type(column, values):
+    ## arrow type of a raw column from the dtype plan, not from the first batch, where an all-NULL
+    ## column would be typed null and every later batch would fail to cast to it
+    import pyarrow as pa
+
+    dtype = RAW_DTYPES.get(column)
+    if dtype == "category":
+        return pa.string()
+    if dtype is not None:
+        return pa.from_numpy_dtype(np.dtype(dtype))
+    ## columns outside the plan keep the inferred type; all-NULL ones are assumed numeric
+    return pa.float64() if pa.types.is_null(values.type) else values.type
+
+
+class StreamingFileWriter:
+    ## appends batches of row tuples to a CSV or Parquet file
+
+    def __init__(self, file_path, columns, file_format = "csv"):
+        self.file_path = file_path
+        self.columns = columns
+        self.file_format = file_format
+        self.parquet_writer = None
+
+        if file_format == "csv":
+            self.file = open(file_path, mode="w", newline="", encoding="utf-8")
+            self.csv_writer = csv.writer(self.file)
+            self.csv_writer.writerow(columns)
+        elif file_format != "parquet":
+            raise ValueError(f"unsupported file format: {file_format}")
+
+    def write(self, batch):
+        if self.file_format == "csv":
+            self.csv_writer.writerows(batch)
+            return
+
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        arrays = [pa.array(values) for values in zip(*batch)]
+        if self.parquet_writer is None:
+            schema = pa.schema([pa.field(column, parquet_type(column, values)) for column, values in zip(self.columns, arrays)])
+            self.parquet_writer = pq.ParquetWriter(self.file_path, schema)
+        self.parquet_writer.write_table(pa.Table.from_arrays(arrays, names=self.columns).cast(self.parquet_writer.schema))
+
+    def close(self):
+        if self.file_format == "csv":
+            self.file.close()
+        elif self.parquet_writer is not None:
+            self.parquet_writer.close()
+
+
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="extract the survey table from MySQL")
+    parser.add_argument("--incremental", action="store_true", help="only fetch rows above the stored watermark into a new partition")
+    parser.add_argument("--parallel", type=int, default=0, help="read key ranges with this many pooled connections")
+    parser.add_argument("--format", default="csv", choices=["csv", "parquet"])
+    args = parser.parse_args()
+
     try:
         extractor = MySQLDataExtractor(DB_CONFIG)
-        extractor.extract_to_csv()
+        if args.incremental:
+            extractor.extract_incremental(file_format=args.format)
+        elif args.parallel:
+            extractor.extract_parallel(n_workers=args.parallel, file_format=args.format)
+        else:
+            extractor.extract_streaming(file_format=args.format)
     except CustomException as ce:
         logger.error(str(ce))
 
@@ -1,10 +1,15 @@
 import os 
 import pandas as pd 
 from src.logger import get_logger
+from src.profiler import profiled
 from src.custom_exception import CustomException
+from src.preprocessor import FittedPreprocessor
+from src.data_processing import DROP_COLUMNS, PROCESSING_COLUMNS
 from sklearn.model_selection import train_test_split
-from sklearn.feature_selection import mutual_info_classif
+from src.mutual_info import mutual_info_ranking, data_fingerprint, load_cached_ranking, save_cached_ranking
 from config.paths_config import *
+from config.schema_config import PROCESSED_DTYPES, ENGINEERED_DTYPES
+from config.feature_config import FEATURE_SELECTION_CONFIG
 from utils.helpers import *
 import sys
 
@@ -12,47 +17,62 @@ logger = get_logger(__name__)
 
 class FeaturEngineering:
 
-    def __init__(self):
+    def __init__(self, preprocessor=None):
         self.data_path = PROCESSED_DATA_PATH
         self.df = None
         self.label_mapping = {}
+        ## in-memory runs hand over the DataProcessor's preprocessor instead of reading it from disk
+        self.preprocessor = preprocessor if preprocessor is not None else FittedPreprocessor.load_or_new(PROCESSED_PREPROCESSOR_PATH)
 
-    def load_data(self):
+    @profiled()
+    def load_data(self, columns=PROCESSING_COLUMNS):
+        ## the processed data holds the same columns data processing read
         try:
             logger.info("Loading Data started ")
-            self.df = pd.read_csv(self.data_path)
+            self.df = read_artifact(self.data_path, columns=columns, dtypes=PROCESSED_DTYPES)
             logger.info ("data loaded successfully")
+            log_memory_footprint(logger, self.df, "Processed data")
         except Exception as e:
             logger.error(f"error while loadfing the data{e}")
             raise Exception (f"error while loading data", sys)
         
+    @profiled()
     def feature_construction(self):
         try:
             logger.info(f"feature Construction started")
-            self.df['Total Delay'] = self.df['Departure Delay in Minutes'] + self.df['Arrival Delay in Minutes']
-            self.df['Delay Ratio'] = self.df['Total Delay'] / (self.df['Flight Distance'] + 1)
+            ## float64 so Delay Ratio matches what the serving code computes
+            self.df['Total Delay'] = self.df['Departure Delay in Minutes'].astype('float64') + self.df['Arrival Delay in Minutes'].astype('float64')
+            self.df['Delay Ratio'] = self.df['Total Delay'] / (self.df['Flight Distance'].astype('float64') + 1)
             logger.info(f"feature construction done")
         except Exception as e:
             logger.error(f"error while feature construction: {e}")
             raise CustomException (f"error while feature constrution", sys)
         
+    @profiled()
     def bin_age(self):
         try:
             logger.info(f"binning the age  been started")
-            self.df['Age Group'] = pd.cut(self.df['Age'], bins=[0, 18, 30, 50, 100], labels=['Child', 'Youngster', 'Adult', 'Senior'])
+            ## ages outside (0, 100] would get no bin, and the NaN would break the int8 Age Group cast:
+            ## 0 counts as a Child and anything above 100 as a Senior
+            ages = self.df['Age'].clip(lower=1, upper=100)
+            self.df['Age Group'] = pd.cut(ages, bins=[0, 18, 30, 50, 100], labels=['Child', 'Youngster', 'Adult', 'Senior'])
             logger.info(f"binning age been done")
         except Exception as e:
             logger.error(f"error while binning age: {e}")
             raise CustomException (f"error while binning age", sys)
         
 
+    @profiled()
     def label_encoding(self):
         try:
             columns_to_encode = ['Gender', 'Customer Type', 'Type of Travel', 'Class', 'satisfaction', 'Age Group']
             logger.info(f"performing the label encode on {columns_to_encode}")
 
-            self.df, self.label_mapping = label_encode(self.df, columns_to_encode)
-            
+            ## the encoder lives in the preprocessor so serving reuses the same codes
+            encoder = self.preprocessor.encoder
+            self.df = encoder.fit_transform(self.df, columns_to_encode)
+            self.label_mapping = {col : encoder.mapping(col) for col in columns_to_encode}
+
             for col, mapping in self.label_mapping.items():
                 logger.info(f"mapping for the {col} : {mapping}")
             logger.info(f"label encoding been done")
@@ -62,25 +82,36 @@ class FeaturEngineering:
             raise CustomException (f"error while label encoding", sys)
         
 
+    @profiled()
     def feature_selection(self):
         try:
             logger.info(f"feature selection started")
-            X = self.df.drop(columns='satisfaction')
-            y = self.df['satisfaction']
-            X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-            mutual_info = mutual_info_classif(X_train, y_train, discrete_features=True)
+            config = FEATURE_SELECTION_CONFIG
+            fingerprint = data_fingerprint(self.df, config)
+            mutual_info_df = load_cached_ranking(MUTUAL_INFO_CACHE_PATH, fingerprint) if config["cache"] else None
+
+            if mutual_info_df is not None:
+                logger.info(f"data unchanged, reusing cached mutual information ranking {fingerprint[:12]}")
+            else:
+                X = self.df.drop(columns='satisfaction')
+                y = self.df['satisfaction']
+                X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=config["test_size"], random_state=config["random_state"])
+
+                if config["sample_size"] and config["sample_size"] < len(X_train):
+                    X_train, _, y_train, _ = train_test_split(X_train, y_train, train_size=config["sample_size"],
+                                                              stratify=y_train, random_state=config["random_state"])
+                    logger.info(f"mutual information on a stratified sample of {len(X_train)} rows")
+
+                mutual_info_df = mutual_info_ranking(X_train, y_train, n_jobs=config["n_jobs"])
+                if config["cache"]:
+                    save_cached_ranking(MUTUAL_INFO_CACHE_PATH, fingerprint, mutual_info_df)
 
-            mutual_info_df = pd.DataFrame({
-                'Feature': X.columns,
-                'Mutual Information': mutual_info
-                }).sort_values(by='Mutual Information', ascending=False)
-            
             logger.info(f"Mutual information table is : \n {mutual_info_df}")
 
-            top_features = mutual_info_df.head(12)['Feature'].tolist()
+            top_features = mutual_info_df.head(config["top_k"])['Feature'].tolist()
 
-            self.df = self.df[top_features + ['satisfaction']]
+            self.df = apply_dtypes(self.df[top_features + ['satisfaction']], ENGINEERED_DTYPES)
+            log_memory_footprint(logger, self.df, "Engineered data")
             logger.info(f"top Features : {top_features}")
             logger.info(f"feature selection done")
 
@@ -88,27 +119,55 @@ class FeaturEngineering:
             logger.error(f"error while feature selection : {e}")
             raise CustomException (f"error while feature selection ", sys)
         
-    def save_data(self):
+    @profiled()
+    def transform_new_data(self, df, columns):
+        ## apply the already fitted preprocessing to new raw rows (no refitting), keeping only `columns`
+        try:
+            logger.info(f"transforming {len(df)} new rows with the fitted preprocessor")
+            self.df = self.preprocessor.transform(df.drop(columns=DROP_COLUMNS, errors='ignore'))
+            self.feature_construction()
+            self.bin_age()
+            self.df['Age Group'] = self.preprocessor.encoder.encode('Age Group', self.df['Age Group'])
+            ## LightGBM reports feature names with spaces replaced by underscores
+            names = {column.replace(' ', '_') : column for column in self.df.columns}
+            return self.df[[names.get(column, column) for column in columns]]
+
+        except Exception as e:
+            logger.error(f"error while transforming new data : {e}")
+            raise CustomException (f"error while transforming new data", sys)
+
+    @profiled()
+    def save_data(self, df=None, save_preprocessor=True):
+        ## save_preprocessor=False when the caller writes the preprocessor itself (in-memory runs save it synchronously)
         try:
             logger.info("saving your data........")
             os.makedirs(ENGINEERED_DATA, exist_ok=True)
-            self.df.to_csv(ENGINEERED_DATA_PATH, index = False)
+            write_artifact(self.df if df is None else df, ENGINEERED_DATA_PATH)
+            if save_preprocessor:
+                self.preprocessor.save(ENGINEERED_PREPROCESSOR_PATH)
             logger.info(f"Data saved succesfull at : {ENGINEERED_DATA_PATH}")
 
         except Exception as e:
             logger.info(f"error while saving the data  {e}")
             raise CustomException (f"error while saving the data", sys)
     
-    def run(self):
+    def run(self, df=None, save=True):
+        ## pass df to skip reading the processed data from disk, save=False to skip writing the result
         try:
             logger.info("starting you feature engineering pipeline")
-            self.load_data()
+            if df is None:
+                self.load_data()
+            else:
+                ## copy so the caller's frame (possibly still being written in the background) is untouched
+                self.df = df.copy()
             self.feature_construction()
             self.bin_age()
             self.label_encoding()
             self.feature_selection()
-            self.save_data()
+            if save:
+                self.save_data()
             logger.info("Feature engineering pipeline beed ended")
+            return self.df
 
         except Exception as e:
             logger.error(f"error in FE pipeline {e}")
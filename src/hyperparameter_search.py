@@ -0,0 +1,229 @@
+import os
+import sys
+import math
+import time
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import lightgbm as lgb
+from sklearn.model_selection import StratifiedKFold, train_test_split
+from sklearn.metrics import accuracy_score
+from src.logger import get_logger
+from src.custom_exception import CustomException
+
+logger = get_logger(__name__)
+
+
+def expand_grid(param_grid):
+    ## {"a": [1, 2], "b": [3]} -> [{"a": 1, "b": 3}, {"a": 2, "b": 3}], same order as sklearn's ParameterGrid
+    keys = sorted(param_grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(param_grid[key] for key in keys))]
+
+
+class SuccessiveHalvingSearch:
+    """Successive halving over a LightGBM parameter grid.
+
+    Every configuration starts on a small stratified fraction of the training rows with
+    the same fraction of its n_estimators. After each rung only the best 1/eta (by mean
+    CV accuracy) move on, with eta times more rows and trees, until the last rung uses all
+    of them. Each fold fit stops early on a stratified early_stopping_fraction of its own
+    training rows, so the validation fold that scores it never picks its number of trees.
+
+    max_fits / max_seconds stop the search between fits; the best configuration of the
+    last finished rung is then used. Folds of a rung run in n_jobs threads (LightGBM
+    releases the GIL while boosting).
+    """
+
+    def __init__(self, param_grid, cv = 3, eta = 3, min_fraction = None, early_stopping_rounds = 20, early_stopping_fraction = 0.1,
+                 max_fits = None, max_seconds = None, n_jobs = 0, random_state = 42):
+        self.configs = expand_grid(param_grid)
+        self.cv = cv
+        self.eta = eta
+        self.early_stopping_rounds = early_stopping_rounds
+        self.early_stopping_fraction = early_stopping_fraction
+        self.max_fits = max_fits
+        self.max_seconds = max_seconds
+        self.n_jobs = n_jobs or os.cpu_count()
+        self.random_state = random_state
+
+        ## rungs until at most eta configurations reach the last one, which uses every row
+        ## (27 configs with eta 3 : 27 -> 9 -> 3 ; counted on integers, math.log(125, 5) is 3.0000000000000004)
+        self.n_rungs = 1
+        while eta ** self.n_rungs < len(self.configs):
+            self.n_rungs += 1
+        self.min_fraction = min_fraction if min_fraction is not None else float(eta) ** -(self.n_rungs - 1)
+
+        self.trials = []
+        self.n_fits = 0
+        self.best_params_ = None
+        self.best_score_ = None
+        self.best_estimator_ = None
+
+    def budget_left(self, started):
+        if self.max_fits is not None and self.n_fits >= self.max_fits:
+            return False
+        if self.max_seconds is not None and time.perf_counter() - started >= self.max_seconds:
+            return False
+        return True
+
+    def _fit_fold(self, params, X, y, train_idx, valid_idx, threads):
+        start = time.perf_counter()
+        X_fit, X_stop, y_fit, y_stop = train_test_split(X.iloc[train_idx], y.iloc[train_idx], test_size=self.early_stopping_fraction,
+                                                        stratify=y.iloc[train_idx], random_state=self.random_state)
+        model = lgb.LGBMClassifier(**params, n_jobs=threads, verbose=-1)
+        model.fit(X_fit, y_fit, eval_set=[(X_stop, y_stop)], callbacks=[lgb.early_stopping(self.early_stopping_rounds, verbose=False)])
+        score = accuracy_score(y.iloc[valid_idx], model.predict(X.iloc[valid_idx]))
+        return score, model.best_iteration_ or params["n_estimators"], time.perf_counter() - start
+
+    def _subsample(self, X, y, fraction):
+        if fraction >= 1.0:
+            return X, y
+        X_sub, _, y_sub, _ = train_test_split(X, y, train_size=fraction, stratify=y, random_state=self.random_state)
+        return X_sub, y_sub
+
+    def fit(self, X, y):
+        try:
+            started = time.perf_counter()
+            survivors = list(range(len(self.configs)))
+            best_of_rung = None
+
+            for rung in range(self.n_rungs):
+                fraction = min(self.min_fraction * self.eta ** rung, 1.0) if rung < self.n_rungs - 1 else 1.0
+                X_rung, y_rung = self._subsample(X, y, fraction)
+                folds = list(StratifiedKFold(n_splits=self.cv, shuffle=True, random_state=self.random_state).split(X_rung, y_rung))
+                logger.info(f"rung {rung} : {len(survivors)} configs on {len(X_rung)} rows ({fraction:.3f} of the data)")
+
+                rung_results = []
+                for config_id in survivors:
+                    if not self.budget_left(started):
+                        logger.info(f"search budget used up after {self.n_fits} fits")
+                        break
+
+                    params = dict(self.configs[config_id])
+                    params["n_estimators"] = max(int(math.ceil(params.get("n_estimators", 100) * fraction)), 1)
+                    workers = min(self.n_jobs, len(folds))
+                    threads = max(os.cpu_count() // workers, 1)
+
+                    with ThreadPoolExecutor(max_workers=workers) as pool:
+                        fold_results = list(pool.map(lambda fold : self._fit_fold(params, X_rung, y_rung, fold[0], fold[1], threads), folds))
+                    self.n_fits += len(folds)
+
+                    scores, iterations, seconds = zip(*fold_results)
+                    trial = {
+                        "trial" : len(self.trials),
+                        "config_id" : config_id,
+                        "rung" : rung,
+                        "fraction" : fraction,
+                        "params" : params,
+                        "mean_accuracy" : float(np.mean(scores)),
+                        "best_iteration" : int(round(np.mean(iterations))),
+                        "fit_seconds" : float(np.sum(seconds)),
+                    }
+                    self.trials.append(trial)
+                    rung_results.append(trial)
+
+                ## a rung cut short by the budget only counts if there is no earlier rung to fall back on
+                if len(rung_results) < len(survivors) and best_of_rung is not None:
+                    break
+                if not rung_results:
+                    break
+
+                rung_results.sort(key=lambda trial : trial["mean_accuracy"], reverse=True)
+                best_of_rung = rung_results[0]
+                survivors = [trial["config_id"] for trial in rung_results[:max(len(rung_results) // self.eta, 1)]]
+
+                if not self.budget_left(started):
+                    break
+
+            if best_of_rung is None:
+                raise ValueError("search budget too small to fit a single configuration")
+
+            ## refit the winner on all rows with the number of trees early stopping settled on
+            self.best_params_ = dict(self.configs[best_of_rung["config_id"]])
+            self.best_score_ = best_of_rung["mean_accuracy"]
+            n_trees = self.best_params_.get("n_estimators", 100)
+            n_trees = min(int(math.ceil(best_of_rung["best_iteration"] / best_of_rung["fraction"])), n_trees)
+            refit_params = dict(self.best_params_, n_estimators=n_trees)
+            self.best_estimator_ = lgb.LGBMClassifier(**refit_params).fit(X, y)
+
+            logger.info(f"successive halving done : {self.n_fits} fits in {time.perf_counter() - started:.1f}s , best : {self.best_params_} ({self.best_score_:.4f})")
+            return self
+
+        except Exception as e:
+            logger.error(f"Error in successive halving search: {e}")
+            raise CustomException(f"Error in successive halving search: {e}", sys)
+
+
+class SharedDatasetGridSearch:
+    """Grid search that bins the training data once.
+
+    One lgb.Dataset is constructed on the whole training split and every fold is a
+    subset view of it, so LightGBM's histogram bins are computed a single time. Grid
+    points that differ only in n_estimators share one boosting run: the model is trained
+    to the largest n_estimators and scored at each smaller one with num_iteration.
+    Folds are the same unshuffled StratifiedKFold GridSearchCV uses; the winner is refit
+    as an LGBMClassifier on the full split.
+
+    The first n trees of a longer run are the model a separate n-tree fit would build
+    only when boosting never looks ahead: no early stopping, and every other parameter
+    the same. A grid with early stopping, or with parameters that depend on the round
+    count (e.g. a learning rate schedule), needs separate fits. The bins also come from
+    the whole split rather than from each training fold, so scores can differ slightly
+    from GridSearchCV's.
+    """
+
+    def __init__(self, param_grid, cv = 3):
+        self.param_grid = param_grid
+        self.cv = cv
+
+        self.results = []
+        self.timings = {}
+        self.best_params_ = None
+        self.best_score_ = None
+        self.best_estimator_ = None
+
+    def fit(self, X, y):
+        try:
+            started = time.perf_counter()
+            ## keep the raw data, folds are built from it with subset()
+            dataset = lgb.Dataset(X, label=y, params={"verbose" : -1, "feature_pre_filter" : False}, free_raw_data=False).construct()
+            self.timings["dataset_seconds"] = time.perf_counter() - started
+
+            folds = list(StratifiedKFold(n_splits=self.cv).split(X, y))
+            fold_sets = [(dataset.subset(sorted(train_idx)), X.iloc[valid_idx], y.iloc[valid_idx].to_numpy()) for train_idx, valid_idx in folds]
+
+            grid = dict(self.param_grid)
+            n_estimators = sorted(grid.pop("n_estimators", [100]))
+            scores = {}
+
+            boosting_started = time.perf_counter()
+            for params in expand_grid(grid):
+                native_params = dict(params, objective="binary", verbose=-1, feature_pre_filter=False)
+                for train_set, X_valid, y_valid in fold_sets:
+                    booster = lgb.train(native_params, train_set, num_boost_round=n_estimators[-1])
+                    for n_trees in n_estimators:
+                        y_pred = (booster.predict(X_valid, num_iteration=n_trees) > 0.5).astype(y_valid.dtype)
+                        scores.setdefault((tuple(sorted(params.items())), n_trees), []).append(accuracy_score(y_valid, y_pred))
+
+            self.timings["boosting_seconds"] = time.perf_counter() - boosting_started
+            self.timings["boosting_runs"] = len(expand_grid(grid)) * len(fold_sets)
+
+            for (params, n_trees), fold_scores in scores.items():
+                self.results.append({"params" : dict(params, n_estimators=n_trees), "mean_accuracy" : float(np.mean(fold_scores))})
+
+            ## first best in grid order wins ties
+            best = max(self.results, key=lambda result : result["mean_accuracy"])
+            self.best_params_ = best["params"]
+            self.best_score_ = best["mean_accuracy"]
+
+            refit_started = time.perf_counter()
+            self.best_estimator_ = lgb.LGBMClassifier(**self.best_params_).fit(X, y)
+            self.timings["refit_seconds"] = time.perf_counter() - refit_started
+            self.timings["search_seconds"] = time.perf_counter() - started
+
+            logger.info(f"shared dataset grid search done : {self.timings} , best : {self.best_params_} ({self.best_score_:.4f})")
+            return self
+
+        except Exception as e:
+            logger.error(f"Error in shared dataset grid search: {e}")
+            raise CustomException(f"Error in shared dataset grid search: {e}", sys)
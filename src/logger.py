@@ -1,19 +1,273 @@
 import logging
-import os 
+import logging.handlers
+import os
+import json
+import time
+import queue
+import atexit
+import threading
+import multiprocessing.util
 from datetime import datetime
+from config.logging_config import LOGGING_CONFIG
 
 LOGS_DIR = 'logs'
 os.makedirs(LOGS_DIR , exist_ok=True)
 
 LOG_FILE = os.path.join(LOGS_DIR , f"log_{datetime.now().strftime('%Y-%m-%d')}.log")
 
-logging.basicConfig(
-    filename=LOG_FILE,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    level = logging.INFO
-)
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+LOG_MODE = os.environ.get("LOG_MODE", LOGGING_CONFIG["mode"])
+
+
+class JsonFormatter(logging.Formatter):
+    ## one JSON object per line
+    def format(self, record):
+        entry = {
+            "time" : self.formatTime(record),
+            "level" : record.levelname,
+            "logger" : record.name,
+            "message" : record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class Sampler:
+    ## keeps 1 in every `every` calls and at most `per_second` calls per second
+    def __init__(self, every = 1, per_second = None):
+        self.every = max(int(every), 1)
+        self.per_second = per_second
+        self.seen = 0
+        self.window = 0
+        self.window_count = 0
+        self.dropped = 0
+
+    def allow(self):
+        ## unlocked on purpose: a race only lets an extra record through or drops one
+        self.seen += 1
+        if self.every > 1 and self.seen % self.every:
+            self.dropped += 1
+            return False
+
+        if self.per_second is not None:
+            window = int(time.monotonic())
+            if window != self.window:
+                self.window, self.window_count = window, 0
+            if self.window_count >= self.per_second:
+                self.dropped += 1
+                return False
+            self.window_count += 1
+        return True
+
+
+class SampledLogger(logging.LoggerAdapter):
+    """Logger for hot-path messages, thinned out by a Sampler.
+
+    The sampler is asked before a LogRecord is built, so a dropped message costs about
+    as much as a disabled log level. Warnings and errors always pass.
+    """
+
+    def __init__(self, logger, sampler):
+        super().__init__(logger, {})
+        self.sampler = sampler
+
+    def log(self, level, msg, *args, **kwargs):
+        if level < logging.WARNING and not self.sampler.allow():
+            return
+        super().log(level, msg, *args, **kwargs)
+
+
+class BatchFileHandler(logging.Handler):
+    """Collects formatted records and appends them to the log file with one write per flush.
+
+    The file is opened with O_APPEND and nothing is buffered by Python's io layer, so
+    forked processes can share the file without writing each other's lines twice.
+    Like logging.FileHandler it reopens the file after close(): logging.config.dictConfig
+    (called by mlflow on import) closes every handler, and writing to the old descriptor
+    number would land in whatever file was opened next.
+    """
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self.fd = None
+        self.pending = []
+
+    def emit(self, record):
+        try:
+            self.pending.append(self.format(record) + "\n")
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        with self.lock:
+            if not self.pending:
+                return
+            data = "".join(self.pending).encode("utf-8")
+            self.pending = []
+            if self.fd is None:
+                self.fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            while data:
+                written = os.write(self.fd, data)
+                data = data[written:]
+
+    def close(self):
+        with self.lock:
+            self.flush()
+            if self.fd is not None:
+                os.close(self.fd)
+                self.fd = None
+        super().close()
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the writer thread without blocking the caller.
+
+    The queue is a SimpleQueue (no lock or condition variable on put); when more than
+    max_size records are waiting the record is counted and dropped. Formatting is left
+    to the writer, only the message arguments are merged here so later changes to them
+    don't show up in the log.
+    """
+
+    def __init__(self, log_queue, max_size = 100000):
+        super().__init__(log_queue)
+        self.max_size = int(max_size)
+        self.dropped = 0
+
+    def prepare(self, record):
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record):
+        if self.queue.qsize() >= self.max_size:
+            self.dropped += 1
+            return
+        self.queue.put(record)
+
+
+class LogWriter:
+    """Background thread that drains the log queue in batches.
+
+    After the first record arrives the writer waits flush_interval seconds for more, then
+    handles up to batch_size records together and flushes the file once per batch
+    instead of once per record.
+    """
+
+    def __init__(self, log_queue, handler, queue_handler, batch_size = 500, flush_interval = 0.05):
+        self.queue = log_queue
+        self.handler = handler
+        self.queue_handler = queue_handler
+        self.batch_size = int(batch_size)
+        self.flush_interval = flush_interval
+        self.reported_drops = 0
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.thread is not None and self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = [self.queue.get()]
+            if batch[0] is not None and self.flush_interval:
+                time.sleep(self.flush_interval)
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            for record in batch:
+                if record is None:
+                    stopping = True
+                elif record.levelno >= self.handler.level:
+                    self.handler.handle(record)
+
+            dropped = self.queue_handler.dropped
+            if dropped > self.reported_drops:
+                self.handler.handle(logging.makeLogRecord({"name" : __name__, "levelno" : logging.WARNING, "levelname" : "WARNING",
+                                                           "msg" : f"log queue full, {dropped - self.reported_drops} records dropped"}))
+                self.reported_drops = dropped
+
+            try:
+                self.handler.flush()
+            except OSError:
+                pass
+
+
+writer = None
+samplers = {}
+
+
+def setup_logging():
+    global writer
+    formatter = JsonFormatter() if LOGGING_CONFIG["json"] else logging.Formatter(LOG_FORMAT)
+
+    if LOG_MODE != "async":
+        handler = logging.FileHandler(LOG_FILE)
+        handler.setFormatter(formatter)
+        logging.basicConfig(handlers=[handler], level = logging.INFO)
+        return
+
+    file_handler = BatchFileHandler(LOG_FILE)
+    file_handler.setFormatter(formatter)
+
+    queue_handler = DroppingQueueHandler(queue.SimpleQueue(), max_size = LOGGING_CONFIG["queue_size"])
+    logging.basicConfig(handlers=[queue_handler], level = logging.INFO)
+    ## processName is not in our formats, skip looking it up for every record
+    logging.logMultiprocessing = False
+
+    writer = LogWriter(queue_handler.queue, file_handler, queue_handler,
+                       batch_size = LOGGING_CONFIG["batch_size"], flush_interval = LOGGING_CONFIG["flush_interval"])
+    writer.start()
+    atexit.register(shutdown_logging)
+
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=_after_fork)
+    ## multiprocessing children leave through os._exit, which skips atexit; the finalizer
+    ## is registered after their start-up has cleared the parent's finalizers
+    multiprocessing.util.register_after_fork(LogWriter, lambda _ : multiprocessing.util.Finalize(None, shutdown_logging, exitpriority=0))
+
+
+def shutdown_logging():
+    ## writes whatever is still queued
+    if writer is not None:
+        writer.stop()
+        writer.handler.flush()
+
+
+def _after_fork():
+    ## the writer thread does not survive fork: give the child its own queue and thread
+    global writer
+    if writer is None:
+        return
+    writer.handler.pending = []
+    queue_handler = writer.queue_handler
+    queue_handler.queue = queue.SimpleQueue()
+    writer = LogWriter(queue_handler.queue, writer.handler, queue_handler, batch_size = writer.batch_size, flush_interval = writer.flush_interval)
+    writer.start()
+
+
+setup_logging()
 
 def get_logger(name):
     logger = logging.getLogger(name)
     logger.setLevel(logging.INFO)
-    return logger
\ No newline at end of file
+
+    ## loggers listed under "sampling" come back wrapped, sharing one sampler per name
+    sampling = LOGGING_CONFIG["sampling"].get(name)
+    if sampling is not None:
+        if name not in samplers:
+            samplers[name] = Sampler(**sampling)
+        return SampledLogger(logger, samplers[name])
+    return logger
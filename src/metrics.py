@@ -0,0 +1,272 @@
+import os
+import sys
+import glob
+import json
+import bisect
+import threading
+from src.logger import get_logger
+from src.custom_exception import CustomException
+
+logger = get_logger(__name__)
+
+## upper bounds in seconds / rows, the +Inf bucket is added on top
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names, values, extra = ()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = [(name, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')) for name, value in pairs]
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+class CounterChild:
+    ## one label combination of a counter; the lock is only ever held for the addition
+    __slots__ = ("lock", "value")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount = 1):
+        with self.lock:
+            self.value += amount
+
+    def snapshot(self):
+        return self.value
+
+    def reset(self):
+        self.lock = threading.Lock()
+        self.value = 0.0
+
+
+class HistogramChild:
+    ## per-bucket (not cumulative) counts, so an observation touches a single slot
+    __slots__ = ("lock", "buckets", "counts", "sum")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        idx = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[idx] += 1
+            self.sum += value
+
+    def snapshot(self):
+        with self.lock:
+            return {"counts" : list(self.counts), "sum" : self.sum}
+
+    def reset(self):
+        self.lock = threading.Lock()
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+
+class Metric:
+    """A counter or histogram with a fixed set of label names.
+
+    labels(...) returns the child for one combination of label values; children are
+    created once and can be kept by the caller so the hot path skips the lookup.
+    """
+
+    def __init__(self, name, help, kind, labelnames = (), buckets = None):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(float(bucket) for bucket in buckets) if buckets is not None else None
+        self.children = {}
+        self.lock = threading.Lock()
+
+    def _new_child(self):
+        return HistogramChild(self.buckets) if self.kind == "histogram" else CounterChild()
+
+    def labels(self, *values):
+        values = tuple(str(value) for value in values)
+        child = self.children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            with self.lock:
+                child = self.children.setdefault(values, self._new_child())
+        return child
+
+    def inc(self, amount = 1):
+        self.labels().inc(amount)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def snapshot(self):
+        return [[list(values), child.snapshot()] for values, child in list(self.children.items())]
+
+    def reset(self):
+        for child in self.children.values():
+            child.reset()
+        self.lock = threading.Lock()
+
+
+class MetricsRegistry:
+    """In-process counters and histograms rendered in the Prometheus text format.
+
+    Each server process counts on its own. With a multiprocess_dir every process also
+    writes its snapshot to <dir>/metrics_<pid>.json (from a background thread, every
+    flush_interval seconds, and on each scrape) and render() adds up the files of all
+    processes, so any worker can answer /metrics for the whole server. Files of exited
+    workers are kept so counters never go down; empty the directory before starting
+    the server.
+    """
+
+    def __init__(self, multiprocess_dir = None, flush_interval = 1.0):
+        self.metrics = {}
+        self.multiprocess_dir = multiprocess_dir
+        self.flush_interval = flush_interval
+
+        self.writer = None
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+
+        ## a forked worker must not report (or write under its own pid) what the parent counted
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def counter(self, name, help, labelnames = ()):
+        return self._register(Metric(name, help, "counter", labelnames))
+
+    def histogram(self, name, help, labelnames = (), buckets = LATENCY_BUCKETS):
+        return self._register(Metric(name, help, "histogram", labelnames, buckets))
+
+    def _register(self, metric):
+        with self.lock:
+            if metric.name in self.metrics:
+                raise ValueError(f"metric {metric.name} is already registered")
+            self.metrics[metric.name] = metric
+        return metric
+
+    def _after_fork(self):
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.writer = None
+        for metric in self.metrics.values():
+            metric.reset()
+
+    ## ---------- multiprocess ----------
+
+    def snapshot_path(self, pid = None):
+        return os.path.join(self.multiprocess_dir, f"metrics_{pid or os.getpid()}.json")
+
+    def start(self):
+        ## the writer is started lazily so it is created inside each server process after fork
+        if self.multiprocess_dir is None or self.writer is not None:
+            return
+        with self.lock:
+            if self.writer is None:
+                os.makedirs(self.multiprocess_dir, exist_ok=True)
+                self.writer = threading.Thread(target=self._run, name="metrics-writer", daemon=True)
+                self.writer.start()
+                logger.info(f"Metrics writer started : {self.snapshot_path()} every {self.flush_interval}s")
+
+    def stop(self):
+        if self.writer is not None:
+            self.stop_event.set()
+            self.writer.join()
+            self.write_snapshot()
+
+    def _run(self):
+        while not self.stop_event.wait(self.flush_interval):
+            try:
+                self.write_snapshot()
+            except Exception as e:
+                logger.error(f"Error while writing metrics snapshot: {e}")
+
+    def snapshot(self):
+        return {
+            name : {"kind" : metric.kind, "help" : metric.help, "labelnames" : list(metric.labelnames),
+                    "buckets" : list(metric.buckets) if metric.buckets is not None else None, "samples" : metric.snapshot()}
+            for name, metric in list(self.metrics.items())
+        }
+
+    def write_snapshot(self):
+        path = self.snapshot_path()
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+
+    def collect(self):
+        ## this process only, or the sum over every process that wrote a snapshot
+        if self.multiprocess_dir is None:
+            return self.snapshot()
+
+        self.start()
+        self.write_snapshot()
+
+        merged = {}
+        for path in sorted(glob.glob(os.path.join(self.multiprocess_dir, "metrics_*.json"))):
+            try:
+                with open(path) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable metrics snapshot {path}: {e}")
+                continue
+
+            for name, metric in snapshot.items():
+                target = merged.setdefault(name, dict(metric, samples={}))
+                for values, sample in metric["samples"]:
+                    key = tuple(values)
+                    if metric["kind"] == "histogram":
+                        total = target["samples"].setdefault(key, {"counts" : [0] * len(sample["counts"]), "sum" : 0.0})
+                        total["counts"] = [a + b for a, b in zip(total["counts"], sample["counts"])]
+                        total["sum"] += sample["sum"]
+                    else:
+                        target["samples"][key] = target["samples"].get(key, 0.0) + sample
+
+        for metric in merged.values():
+            metric["samples"] = [[list(key), sample] for key, sample in metric["samples"].items()]
+        return merged
+
+    ## ---------- exposition ----------
+
+    def render(self):
+        try:
+            lines = []
+            for name, metric in self.collect().items():
+                ## counters are exposed as <name>_total, and HELP / TYPE have to use the same name as the samples
+                family = f"{name}_total" if metric["kind"] == "counter" else name
+                lines.append(f"# HELP {family} {metric['help']}")
+                lines.append(f"# TYPE {family} {metric['kind']}")
+                labelnames = metric["labelnames"]
+
+                for values, sample in sorted(metric["samples"]):
+                    if metric["kind"] == "counter":
+                        lines.append(f"{family}{_format_labels(labelnames, values)} {_format_value(sample)}")
+                        continue
+
+                    cumulative = 0
+                    for bound, count in zip(list(metric["buckets"]) + [float("inf")], sample["counts"]):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(labelnames, values, [('le', _format_value(bound))])} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labelnames, values)} {_format_value(sample['sum'])}")
+                    lines.append(f"{name}_count{_format_labels(labelnames, values)} {cumulative}")
+
+            return "\n".join(lines) + "\n"
+
+        except Exception as e:
+            logger.error(f"Error while rendering metrics: {e}")
+            raise CustomException(f"Error while rendering metrics: {e}", sys)
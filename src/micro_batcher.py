@@ -0,0 +1,157 @@
+import os
+import sys
+import time
+import queue
+import weakref
+import threading
+import numpy as np
+from concurrent.futures import Future
+from src.logger import get_logger
+from src.custom_exception import CustomException
+
+logger = get_logger(__name__)
+
+
+class MicroBatcher:
+    """Queues single rows from concurrent requests and scores them together.
+
+    A batch is flushed when max_batch_size rows are waiting or max_wait_ms has passed
+    since the first row of the batch arrived. predict_fn gets a 2D array and must return
+    one result per row, in order; a batch with any other number of results fails every
+    row in it. on_flush, if given, is called with the batch size and the seconds the model
+    call took after every flush. predict() waits at most timeout seconds for its row.
+    """
+
+    def __init__(self, predict_fn, max_batch_size = 64, max_wait_ms = 5, on_flush = None, timeout = 10.0):
+        self.predict_fn = predict_fn
+        self.on_flush = on_flush
+        self.max_batch_size = int(max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self.timeout = timeout
+
+        self.queue = queue.Queue()
+        self.worker = None
+        self.lock = threading.Lock()
+
+        ## batch size histogram buckets: 1, 2, 4, ... up to max_batch_size
+        self.buckets = []
+        bucket = 1
+        while bucket < self.max_batch_size:
+            self.buckets.append(bucket)
+            bucket *= 2
+        self.buckets.append(self.max_batch_size)
+
+        self.batch_size_counts = [0] * len(self.buckets)
+        self.batches = 0
+        self.rows = 0
+        self.max_queue_depth = 0
+
+        ## a forked child (gunicorn --preload) inherits a dead worker and the parent's queue
+        if hasattr(os, "register_at_fork"):
+            ref = weakref.ref(self)
+            os.register_at_fork(after_in_child=lambda : ref() is not None and ref()._after_fork())
+
+    def _after_fork(self):
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.worker = None
+
+    def start(self):
+        ## the worker is started lazily so it is created inside each server process after fork
+        with self.lock:
+            if self.worker is None or not self.worker.is_alive():
+                self.worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+                self.worker.start()
+                logger.info(f"Micro batcher started : max_batch_size : {self.max_batch_size} , max_wait_ms : {self.max_wait * 1000}")
+
+    def stop(self):
+        if self.worker is not None and self.worker.is_alive():
+            self.queue.put(None)
+            self.worker.join()
+            logger.info("Micro batcher stopped")
+
+    def submit(self, row):
+        if self.worker is None or not self.worker.is_alive():
+            self.start()
+
+        future = Future()
+        self.queue.put((row, future))
+
+        depth = self.queue.qsize()
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+        return future
+
+    def predict(self, row, timeout = None):
+        ## a stuck worker raises concurrent.futures.TimeoutError instead of blocking the request forever
+        return self.submit(row).result(timeout=self.timeout if timeout is None else timeout)
+
+    def _collect(self):
+        first = self.queue.get()
+        if first is None:
+            return None, True
+
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+
+        return batch, False
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = self._collect()
+            if batch:
+                self._flush(batch)
+
+    def _flush(self, batch):
+        rows = [row for row, _ in batch]
+        futures = [future for _, future in batch]
+
+        start = time.perf_counter()
+        try:
+            results = self.predict_fn(np.asarray(rows, dtype=np.float64))
+            if len(results) != len(futures):
+                raise ValueError(f"predict_fn returned {len(results)} results for {len(futures)} rows")
+            for future, result in zip(futures, results):
+                future.set_result(result)
+
+        except Exception as e:
+            logger.error(f"Error while scoring micro batch of {len(batch)} rows: {e}")
+            for future in futures:
+                future.set_exception(CustomException(f"Error while scoring micro batch: {e}", sys))
+
+        if self.on_flush is not None:
+            ## a failing callback (e.g. metrics) must not stop the worker
+            try:
+                self.on_flush(len(batch), time.perf_counter() - start)
+            except Exception as e:
+                logger.error(f"Error in micro batcher on_flush callback: {e}")
+
+        self.batches += 1
+        self.rows += len(batch)
+        for idx, bucket in enumerate(self.buckets):
+            if len(batch) <= bucket:
+                self.batch_size_counts[idx] += 1
+                break
+
+    def stats(self):
+        return {
+            "queue_depth" : self.queue.qsize(),
+            "max_queue_depth" : self.max_queue_depth,
+            "batches" : self.batches,
+            "rows" : self.rows,
+            "mean_batch_size" : self.rows / self.batches if self.batches else 0.0,
+            "batch_size_histogram" : {f"le_{bucket}" : count for bucket, count in zip(self.buckets, self.batch_size_counts)}
+        }
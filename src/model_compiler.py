@@ -0,0 +1,300 @@
+import os
+import sys
+import math
+import joblib
+import numpy as np
+from src.logger import get_logger
+from src.custom_exception import CustomException
+from config.paths_config import *
+from utils.helpers import file_checksum, read_artifact, atomic_write
+
+logger = get_logger(__name__)
+
+## missing_type codes used in the flattened arrays (same meaning as in LightGBM)
+MISSING_NONE = 0
+MISSING_ZERO = 1
+MISSING_NAN = 2
+MISSING_TYPES = {"None" : MISSING_NONE, "Zero" : MISSING_ZERO, "NaN" : MISSING_NAN}
+
+## LightGBM treats |x| <= kZeroThreshold as zero for missing_type "Zero"
+ZERO_THRESHOLD = 1e-35
+
+
+class CompiledTreeModel:
+    """LightGBM binary classifier flattened into plain NumPy arrays.
+
+    Every node of every tree lives in one set of arrays. Leaves have feature == -1 and
+    point to themselves as both children. Single rows walk the python lists, batches
+    walk all (row, tree) pairs one level at a time with NumPy.
+    """
+
+    def __init__(self, feature, threshold, left, right, default_left, missing_type, value, roots, max_depth, sigmoid, classes, source_checksum = ""):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.default_left = default_left
+        self.missing_type = missing_type
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.sigmoid = float(sigmoid)
+        self.classes_ = classes
+        ## sha256 of the .pkl this was compiled from
+        self.source_checksum = str(source_checksum)
+
+        self.n_features_in_ = int(feature.max()) + 1 if feature.size else 0
+        self.has_missing = bool((missing_type != MISSING_NONE).any())
+
+        ## plain python copies for the single row walk
+        self._feature = feature.tolist()
+        self._threshold = threshold.tolist()
+        self._left = left.tolist()
+        self._right = right.tolist()
+        self._default_left = default_left.tolist()
+        self._missing_type = missing_type.tolist()
+        self._value = value.tolist()
+        self._roots = roots.tolist()
+
+    @classmethod
+    def from_lgbm(cls, model):
+        booster = model.booster_ if hasattr(model, "booster_") else model
+        dump = booster.dump_model()
+
+        objective = dump["objective"].split()
+        if objective[0] != "binary" or dump["num_tree_per_iteration"] != 1:
+            raise ValueError(f"only binary LightGBM models can be compiled, got: {dump['objective']}")
+
+        sigmoid = 1.0
+        for option in objective[1:]:
+            if option.startswith("sigmoid:"):
+                sigmoid = float(option.split(":")[1])
+
+        feature, threshold, left, right, default_left, missing_type, value, roots = [], [], [], [], [], [], [], []
+        max_depth = 0
+
+        for tree in dump["tree_info"]:
+            roots.append(len(feature))
+            ## (node, depth, parent slot to patch)
+            stack = [(tree["tree_structure"], 0, None)]
+
+            while stack:
+                node, depth, patch = stack.pop()
+                idx = len(feature)
+                if patch is not None:
+                    patch[0][patch[1]] = idx
+
+                if "split_feature" not in node:
+                    feature.append(-1)
+                    threshold.append(0.0)
+                    left.append(idx)
+                    right.append(idx)
+                    default_left.append(False)
+                    missing_type.append(MISSING_NONE)
+                    value.append(node["leaf_value"])
+                    max_depth = max(max_depth, depth)
+                    continue
+
+                if node["decision_type"] != "<=":
+                    raise ValueError(f"unsupported decision type: {node['decision_type']}")
+
+                feature.append(node["split_feature"])
+                threshold.append(node["threshold"])
+                left.append(-1)
+                right.append(-1)
+                default_left.append(node["default_left"])
+                missing_type.append(MISSING_TYPES[node["missing_type"]])
+                value.append(0.0)
+
+                stack.append((node["right_child"], depth + 1, (right, idx)))
+                stack.append((node["left_child"], depth + 1, (left, idx)))
+
+        return cls(
+            feature = np.asarray(feature, dtype=np.int32),
+            threshold = np.asarray(threshold, dtype=np.float64),
+            left = np.asarray(left, dtype=np.int32),
+            right = np.asarray(right, dtype=np.int32),
+            default_left = np.asarray(default_left, dtype=bool),
+            missing_type = np.asarray(missing_type, dtype=np.int8),
+            value = np.asarray(value, dtype=np.float64),
+            roots = np.asarray(roots, dtype=np.int32),
+            max_depth = max_depth,
+            sigmoid = sigmoid,
+            classes = np.asarray(model.classes_) if hasattr(model, "classes_") else np.array([0, 1]),
+        )
+
+    def save(self, path):
+        with atomic_write(path) as tmp_path, open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                feature = self.feature,
+                threshold = self.threshold,
+                left = self.left,
+                right = self.right,
+                default_left = self.default_left,
+                missing_type = self.missing_type,
+                value = self.value,
+                roots = self.roots,
+                max_depth = np.array(self.max_depth),
+                sigmoid = np.array(self.sigmoid),
+                classes = self.classes_,
+                source_checksum = np.array(self.source_checksum),
+            )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            return cls(**{name : arrays[name] for name in arrays.files})
+
+    def _go_left(self, fval, node):
+        ## same rules as LightGBM's NumericalDecision
+        missing = self._missing_type[node]
+        if fval != fval and missing != MISSING_NAN:
+            fval = 0.0
+        if (missing == MISSING_ZERO and -ZERO_THRESHOLD < fval <= ZERO_THRESHOLD) or (missing == MISSING_NAN and fval != fval):
+            return self._default_left[node]
+        return fval <= self._threshold[node]
+
+    def predict_raw_one(self, row):
+        row = [float(x) for x in row]
+        feature, left, right, value = self._feature, self._left, self._right, self._value
+
+        raw = 0.0
+        if self.has_missing:
+            for node in self._roots:
+                while feature[node] >= 0:
+                    node = left[node] if self._go_left(row[feature[node]], node) else right[node]
+                raw += value[node]
+            return raw
+
+        threshold = self._threshold
+        for node in self._roots:
+            while feature[node] >= 0:
+                fval = row[feature[node]]
+                if fval != fval:
+                    fval = 0.0
+                node = left[node] if fval <= threshold[node] else right[node]
+            raw += value[node]
+        return raw
+
+    def predict_proba_one(self, row):
+        p = 1.0 / (1.0 + math.exp(-self.sigmoid * self.predict_raw_one(row)))
+        return [1.0 - p, p]
+
+    def predict_one(self, row):
+        p = self.predict_proba_one(row)
+        return self.classes_[int(p[1] > p[0])]
+
+    def _walk(self, X):
+        n_rows, n_trees = X.shape[0], self.roots.shape[0]
+
+        ## one entry per (row, tree) pair, flattened row-major
+        nodes = np.tile(self.roots, n_rows)
+        row_offset = np.repeat(np.arange(n_rows) * X.shape[1], n_trees)
+        flat_X = X.ravel()
+        active = np.flatnonzero(self.feature[nodes] >= 0)
+
+        ## walk the pairs still sitting on an internal node down one level at a time
+        while active.size:
+            current = nodes[active]
+            fval = flat_X[row_offset[active] + self.feature[current]]
+
+            if self.has_missing:
+                missing = self.missing_type[current]
+                is_nan = np.isnan(fval)
+                fval = np.where(is_nan & (missing != MISSING_NAN), 0.0, fval)
+                use_default = ((missing == MISSING_ZERO) & (fval > -ZERO_THRESHOLD) & (fval <= ZERO_THRESHOLD)) | ((missing == MISSING_NAN) & is_nan)
+                go_left = np.where(use_default, self.default_left[current], fval <= self.threshold[current])
+            else:
+                go_left = (fval <= self.threshold[current]) | (np.isnan(fval) & (0.0 <= self.threshold[current]))
+
+            current = np.where(go_left, self.left[current], self.right[current])
+            nodes[active] = current
+            active = active[self.feature[current] >= 0]
+
+        return self.value[nodes].reshape(n_rows, n_trees)
+
+    def predict_raw(self, X, chunk_size = 8192):
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+
+        raw = np.zeros(X.shape[0], dtype=np.float64)
+
+        for start in range(0, X.shape[0], chunk_size):
+            leaf_values = self._walk(X[start:start + chunk_size])
+
+            ## add trees in order (not a pairwise sum) so the result matches LightGBM exactly
+            out = raw[start:start + chunk_size]
+            for t in range(leaf_values.shape[1]):
+                out += leaf_values[:, t]
+
+        return raw
+
+    def predict_proba(self, X):
+        raw = self.predict_raw(X)
+        ## np.exp may differ from LightGBM's std::exp in the last bit, the raw scores themselves are exact
+        p = 1.0 / (1.0 + np.exp(-self.sigmoid * raw))
+        return np.column_stack([1.0 - p, p])
+
+    def predict(self, X):
+        proba = self.predict_proba(X)
+        return self.classes_[proba.argmax(axis=1)]
+
+
+def compile_model(model_path, compiled_model_path):
+    try:
+        logger.info(f"Compiling model {model_path}")
+        model = joblib.load(model_path)
+        compiled = CompiledTreeModel.from_lgbm(model)
+        compiled.source_checksum = file_checksum(model_path)
+        compiled.save(compiled_model_path)
+        logger.info(f"Compiled model saved at {compiled_model_path} : trees : {len(compiled.roots)} , nodes : {len(compiled.feature)}")
+        return model, compiled
+
+    except Exception as e:
+        logger.error(f"Error while compiling model: {e}")
+        raise CustomException(f"Error while compiling model: {e}", sys)
+
+
+def load_compiled_model(compiled_model_path, model_path):
+    ## returns None when there is no export or it was compiled from a different model file
+    if not os.path.exists(compiled_model_path):
+        return None
+
+    compiled = CompiledTreeModel.load(compiled_model_path)
+    if compiled.source_checksum != file_checksum(model_path):
+        logger.info(f"Compiled model {compiled_model_path} is stale, ignoring it")
+        return None
+    return compiled
+
+
+def verify_compiled_model(model, compiled, X, rtol = 1e-12, atol = 1e-12):
+    ## raw scores must match LightGBM bit for bit, probabilities up to the last bits of exp()
+    try:
+        expected_raw = model.predict(X, raw_score=True)
+        actual_raw = compiled.predict_raw(X)
+        mismatches = int((expected_raw != actual_raw).sum())
+        if mismatches:
+            raise ValueError(f"compiled model differs from the raw scores on {mismatches} of {len(expected_raw)} rows")
+
+        expected = model.predict_proba(X)
+        actual = compiled.predict_proba(X)
+        if not np.allclose(expected, actual, rtol=rtol, atol=atol):
+            raise ValueError(f"compiled probabilities differ from predict_proba by up to {np.abs(expected - actual).max():.3g}")
+
+        logger.info(f"Compiled model verified on {len(expected)} rows (raw scores bit-for-bit)")
+
+    except Exception as e:
+        logger.error(f"Error while verifying compiled model: {e}")
+        raise CustomException(f"Error while verifying compiled model: {e}", sys)
+
+
+if __name__ == "__main__":
+    try:
+        model, compiled = compile_model(MODEL_SAVE_PATH, COMPILED_MODEL_PATH)
+        data = read_artifact(ENGINEERED_DATA_PATH)
+        verify_compiled_model(model, compiled, data.drop(columns='satisfaction').to_numpy(dtype=np.float64))
+
+    except CustomException as ce:
+        logger.error(str(ce))
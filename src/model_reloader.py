@@ -0,0 +1,221 @@
+import io
+import os
+import sys
+import time
+import hashlib
+import threading
+import joblib
+import numpy as np
+from src.logger import get_logger
+from src.custom_exception import CustomException
+from src.model_compiler import CompiledTreeModel, verify_compiled_model
+from src.preprocessor import FittedPreprocessor
+from utils.helpers import FEATURE_ORDER, model_feature_names, serving_feature_names
+
+logger = get_logger(__name__)
+
+
+class ModelBundle:
+    """One model version and everything loaded with it.
+
+    Requests read the reloader's bundle once and use it to the end, so the model,
+    compiled copy and preprocessor they see always belong together.
+    """
+
+    def __init__(self, model, compiled_model, preprocessor, checksum, signature):
+        self.model = model
+        self.compiled_model = compiled_model
+        self.preprocessor = preprocessor
+        self.checksum = checksum
+        self.signature = signature
+        self.loaded_at = time.time()
+        ## prefix for prediction cache keys, so entries of different versions never mix
+        self.cache_tag = checksum[:16].encode()
+
+    def predict_row(self, data):
+        if self.compiled_model is not None:
+            return self.compiled_model.predict_one(data)
+        return self.model.predict([data])[0]
+
+
+class ModelReloader:
+    """Serves the model in model_path and swaps in new versions without a restart.
+
+    A new version is loaded on a background thread (file watch, polled every
+    check_interval seconds) or on reload() (the admin endpoint). It is loaded, warmed
+    up and checked against the canary batch while the current bundle keeps serving,
+    then swapped in with a single assignment. A change has to be seen on two polls in
+    a row before it is loaded, so a file copied in place is not read halfway. A version
+    that fails validation is not retried until the files change again.
+    """
+
+    def __init__(self, model_path, compiled_model_path, preprocessor_path, canary_path, check_interval = 2.0, warmup_rows = 32, on_swap = None, on_failure = None):
+        self.model_path = model_path
+        self.compiled_model_path = compiled_model_path
+        self.preprocessor_path = preprocessor_path
+        self.canary_path = canary_path
+        self.check_interval = check_interval
+        self.warmup_rows = warmup_rows
+        self.on_swap = on_swap
+        self.on_failure = on_failure
+
+        self.reload_lock = threading.Lock()
+        self.start_lock = threading.Lock()
+        self.watcher = None
+        self.pending_signature = None
+        self.failed_signature = None
+
+        self.reloads = 0
+        self.failures = 0
+        self.last_error = None
+
+        ## the first version is loaded synchronously, the app cannot serve without it
+        self.bundle = self.load()
+
+    def _file_signature(self, path):
+        try:
+            stat = os.stat(path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+    def signature(self):
+        return tuple(self._file_signature(path) for path in (self.model_path, self.compiled_model_path, self.preprocessor_path))
+
+    def load(self):
+        try:
+            start = time.perf_counter()
+            signature = self.signature()
+
+            ## checksum and unpickle the same bytes, even if the file is replaced meanwhile
+            with open(self.model_path, "rb") as f:
+                payload = f.read()
+            checksum = hashlib.sha256(payload).hexdigest()
+            model = joblib.load(io.BytesIO(payload))
+
+            ## a compiled export from another model file is ignored until the matching one is written
+            compiled_model = CompiledTreeModel.load(self.compiled_model_path) if os.path.exists(self.compiled_model_path) else None
+            if compiled_model is not None and compiled_model.source_checksum != checksum:
+                compiled_model = None
+            preprocessor = FittedPreprocessor.load(self.preprocessor_path) if os.path.exists(self.preprocessor_path) else None
+
+            bundle = ModelBundle(model, compiled_model, preprocessor, checksum, signature)
+            self.validate(bundle)
+
+            logger.info(f"Model {checksum[:12]} loaded and validated in {time.perf_counter() - start:.2f}s (compiled : {compiled_model is not None} , preprocessor : {preprocessor is not None})")
+            return bundle
+
+        except Exception as e:
+            logger.error(f"Error while loading model {self.model_path}: {e}")
+            raise CustomException(f"Error while loading model {self.model_path}: {e}", sys)
+
+    def validate(self, bundle):
+        ## canary batch from training if there is one, otherwise a single all-zero row
+        X, expected, canary_checksum = None, None, None
+        if os.path.exists(self.canary_path):
+            with np.load(self.canary_path) as canary:
+                X, expected, canary_checksum = canary["X"], canary["probabilities"], str(canary["model_checksum"])
+        if X is None:
+            X = np.zeros((1, bundle.model.n_features_in_), dtype=np.float64)
+
+        ## serving builds every row in FEATURE_ORDER, a model trained on other columns would score the wrong values
+        names = model_feature_names(bundle.model)
+        if names is None:
+            raise ValueError("model has no feature names to check against the serving feature order")
+        if serving_feature_names(names) != FEATURE_ORDER:
+            raise ValueError(f"model features {names} do not match the serving feature order {FEATURE_ORDER}")
+
+        current = getattr(self, "bundle", None)
+        if current is not None:
+            if bundle.model.n_features_in_ != current.model.n_features_in_:
+                raise ValueError(f"new model expects {bundle.model.n_features_in_} features, the current one {current.model.n_features_in_}")
+            if not np.array_equal(bundle.model.classes_, current.model.classes_):
+                raise ValueError(f"new model predicts classes {bundle.model.classes_}, the current one {current.model.classes_}")
+
+        probabilities = bundle.model.predict_proba(X)
+        if probabilities.shape != (len(X), 2) or not np.isfinite(probabilities).all():
+            raise ValueError(f"canary predictions are malformed : shape {probabilities.shape}")
+
+        ## a canary saved with this exact model file must be reproduced
+        if canary_checksum == bundle.checksum and not np.allclose(probabilities[:, 1], expected):
+            raise ValueError("model does not reproduce the probabilities saved with its canary batch")
+
+        if bundle.compiled_model is not None:
+            verify_compiled_model(bundle.model, bundle.compiled_model, X)
+
+        ## warm-up: first calls on a fresh model are slower (allocations, lazy tables)
+        for row in X[:self.warmup_rows]:
+            bundle.predict_row(row)
+            bundle.model.predict(row.reshape(1, -1))
+
+    def reload(self):
+        ## loads the files now and swaps them in; raises (and keeps the current model) if they do not validate
+        with self.reload_lock:
+            signature = self.signature()
+            try:
+                bundle = self.load()
+            except Exception as e:
+                self.failures += 1
+                self.failed_signature = signature
+                self.last_error = str(e)
+                if self.on_failure is not None:
+                    self.on_failure(e)
+                raise
+
+            previous, self.bundle = self.bundle, bundle
+            self.reloads += 1
+            self.failed_signature = None
+            self.last_error = None
+            logger.info(f"Model swapped : {previous.checksum[:12]} -> {bundle.checksum[:12]}")
+
+            if self.on_swap is not None:
+                self.on_swap(previous, bundle)
+            return bundle
+
+    def check(self):
+        ## one poll of the watcher
+        signature = self.signature()
+        if signature == self.bundle.signature or signature == self.failed_signature:
+            self.pending_signature = None
+            return False
+
+        if signature != self.pending_signature:
+            self.pending_signature = signature
+            return False
+
+        self.pending_signature = None
+        try:
+            self.reload()
+            return True
+        except Exception as e:
+            logger.error(f"Model reload failed, still serving {self.bundle.checksum[:12]}: {e}")
+            return False
+
+    def start(self):
+        ## the watcher is started lazily so it is created inside each server process after fork
+        if self.check_interval is None or (self.watcher is not None and self.watcher.is_alive()):
+            return
+        with self.start_lock:
+            if self.watcher is None or not self.watcher.is_alive():
+                self.watcher = threading.Thread(target=self._run, name="model-watcher", daemon=True)
+                self.watcher.start()
+                logger.info(f"Watching {self.model_path} for new models every {self.check_interval}s")
+
+    def _run(self):
+        while True:
+            time.sleep(self.check_interval)
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Error while checking for a new model: {e}")
+
+    def stats(self):
+        return {
+            "model_checksum" : self.bundle.checksum,
+            "loaded_at" : self.bundle.loaded_at,
+            "compiled_model" : self.bundle.compiled_model is not None,
+            "preprocessor" : self.bundle.preprocessor is not None,
+            "reloads" : self.reloads,
+            "failures" : self.failures,
+            "last_error" : self.last_error,
+        }
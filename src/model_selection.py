@@ -10,12 +10,22 @@ import lightgbm as lgb
 import xgboost as xgb 
 
 import os 
+import json
+import pickle
+import joblib
+import numpy as np
+import resource
+import multiprocessing
+from queue import Empty
 import pandas as pd 
 from src.logger import get_logger
 from src.custom_exception import CustomException
 from sklearn.model_selection import train_test_split
 from sklearn.feature_selection import mutual_info_classif
 from config.paths_config import *
+from config.schema_config import ENGINEERED_DTYPES
+from config.model_selection_config import MODEL_SELECTION_CONFIG
+from src.selection_policy import pareto_front, select_model
 from utils.helpers import *
 import matplotlib.pyplot as plt
 import time
@@ -26,10 +36,65 @@ from torch.utils.tensorboard import SummaryWriter
 logger = get_logger(__name__)
 
 
+def peak_rss_mb():
+    ## ru_maxrss is in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def single_row_latency_ms(model, X, n_rows):
+    ## time n_rows separate one-row predict calls, like the Flask form does
+    latencies = []
+    for i in range(min(n_rows, len(X))):
+        row = X.iloc[i:i + 1]
+        start = time.perf_counter()
+        model.predict(row)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return float(np.percentile(latencies, 50)), float(np.percentile(latencies, 99))
+
+
+def batch_rows_per_sec(model, X):
+    start = time.perf_counter()
+    model.predict(X)
+    seconds = time.perf_counter() - start
+    return len(X) / seconds if seconds > 0 else float('inf')
+
+
+def evaluate_candidate(name, model, X_train, X_test, y_train, y_test, results):
+    ## runs in its own process and sends one result dict back to the parent through `results`
+    try:
+        baseline_mb = peak_rss_mb()
+
+        start = time.perf_counter()
+        model.fit(X_train, y_train)
+        fit_seconds = time.perf_counter() - start
+
+        y_pred = model.predict(X_test)
+        peak_memory_mb = peak_rss_mb() - baseline_mb
+
+        ## the fitted model goes back to the parent, which times predictions one model at a time
+        model_bytes = pickle.dumps(model)
+        results.put({
+            'name': name,
+            'y_pred': y_pred,
+            'fit_seconds': fit_seconds,
+            'peak_memory_mb': peak_memory_mb,
+            'model_size_bytes': len(model_bytes),
+            'model_bytes': model_bytes,
+        })
+
+    except Exception as e:
+        results.put({'name': name, 'error': str(e)})
+
+
 class ModelSelection:
 
-    def __init__(self, data_path):
+    def __init__(self, data_path, config = MODEL_SELECTION_CONFIG):
         self.data_path = data_path
+        ## candidates are fitted in parallel processes; one that runs past timeout seconds is killed
+        self.n_workers = config["n_workers"] or os.cpu_count()
+        self.timeout = config["timeout"]
+        self.latency_rows = config["latency_rows"]
+        self.policy = config["policy"]
         run_id = time.strftime("%Y%m%d-%H%M%S")
         self.writer = SummaryWriter(log_dir=f"tensorboard_logs/run_{run_id}")
 
@@ -38,7 +103,7 @@ class ModelSelection:
                     'Random Forest': RandomForestClassifier(n_estimators=50, n_jobs=-1),
                     'Gradient Boosting': GradientBoostingClassifier(n_estimators=50),
                     'AdaBoost': AdaBoostClassifier(n_estimators=50),
-                    'Support Vector Classifier': SVC(),
+                    'Support Vector Classifier': SVC(probability=True),
                     'K-Nearest Neighbors': KNeighborsClassifier(),
                     'Naive Bayes': GaussianNB(),
                     'Decision Tree': DecisionTreeClassifier(),
@@ -48,10 +113,11 @@ class ModelSelection:
         
         self.results = {}
 
-    def load_data(self):
+    def load_data(self, columns=TRAINING_COLUMNS):
         try:
             logger.info(f"Loading data from")
-            df = pd.read_csv(self.data_path) #100% Data
+            df = read_artifact(self.data_path, columns=columns, dtypes=ENGINEERED_DTYPES) #100% Data
+            log_memory_footprint(logger, df, "Engineered data")
             df_sample = df.sample(frac= 0.1, random_state=42) #10% Data
 
             X = df_sample.drop(columns='satisfaction')
@@ -91,12 +157,62 @@ class ModelSelection:
         plt.close(fig)
 
 
+    def fit_candidates(self, X_train, X_test, y_train, y_test):
+        ## yields one result dict per candidate as they finish (or fail / time out)
+        results = multiprocessing.Queue()
+        pending = list(self.model.items())
+        running = {}
+
+        while pending or running:
+            while pending and len(running) < self.n_workers:
+                name, model = pending.pop(0)
+                process = multiprocessing.Process(target=evaluate_candidate, args=(name, model, X_train, X_test, y_train, y_test, results), daemon=True)
+                process.start()
+                running[name] = (process, time.perf_counter())
+
+            try:
+                result = results.get(timeout=0.1)
+                ## a result can still arrive from a candidate that was just killed for timing out
+                if result['name'] in running:
+                    running.pop(result['name'])[0].join()
+                    yield result
+            except Empty:
+                pass
+
+            for name, (process, started) in list(running.items()):
+                if time.perf_counter() - started > self.timeout:
+                    process.terminate()
+                    process.join()
+                    del running[name]
+                    yield {'name': name, 'error': f"timed out after {self.timeout}s"}
+                elif not process.is_alive() and process.exitcode != 0:
+                    del running[name]
+                    yield {'name': name, 'error': f"worker exited with code {process.exitcode}"}
+
     def train_and_evaluate(self, X_train, X_test, y_train, y_test):
         try:
-            logger.info(f"Training and evaluating models")
-            for idx, (name, model) in enumerate(self.model.items()):
-                model.fit(X_train, y_train)
-                y_pred = model.predict(X_test)
+            logger.info(f"Training and evaluating models on {self.n_workers} processes")
+            order = list(self.model)
+            ## all TensorBoard writes happen here in the parent, in the original model order
+            finished = {}
+            for result in self.fit_candidates(X_train, X_test, y_train, y_test):
+                if 'error' in result:
+                    logger.error(f"{result['name']} failed : {result['error']}")
+                else:
+                    logger.info(f"{result['name']} fitted in {result['fit_seconds']:.2f}s")
+                finished[result['name']] = result
+
+            for idx, name in enumerate(order):
+                result = finished[name]
+                if 'error' in result:
+                    self.results[name] = {'error': result['error']}
+                    continue
+                y_pred = result['y_pred']
+
+                ## timed here with nothing else running, so candidates are compared on equal terms
+                fitted = pickle.loads(result['model_bytes'])
+                rows_per_sec = batch_rows_per_sec(fitted, X_test)
+                latency_p50_ms, latency_p99_ms = single_row_latency_ms(fitted, X_test, self.latency_rows)
 
                 accuracy = accuracy_score(y_test, y_pred)
                 precision = precision_score(y_test, y_pred, average='weighted', zero_division=0)
@@ -107,7 +223,14 @@ class ModelSelection:
                     'accuracy': accuracy,
                     'precision': precision,
                     'recall': recall,
-                    'f1_score': f1
+                    'f1_score': f1,
+                    'fit_seconds': result['fit_seconds'],
+                    'predict_rows_per_sec': rows_per_sec,
+                    'latency_p50_ms': latency_p50_ms,
+                    'latency_p99_ms': latency_p99_ms,
+                    'peak_memory_mb': result['peak_memory_mb'],
+                    'model_size_bytes': result['model_size_bytes'],
+                    'predict_proba': hasattr(fitted, 'predict_proba')
                 }
 
                 logger.info(f"{name} trained model successfully"
@@ -117,17 +240,47 @@ class ModelSelection:
                 self.writer.add_scalar(f"precision/{name}", precision, idx)
                 self.writer.add_scalar(f"recall/{name}", recall, idx)
                 self.writer.add_scalar(f"f1_score/{name}", f1, idx)
+                self.writer.add_scalar(f"fit_seconds/{name}", result['fit_seconds'], idx)
+                self.writer.add_scalar(f"predict_rows_per_sec/{name}", rows_per_sec, idx)
+                self.writer.add_scalar(f"latency_p99_ms/{name}", latency_p99_ms, idx)
+                self.writer.add_scalar(f"peak_memory_mb/{name}", result['peak_memory_mb'], idx)
+                self.writer.add_scalar(f"model_size_bytes/{name}", result['model_size_bytes'], idx)
 
                 self.writer.add_text('Model Details ' , f"Name : {name}"  f"Metrics : Accuracy : {accuracy} , Precision : {precision} , Recall : {recall} , F1 Score : {f1}" )
                 
                 self.log_confusion_matrix(y_test, y_pred, idx, name)
 
-            self.writer.close()
+            logger.info(f"Model selection report : \n {pd.DataFrame(self.results).T.to_string()}")
         
         except Exception as e:
             logger.error(f"Error training and evaluating models: {e}")
             raise CustomException(f"Error training and evaluating models", sys)
         
+    def select(self):
+        ## apply the policy, then save the report and the unfitted chosen model for ModelTraining
+        try:
+            selected, front = select_model(self.results, self.policy)
+            logger.info(f"Pareto front ({self.policy['metric']} vs p99 latency) : {front}")
+            logger.info(f"Selected model : {selected} : {self.results[selected]}")
+
+            os.makedirs(MODEL_SELECTION_DIR, exist_ok=True)
+            report = {
+                'policy': self.policy,
+                'selected': selected,
+                'pareto_front': front,
+                'candidates': self.results,
+            }
+            with open(MODEL_SELECTION_REPORT_PATH, "w") as f:
+                json.dump(report, f, indent=4)
+            joblib.dump(self.model[selected], SELECTED_MODEL_PATH)
+
+            self.writer.add_text('Selected Model', f"{selected} : Pareto front : {front}")
+            return selected
+
+        except Exception as e:
+            logger.error(f"Error selecting model: {e}")
+            raise CustomException(f"Error selecting model", sys)
+
     def run(self):
         try: 
             logger.info("Model Selection pipeline started")
@@ -135,6 +288,8 @@ class ModelSelection:
             X_train, X_test, y_train, y_test = self.split_data(X, y)
             
             self.train_and_evaluate(X_train, X_test, y_train, y_test)
+            self.select()
+            self.writer.close()
 
             logger.info("Model Selection pipeline completed")
         
@@ -1,41 +1,62 @@
 import os 
 import sys
+import shutil
+import numpy as np
 import pandas as pd 
 import joblib
 import json
+import time
+import copy
 import mlflow
 import mlflow.sklearn
 from sklearn.model_selection import train_test_split, GridSearchCV
 from sklearn.metrics import accuracy_score, precision_score, f1_score, recall_score, confusion_matrix
 import lightgbm as lgb
 from src.logger import get_logger
+from src.profiler import profiled
 from src.custom_exception import CustomException
+from src.model_compiler import CompiledTreeModel, verify_compiled_model
+from src.hyperparameter_search import SuccessiveHalvingSearch, SharedDatasetGridSearch
 from config.paths_config import *
+from config.schema_config import ENGINEERED_DTYPES
+from utils.helpers import TRAINING_COLUMNS, file_checksum, read_artifact, log_memory_footprint, atomic_write
 
 logger = get_logger(__name__)
 
+## rows kept in the canary batch next to the model
+CANARY_ROWS = 256
+
 class ModelTraining:
      
-    def __init__(self, data_path, params_path, model_save_path, experiment_name = 'Model_Training_Experiment'):
+    def __init__(self, data_path, params_path, model_save_path, experiment_name = 'Model_Training_Experiment', compiled_model_path = COMPILED_MODEL_PATH,
+                 preprocessor_path = ENGINEERED_PREPROCESSOR_PATH, preprocessor = None):
         self.data_path = data_path
         self.params_path = params_path
         self.model_save_path = model_save_path
+        self.compiled_model_path = compiled_model_path
+        self.preprocessor_path = preprocessor_path
+        self.preprocessor = preprocessor
         self.experiment_name = experiment_name
 
         self.best_model = None
         self.metrics = None
+        self.run_id = None
 
-    def load_data(self):
+    @profiled()
+    def load_data(self, columns=TRAINING_COLUMNS):
         try:
             logger.info(f"Loading Data........")
-            data = pd.read_csv(self.data_path)
+            data = read_artifact(self.data_path, columns=columns, dtypes=ENGINEERED_DTYPES)
             logger.info(f"Data Loaded Successfully")
+            log_memory_footprint(logger, data, "Engineered data")
             return data
 
         except Exception as e:
-            logger.error(f"Error in loading data: {str(e)}")
-            raise CustomException(f"Error in loading data: {str(e)}")
+            ## usually feature selection kept other features than the ones serving sends (FEATURE_ORDER)
+            logger.error(f"Error in loading data, expected the columns {columns}: {str(e)}")
+            raise CustomException(f"Error in loading data, expected the columns {columns}: {str(e)}", sys)
 
+    @profiled()
     def split_data(self, data):
         try:
             logger.info(f"Splitting Data........")
@@ -53,15 +74,26 @@ class ModelTraining:
             logger.error(f"Error in splitting data: {str(e)}")
             raise CustomException(f"Error in splitting data: {str(e)}")
 
-    def train_model(self,X_train, y_train, params):
+    @profiled()
+    def train_model(self,X_train, y_train, params, search = "grid", search_options = None):
         try:
+            if search == "halving":
+                return self.train_model_halving(X_train, y_train, params, search_options or {})
+            if search == "shared_dataset":
+                return self.train_model_shared_dataset(X_train, y_train, params)
+
             logger.info(f"Training Model........")
             lgbm = lgb.LGBMClassifier()
 
             grid_search = GridSearchCV(lgbm, param_grid = params, cv = 3, scoring= 'accuracy')
 
+            started = time.perf_counter()
             grid_search.fit(X_train, y_train)
 
+            ## same timing metrics as the shared_dataset search, to compare the two
+            fit_seconds = float((grid_search.cv_results_['mean_fit_time'] * grid_search.n_splits_).sum())
+            mlflow.log_metrics({"boosting_seconds" : fit_seconds, "refit_seconds" : grid_search.refit_time_, "search_seconds" : time.perf_counter() - started})
+
             logger.info(f"Model Trained Successfully")
 
             self.best_model= grid_search.best_estimator_
@@ -71,6 +103,146 @@ class ModelTraining:
             logger.error(f"Error in training model: {str(e)}")
             raise CustomException(f"Error in training model: {str(e)}")
 
+    def train_model_halving(self, X_train, y_train, params, search_options):
+        try:
+            logger.info(f"Training Model with successive halving : {search_options}")
+            search = SuccessiveHalvingSearch(params, **search_options)
+            search.fit(X_train, y_train)
+
+            ## one nested MLflow run per (configuration, rung)
+            for trial in search.trials:
+                with mlflow.start_run(run_name = f"trial_{trial['trial']}", nested = True):
+                    mlflow.log_params(trial["params"])
+                    mlflow.log_params({"rung" : trial["rung"], "fraction" : trial["fraction"], "config_id" : trial["config_id"]})
+                    mlflow.log_metrics({"cv_accuracy" : trial["mean_accuracy"], "best_iteration" : trial["best_iteration"], "fit_seconds" : trial["fit_seconds"]})
+
+            mlflow.log_metrics({"search_fits" : search.n_fits, "search_trials" : len(search.trials), "best_cv_accuracy" : search.best_score_})
+            logger.info(f"Model Trained Successfully")
+
+            self.best_model = search.best_estimator_
+            return search.best_params_
+
+        except Exception as e:
+            logger.error(f"Error in training model: {str(e)}")
+            raise CustomException(f"Error in training model: {str(e)}", sys)
+
+    def train_model_shared_dataset(self, X_train, y_train, params):
+        try:
+            logger.info(f"Training Model on one shared lgb.Dataset........")
+            search = SharedDatasetGridSearch(params, cv = 3)
+            search.fit(X_train, y_train)
+
+            mlflow.log_metrics(search.timings)
+            mlflow.log_metric("best_cv_accuracy", search.best_score_)
+            logger.info(f"Model Trained Successfully")
+
+            self.best_model = search.best_estimator_
+            return search.best_params_
+
+        except Exception as e:
+            logger.error(f"Error in training model: {str(e)}")
+            raise CustomException(f"Error in training model: {str(e)}", sys)
+
+    @profiled()
+    def warm_start(self, X_new, y_new, method = "continue", n_estimators = 50, decay_rate = 0.9):
+        ## continue boosting the saved model on the new rows, or refit its leaf values only
+        try:
+            previous = joblib.load(self.model_save_path)
+            logger.info(f"Warm start ({method}) from {self.model_save_path} on {len(X_new)} new rows")
+
+            if method == "refit":
+                model = copy.deepcopy(previous)
+                ## Booster.refit keeps the tree structure and blends new leaf values in
+                model._Booster = previous.booster_.refit(X_new, y_new, decay_rate = decay_rate)
+            else:
+                model = lgb.LGBMClassifier(**dict(previous.get_params(), n_estimators = n_estimators))
+                model.fit(X_new, y_new, init_model = previous.booster_)
+
+            return previous, model
+
+        except Exception as e:
+            logger.error(f"Error in warm start training: {str(e)}")
+            raise CustomException(f"Error in warm start training: {str(e)}", sys)
+
+    def run_warm_start(self, new_data, holdout_data, options = None):
+        ## retrain on new_data only; the model file is replaced only if holdout accuracy does not drop
+        try:
+            options = options or {}
+            mlflow.set_experiment(self.experiment_name)
+            with mlflow.start_run(run_name = "warm_start") as run:
+                self.run_id = run.info.run_id
+                if len(holdout_data) == 0:
+                    logger.info("No hold-out rows to check a warm-started model against, keeping the current model")
+                    return False
+
+                X_new, y_new = new_data.drop(columns = 'satisfaction'), new_data['satisfaction']
+                X_holdout, y_holdout = holdout_data.drop(columns = 'satisfaction'), holdout_data['satisfaction']
+
+                started = time.perf_counter()
+                previous, model = self.warm_start(X_new, y_new, method = options.get("method", "continue"),
+                                                  n_estimators = options.get("n_estimators", 50), decay_rate = options.get("decay_rate", 0.9))
+                mlflow.log_params({f"warm_start_{key}" : value for key, value in options.items()})
+                mlflow.log_metrics({"warm_start_rows" : len(X_new), "warm_start_seconds" : time.perf_counter() - started})
+
+                previous_accuracy = accuracy_score(y_holdout, previous.predict(X_holdout))
+                self.best_model = model
+                metrics = self.evaluate_model(X_holdout, y_holdout)
+                mlflow.log_metric("previous_accuracy", previous_accuracy)
+                for metric, value in metrics.items():
+                    if metric != 'confusion_matrix':
+                        mlflow.log_metric(metric, value)
+
+                logger.info(f"hold-out accuracy on {len(X_holdout)} rows : previous : {previous_accuracy:.4f} , warm started : {metrics['accuracy']:.4f}")
+                if metrics['accuracy'] + options.get("tolerance", 0.0) < previous_accuracy:
+                    logger.info("Warm-started model is worse on the hold-out, keeping the current model")
+                    mlflow.log_param("replaced", False)
+                    self.best_model = previous
+                    return False
+
+                self.save_model(X_holdout)
+                self.export_compiled_model(pd.concat([X_new, X_holdout]))
+                mlflow.log_param("replaced", True)
+                return True
+
+        except Exception as e:
+            logger.error(f"Error in warm start run: {str(e)}")
+            mlflow.end_run(status="FAILED")
+            raise CustomException(f"Error in warm start run: {str(e)}", sys)
+
+    def load_selected_model(self):
+        ## model picked by ModelSelection; its accuracy/latency profile goes into this MLflow run
+        try:
+            if not os.path.exists(MODEL_SELECTION_REPORT_PATH):
+                logger.info(f"No model selection report at {MODEL_SELECTION_REPORT_PATH}, training LightGBM")
+                return None
+
+            with open(MODEL_SELECTION_REPORT_PATH) as f:
+                report = json.load(f)
+            selected = report['selected']
+            profile = report['candidates'][selected]
+
+            logger.info(f"Using the model picked by model selection : {selected} : {profile}")
+            mlflow.log_params({"selected_model" : selected, "selection_policy" : json.dumps(report['policy'])})
+            mlflow.log_metrics({f"selection_{key}" : value for key, value in profile.items() if isinstance(value, (int, float))})
+
+            return joblib.load(SELECTED_MODEL_PATH)
+
+        except Exception as e:
+            logger.error(f"Error in loading selected model: {str(e)}")
+            raise CustomException(f"Error in loading selected model: {str(e)}", sys)
+
+    def train_selected_model(self, X_train, y_train, model):
+        try:
+            logger.info(f"Training selected model {type(model).__name__}........")
+            self.best_model = model.fit(X_train, y_train)
+            logger.info(f"Model Trained Successfully")
+            return model.get_params()
+
+        except Exception as e:
+            logger.error(f"Error in training model: {str(e)}")
+            raise CustomException(f"Error in training model: {str(e)}", sys)
+
+    @profiled()
     def evaluate_model(self, X_test, y_test):
         try:
             logger.info(f"Evaluating Model........")
@@ -91,36 +263,90 @@ class ModelTraining:
             logger.error(f"Error in evaluating model: {str(e)}")
             raise CustomException(f"Error in evaluating model: {str(e)}")
 
-    def save_model(self):
+    def save_canary_batch(self, X, model_checksum):
+        ## the serving app reloads a new model only if it reproduces these probabilities
+        X_canary = X.head(CANARY_ROWS).to_numpy(dtype='float64')
+        probabilities = self.best_model.predict_proba(X_canary)[:, 1]
+        canary_path = os.path.join(os.path.dirname(self.model_save_path), os.path.basename(CANARY_BATCH_PATH))
+
+        with atomic_write(canary_path) as tmp_path, open(tmp_path, "wb") as f:
+            np.savez(f, X = X_canary, probabilities = probabilities, model_checksum = np.array(model_checksum))
+        logger.info(f"Canary batch of {len(X_canary)} rows saved at {canary_path}")
+
+    @profiled()
+    def save_model(self, X_canary = None):
         try:
             logger.info(f"saving Model........")
 
-            os.makedirs(os.path.dirname(self.model_save_path), exist_ok=True)
-
-            joblib.dump(self.best_model, self.model_save_path)
+            ## ship the fitted preprocessing statistics next to the model
+            preprocessor_path = os.path.join(os.path.dirname(self.model_save_path), os.path.basename(PREPROCESSOR_PATH))
+            if self.preprocessor is not None:
+                self.preprocessor.save(preprocessor_path)
+            elif os.path.exists(self.preprocessor_path):
+                with atomic_write(preprocessor_path) as tmp_path:
+                    shutil.copyfile(self.preprocessor_path, tmp_path)
+
+            ## the model file is replaced last and in one rename: a running server never loads half a
+            ## pickle, and by the time it sees the new model the preprocessor and canary are in place
+            with atomic_write(self.model_save_path) as tmp_path:
+                joblib.dump(self.best_model, tmp_path)
+                if X_canary is not None:
+                    self.save_canary_batch(X_canary, file_checksum(tmp_path))
 
             logger.info(f"Model Saved Successfully")
         
         except Exception as e:
             logger.error(f"Error in saving model: {str(e)}")
             raise CustomException(f"Error in saving model: {str(e)}")
+
+    @profiled()
+    def export_compiled_model(self, X):
+        try:
+            logger.info(f"Exporting compiled model........")
+
+            compiled = CompiledTreeModel.from_lgbm(self.best_model)
+            compiled.source_checksum = file_checksum(self.model_save_path)
+            verify_compiled_model(self.best_model, compiled, X.to_numpy(dtype='float64'))
+            compiled.save(self.compiled_model_path)
+
+            logger.info(f"Compiled model saved at {self.compiled_model_path}")
+
+        except Exception as e:
+            logger.error(f"Error in exporting compiled model: {str(e)}")
+            raise CustomException(f"Error in exporting compiled model: {str(e)}", sys)
     
-    def run(self):
+    def run(self, data=None):
+        ## pass data to train on an in-memory engineered frame instead of reading data_path
         try:
             mlflow.set_experiment(self.experiment_name)
-            with mlflow.start_run():
+            with mlflow.start_run() as run:
+                ## kept so the pipeline's profiling report can be attached to this run afterwards
+                self.run_id = run.info.run_id
 
-                data = self.load_data()
+                if data is None:
+                    data = self.load_data()
 
                 X_train, X_test, y_train, y_test = self.split_data(data)
 
                 with open(self.params_path) as f:
                     params = json.load(f)
 
-                logger.info(f"loaded hyperparameters: {params}")
-                mlflow.log_params({f"grid_{key}" : value for key, value in params.items()})
+                ## "search" picks grid (GridSearchCV) or halving (SuccessiveHalvingSearch), the rest is the grid
+                search = params.pop("search", "grid")
+                search_options = params.pop("search_options", {})
+                params.pop("warm_start", None)
+                use_model_selection = params.pop("use_model_selection", False)
 
-                best_params = self.train_model(X_train, y_train, params)
+                selected_model = self.load_selected_model() if use_model_selection else None
+
+                if selected_model is not None and not isinstance(selected_model, lgb.LGBMClassifier):
+                    best_params = self.train_selected_model(X_train, y_train, selected_model)
+                else:
+                    logger.info(f"loaded hyperparameters: {params}")
+                    mlflow.log_params({f"grid_{key}" : value for key, value in params.items()})
+                    mlflow.log_param("search", search)
+
+                    best_params = self.train_model(X_train, y_train, params, search = search, search_options = search_options)
 
                 logger.info(f"Best Parameters: {best_params}")
 
@@ -132,7 +358,11 @@ class ModelTraining:
                     if metric != 'confusion_matrix':
                         mlflow.log_metric(metric, value)
                     
-                self.save_model()
+                self.save_model(X_test)
+
+                ## the compiled export only exists for LightGBM
+                if isinstance(self.best_model, lgb.LGBMClassifier):
+                    self.export_compiled_model(data.drop(columns = 'satisfaction'))
 
                 mlflow.sklearn.log_model(self.best_model, "model")
 
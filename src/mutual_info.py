@@ -0,0 +1,85 @@
+import os
+import sys
+import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from src.logger import get_logger
+from src.custom_exception import CustomException
+
+logger = get_logger(__name__)
+
+MAX_CACHE_ENTRIES = 20
+
+
+def discrete_mutual_info(values, y_codes, n_classes):
+    ## MI (nats) between one discrete feature and the label from their contingency table,
+    ## the same value sklearn's mutual_info_classif gives with discrete_features=True
+    x_codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    table = np.bincount(x_codes * n_classes + y_codes, minlength=len(uniques) * n_classes).reshape(len(uniques), n_classes)
+
+    n = table.sum()
+    x_counts = table.sum(axis=1, keepdims=True)
+    y_counts = table.sum(axis=0, keepdims=True)
+
+    nonzero = table > 0
+    joint = table[nonzero]
+    expected = (x_counts * y_counts)[nonzero]
+    mi = np.sum(joint / n * (np.log(joint * n) - np.log(expected)))
+    return max(float(mi), 0.0)
+
+
+def mutual_info_ranking(X, y, n_jobs = 1):
+    ## returns a DataFrame of Feature / Mutual Information sorted high to low
+    y_codes, classes = pd.factorize(y, use_na_sentinel=False)
+    n_jobs = n_jobs or os.cpu_count()
+
+    with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+        scores = list(pool.map(lambda col : discrete_mutual_info(X[col].to_numpy(), y_codes, len(classes)), X.columns))
+
+    return pd.DataFrame({
+        'Feature': X.columns,
+        'Mutual Information': scores
+        }).sort_values(by='Mutual Information', ascending=False, kind='stable')
+
+
+def data_fingerprint(df, config):
+    ## content hash of the frame (values, column names, dtypes) plus the selection config
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    digest.update(json.dumps([list(df.columns), [str(dtype) for dtype in df.dtypes], config], sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def load_cached_ranking(cache_path, fingerprint):
+    if not os.path.exists(cache_path):
+        return None
+    with open(cache_path) as f:
+        cache = json.load(f)
+    entry = cache.get(fingerprint)
+    if entry is None:
+        return None
+    return pd.DataFrame(entry)
+
+
+def save_cached_ranking(cache_path, fingerprint, ranking):
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        cache = {}
+        if os.path.exists(cache_path):
+            with open(cache_path) as f:
+                cache = json.load(f)
+        cache.pop(fingerprint, None)
+        cache[fingerprint] = ranking.to_dict(orient="list")
+        ## keep only the most recent rankings
+        cache = dict(list(cache.items())[-MAX_CACHE_ENTRIES:])
+
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, cache_path)
+
+    except Exception as e:
+        logger.error(f"Error while saving mutual information cache: {e}")
+        raise CustomException(f"Error while saving mutual information cache: {e}", sys)
@@ -0,0 +1,111 @@
+import os
+import time
+import struct
+import threading
+from collections import OrderedDict
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+## position of the continuous features in the model input (see utils.helpers.FEATURE_ORDER)
+DELAY_RATIO_INDEX = 1
+FLIGHT_DISTANCE_INDEX = 6
+
+## rough per-entry cost: 96 byte key + OrderedDict node + boxed result
+ENTRY_BYTES = 250
+
+
+class PredictionCache:
+    """Bounded LRU cache of predictions keyed on the 12 model features.
+
+    The key is the feature vector packed as float64 bytes. delay_ratio_decimals and
+    distance_step optionally round the two continuous features first, so nearby inputs
+    share an entry (and get the prediction of whichever one was scored first).
+    The cache empties itself when the model file's mtime or size changes.
+    """
+
+    def __init__(self, model_path, max_entries = 100000, delay_ratio_decimals = None, distance_step = None, check_interval = 1.0):
+        self.model_path = model_path
+        self.max_entries = int(max_entries)
+        if self.max_entries < 1:
+            raise ValueError(f"max_entries must be at least 1, got {max_entries}")
+        self.delay_ratio_decimals = delay_ratio_decimals
+        self.distance_step = distance_step
+        self.check_interval = check_interval
+
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.packer = struct.Struct("<12d")
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        self.model_signature = self._model_signature()
+        self.last_check = time.monotonic()
+
+    def _model_signature(self):
+        try:
+            stat = os.stat(self.model_path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+    def _check_model(self):
+        now = time.monotonic()
+        if now - self.last_check < self.check_interval:
+            return
+        self.last_check = now
+
+        signature = self._model_signature()
+        if signature != self.model_signature:
+            self.model_signature = signature
+            self.invalidations += 1
+            self.entries.clear()
+            logger.info(f"Prediction cache cleared, model file changed : {self.model_path}")
+
+    def key(self, row):
+        row = [float(x) for x in row]
+        if self.delay_ratio_decimals is not None:
+            row[DELAY_RATIO_INDEX] = round(row[DELAY_RATIO_INDEX], self.delay_ratio_decimals)
+        if self.distance_step:
+            row[FLIGHT_DISTANCE_INDEX] = round(row[FLIGHT_DISTANCE_INDEX] / self.distance_step) * self.distance_step
+        return self.packer.pack(*row)
+
+    def get(self, key):
+        ## returns None on a miss
+        with self.lock:
+            self._check_model()
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries" : len(self.entries),
+            "max_entries" : self.max_entries,
+            "approx_bytes" : len(self.entries) * ENTRY_BYTES,
+            "hits" : self.hits,
+            "misses" : self.misses,
+            "hit_rate" : self.hits / lookups if lookups else 0.0,
+            "evictions" : self.evictions,
+            "invalidations" : self.invalidations
+        }
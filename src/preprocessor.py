@@ -0,0 +1,162 @@
+import os
+import sys
+import joblib
+import numpy as np
+import pandas as pd
+from src.logger import get_logger
+from src.custom_exception import CustomException
+from src.categorical_encoder import CategoricalEncoder
+from utils.helpers import RAW_COLUMN_MAPPING, atomic_write
+
+logger = get_logger(__name__)
+
+
+class FittedPreprocessor:
+    """Statistics learned during training, applied the same way at serving time.
+
+    clip_bounds : {column: (lower, upper)} from DataProcessor.handle_outliers
+    fill_values : {column: median} from DataProcessor.handle_null_values
+    encoder     : CategoricalEncoder fitted by FeaturEngineering.label_encoding
+
+    Columns are stored under their raw dataset names; the serving field names from
+    utils.helpers.RAW_COLUMN_MAPPING are accepted as aliases.
+    Order of operations is clip -> fill -> encode, the same as the training pipeline.
+    """
+
+    def __init__(self):
+        self.clip_bounds = {}
+        self.fill_values = {}
+        self.encoder = CategoricalEncoder()
+
+    @property
+    def encodings(self):
+        return {col : self.encoder.mapping(col) for col in self.encoder.categories}
+
+    def _stats(self, table, column):
+        ## look up a column by raw name or by serving alias
+        if column in table:
+            return table[column]
+        for raw_name, alias in RAW_COLUMN_MAPPING.items():
+            if alias == column and raw_name in table:
+                return table[raw_name]
+        return None
+
+    def _encoded_column(self, column):
+        ## raw name of an encoded column, or None
+        if column in self.encoder:
+            return column
+        for raw_name, alias in RAW_COLUMN_MAPPING.items():
+            if alias == column and raw_name in self.encoder:
+                return raw_name
+        return None
+
+    def fit_clip_bounds(self, column, lower, upper):
+        self.clip_bounds[column] = (float(lower), float(upper))
+
+    def fit_fill_value(self, column, value):
+        self.fill_values[column] = float(value)
+
+    def fit_encoding(self, column, mapping):
+        ## mapping is {category: code} with codes 0..n-1
+        self.encoder.set_categories(column, sorted(mapping, key=mapping.get))
+
+    def transform_columns(self, columns):
+        ## columns is {name: array-like}; returns a new dict with NumPy arrays
+        out = {}
+        for name, values in columns.items():
+            encoded_column = self._encoded_column(name)
+            if encoded_column is not None:
+                out[name] = self._encode_array(encoded_column, values)
+                continue
+
+            bounds = self._stats(self.clip_bounds, name)
+            fill_value = self._stats(self.fill_values, name)
+            if bounds is None and fill_value is None:
+                out[name] = np.asarray(values)
+                continue
+
+            values = np.asarray(values, dtype=np.float64)
+            if bounds is not None:
+                values = np.clip(values, bounds[0], bounds[1])
+            if fill_value is not None:
+                values = np.where(np.isnan(values), fill_value, values)
+            out[name] = values
+        return out
+
+    def transform(self, df):
+        ## DataFrame in, DataFrame out (same columns, same index)
+        columns = self.transform_columns({name : df[name].to_numpy() for name in df.columns})
+        return pd.DataFrame(columns, index=df.index)
+
+    def transform_array(self, X, column_names):
+        columns = self.transform_columns({name : X[:, idx] for idx, name in enumerate(column_names)})
+        return np.column_stack([columns[name] for name in column_names]).astype(np.float64)
+
+    def transform_row(self, row):
+        ## single {name: value} record, plain python only
+        out = {}
+        for name, value in row.items():
+            encoded_column = self._encoded_column(name)
+            if encoded_column is not None:
+                out[name] = self._encode_value(encoded_column, value)
+                continue
+
+            bounds = self._stats(self.clip_bounds, name)
+            fill_value = self._stats(self.fill_values, name)
+            if bounds is None and fill_value is None:
+                out[name] = value
+                continue
+
+            value = float(value)
+            if bounds is not None:
+                value = min(max(value, bounds[0]), bounds[1])
+            if fill_value is not None and value != value:
+                value = fill_value
+            out[name] = value
+        return out
+
+    def _encode_value(self, column, value):
+        code = self.encoder.encode_value(column, value)
+        if not pd.isna(code):
+            return code
+        code = self._known_codes(column, [value])[0]
+        return code if pd.isna(code) else int(code)
+
+    def _encode_array(self, column, values):
+        values = np.asarray(values)
+        if values.dtype.kind in "iuf":
+            return self._known_codes(column, values)
+
+        codes = self.encoder.encode(column, values)
+        unknown = pd.isna(codes)
+        if unknown.any():
+            codes[unknown] = self._known_codes(column, values[unknown])
+        return codes
+
+    def _known_codes(self, column, values):
+        ## already-encoded input, e.g. the "0"/"1"/"2" values posted by the form or numbers in a batch:
+        ## whole numbers in 0..n_categories-1 are kept, anything else is unknown; shared by the row and array paths
+        numeric = pd.to_numeric(pd.Series(values, dtype=object), errors="coerce").to_numpy(dtype=np.float64)
+        valid = (numeric >= 0) & (numeric < len(self.encoder.categories[column])) & (numeric == np.floor(numeric))
+        return np.where(valid, numeric, np.nan)
+
+    def save(self, path):
+        try:
+            with atomic_write(path) as tmp_path:
+                joblib.dump(self, tmp_path)
+            logger.info(f"Preprocessor saved at {path}")
+
+        except Exception as e:
+            logger.error(f"Error while saving preprocessor: {e}")
+            raise CustomException(f"Error while saving preprocessor: {e}", sys)
+
+    @staticmethod
+    def load(path):
+        return joblib.load(path)
+
+    @staticmethod
+    def load_or_new(path):
+        ## later stages add to what earlier stages fitted
+        if os.path.exists(path):
+            return FittedPreprocessor.load(path)
+        return FittedPreprocessor()
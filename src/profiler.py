@@ -0,0 +1,216 @@
+import os
+import sys
+import json
+import time
+import cProfile
+import resource
+import functools
+import threading
+from contextlib import contextmanager
+import pandas as pd
+from src.logger import get_logger
+from src.custom_exception import CustomException
+
+logger = get_logger(__name__)
+
+
+def current_peak_rss_mb():
+    ## VmHWM is the peak RSS since the last reset (see reset_peak_rss), ru_maxrss the peak of the whole process
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def reset_peak_rss():
+    ## Linux only: writing 5 to clear_refs resets VmHWM to the current RSS ; the counter belongs to the
+    ## whole process, so this also resets it under any stage another thread is running
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def count_rows(*values):
+    ## rows in the DataFrames among values (tuples are searched one level deep)
+    rows = None
+    for value in values:
+        items = value if isinstance(value, tuple) else (value,)
+        for item in items:
+            if isinstance(item, pd.DataFrame):
+                rows = (rows or 0) + len(item)
+    return rows
+
+
+class PipelineProfiler:
+    """Wall time, CPU time, peak RSS and row counts for each pipeline stage and sub-step.
+
+    Stages nest: a stage opened inside another is recorded as "parent/child". CPU time
+    includes threads and finished child processes. Stages listed in cprofile_stages (or
+    all of them with "all") also run under cProfile and dump a .prof file to profile_dir.
+
+    Peak RSS is a process-wide counter. peak_rss_scope tells what a stage's number covers:
+    "stage" when the counter was reset at its start and no other thread ran a stage
+    meanwhile, "shared" when stages overlapped on several threads (the counter is then not
+    reset and the peak includes the other stages' memory), "process" when it cannot be reset.
+    """
+
+    def __init__(self):
+        self.records = []
+        self.cprofile_stages = set()
+        self.profile_dir = None
+        ## each thread nests its own stages (e.g. BackgroundWriter saves run beside the main pipeline)
+        self._local = threading.local()
+        self._cprofile_active = False
+        ## open stages of every thread, to spot overlapping ones
+        self._open = []
+        self._open_lock = threading.Lock()
+
+    @property
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def enable_cprofile(self, stages, profile_dir):
+        self.cprofile_stages = set(stages)
+        self.profile_dir = profile_dir
+
+    def _wants_cprofile(self, path):
+        if self._cprofile_active or not self.cprofile_stages:
+            return False
+        return "all" in self.cprofile_stages or path in self.cprofile_stages or path.split("/")[-1] in self.cprofile_stages
+
+    @contextmanager
+    def stage(self, name, rows_in = None):
+        path = f"{self._stack[-1]['stage']}/{name}" if self._stack else name
+        record = {"stage" : path, "rows_in" : rows_in, "rows_out" : None, "status" : "ok", "_peak" : 0.0, "_thread" : threading.get_ident()}
+
+        ## keep the parent's peak so far before this stage resets the counter
+        if self._stack:
+            self._stack[-1]["_peak"] = max(self._stack[-1]["_peak"], current_peak_rss_mb())
+
+        with self._open_lock:
+            others = [other for other in self._open if other["_thread"] != record["_thread"]]
+            if others:
+                ## resetting now would wipe the peak the other threads' stages are measuring
+                for other in others + [record]:
+                    other["peak_rss_scope"] = "shared"
+            else:
+                record["peak_rss_scope"] = "stage" if reset_peak_rss() else "process"
+            self._open.append(record)
+
+        profile = None
+        if self._wants_cprofile(path):
+            profile = cProfile.Profile()
+            self._cprofile_active = True
+
+        self._stack.append(record)
+        self.records.append(record)
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        start_children = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+        try:
+            if profile is not None:
+                profile.enable()
+            yield record
+
+        except Exception:
+            record["status"] = "error"
+            raise
+
+        finally:
+            if profile is not None:
+                profile.disable()
+                self._cprofile_active = False
+
+            children = resource.getrusage(resource.RUSAGE_CHILDREN)
+            record["wall_seconds"] = time.perf_counter() - start_wall
+            record["cpu_seconds"] = (time.process_time() - start_cpu) + (children.ru_utime - start_children.ru_utime) + (children.ru_stime - start_children.ru_stime)
+            record["peak_rss_mb"] = max(record.pop("_peak"), current_peak_rss_mb())
+
+            ## stages that do not see the data themselves take their rows from their sub-steps
+            sub_steps = [step for step in self.records if step["stage"].startswith(path + "/") and "/" not in step["stage"][len(path) + 1:]]
+            if record["rows_in"] is None:
+                record["rows_in"] = next((step["rows_in"] or step["rows_out"] for step in sub_steps if (step["rows_in"] or step["rows_out"]) is not None), None)
+            if record["rows_out"] is None:
+                record["rows_out"] = next((step["rows_out"] or step["rows_in"] for step in reversed(sub_steps) if (step["rows_out"] or step["rows_in"]) is not None), None)
+
+            rows = record["rows_out"] if record["rows_out"] is not None else record["rows_in"]
+            record["rows_per_sec"] = rows / record["wall_seconds"] if rows and record["wall_seconds"] > 0 else None
+
+            self._stack.pop()
+            with self._open_lock:
+                self._open = [other for other in self._open if other is not record]
+            record.pop("_thread")
+            if self._stack:
+                self._stack[-1]["_peak"] = max(self._stack[-1]["_peak"], record["peak_rss_mb"])
+
+            if profile is not None:
+                self.dump_cprofile(profile, path)
+
+            logger.info(f"[profile] {path} : wall {record['wall_seconds']:.2f}s , cpu {record['cpu_seconds']:.2f}s , peak rss {record['peak_rss_mb']:.0f} MB ({record['peak_rss_scope']}) , rows {record['rows_in']} -> {record['rows_out']}")
+
+    def dump_cprofile(self, profile, path):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        stats_path = os.path.join(self.profile_dir, path.replace("/", "__") + ".prof")
+        profile.dump_stats(stats_path)
+        logger.info(f"[profile] cProfile stats for {path} written to {stats_path}")
+
+    def report(self):
+        ## finished stages in the order they started
+        return {
+            "stages" : [record for record in self.records if "wall_seconds" in record],
+            "process_peak_rss_mb" : resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        }
+
+    def save(self, path):
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                json.dump(self.report(), f, indent=4)
+            logger.info(f"Profiling report saved at {path}")
+
+        except Exception as e:
+            logger.error(f"Error while saving profiling report: {e}")
+            raise CustomException(f"Error while saving profiling report: {e}", sys)
+
+    def log_to_mlflow(self):
+        import mlflow
+        mlflow.log_dict(self.report(), "profile_report.json")
+        for record in self.report()["stages"]:
+            key = record["stage"].replace("/", ".")
+            mlflow.log_metrics({f"profile.{key}.{field}" : record[field] for field in ("wall_seconds", "cpu_seconds", "peak_rss_mb") if record[field] is not None})
+
+
+## one profiler per process; main.py saves its report when the pipeline finishes
+profiler = PipelineProfiler()
+
+
+def profiled(name = None):
+    ## decorator: records the call as a stage; rows come from DataFrame arguments / self.df and the return value
+    def decorator(fn):
+        stage_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            owner = args[0] if args else None
+            rows_in = count_rows(*args[1:], *kwargs.values())
+            if rows_in is None:
+                rows_in = count_rows(getattr(owner, "df", None))
+
+            with profiler.stage(stage_name, rows_in = rows_in) as record:
+                result = fn(*args, **kwargs)
+                rows_out = count_rows(result)
+                record["rows_out"] = rows_out if rows_out is not None else count_rows(getattr(owner, "df", None))
+                return result
+
+        return wrapper
+    return decorator
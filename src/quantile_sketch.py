@@ -0,0 +1,84 @@
+import math
+import numpy as np
+
+
+class QuantileSketch:
+    """Mergeable approximate quantile sketch (KLL style) for one numeric column.
+
+    Values are kept in levels; an item on level h stands for 2**h original values.
+    When a level is over capacity it is sorted and every other item (random offset)
+    moves up one level. epsilon is the target rank error, e.g. 0.005 means the
+    returned Q1 is within +-0.5% of the true 25th percentile rank. NaNs are ignored,
+    same as pandas' quantile.
+
+    Quantiles have rank semantics: the answer is always one of the values seen, never an
+    interpolation between two of them. On an integer column (ratings, whole-minute delays)
+    the median is therefore a whole number where pandas' median may be x.5, and the
+    out-of-core clip bounds / fill value can differ from the in-memory ones by that much.
+    """
+
+    def __init__(self, epsilon = 0.005, seed = 42):
+        self.epsilon = epsilon
+        self.k = max(int(math.ceil(2.0 / epsilon)), 8)
+        self.levels = [np.empty(0, dtype=np.float64)]
+        self.count = 0
+        self.rng = np.random.default_rng(seed)
+
+    def capacity(self, level):
+        ## lower levels get geometrically smaller buffers, the top level gets k
+        depth = len(self.levels) - level - 1
+        return max(int(math.ceil(self.k * (2.0 / 3.0) ** depth)), 2)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return self
+
+        self.count += values.size
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0, dtype=np.float64))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self._compress()
+        return self
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if items.size > self.capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0, dtype=np.float64))
+
+                items = np.sort(items)
+                ## an odd item out stays on this level so no weight is lost
+                keep = items[-1:] if items.size % 2 else items[:0]
+                pairs = items[:items.size - keep.size]
+
+                promoted = pairs[self.rng.integers(2)::2]
+                self.levels[level] = keep
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def quantiles(self, qs):
+        items = np.concatenate(self.levels)
+        if items.size == 0:
+            return [float("nan")] * len(qs)
+
+        weights = np.concatenate([np.full(level_items.size, 2 ** level, dtype=np.float64) for level, level_items in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        items, cumulative = items[order], np.cumsum(weights[order])
+
+        total = cumulative[-1]
+        positions = np.searchsorted(cumulative, [q * total for q in qs], side="left")
+        return [float(items[min(pos, items.size - 1)]) for pos in positions]
+
+    def quantile(self, q):
+        return self.quantiles([q])[0]
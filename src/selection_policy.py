@@ -0,0 +1,34 @@
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+## kept apart from src/model_selection.py (which pulls in xgboost and torch) so the policy can be reused and tested alone
+
+
+def pareto_front(results, metric):
+    ## names of the candidates no other candidate beats on both metric (higher) and p99 latency (lower);
+    ## candidates that failed or cannot give probabilities (needed by save_model's canary and /predict/batch) are left out
+    scored = {name : result for name, result in results.items() if 'error' not in result and result.get('predict_proba')}
+    front = []
+    for name, result in scored.items():
+        dominated = any(
+            other[metric] >= result[metric] and other['latency_p99_ms'] <= result['latency_p99_ms']
+            and (other[metric] > result[metric] or other['latency_p99_ms'] < result['latency_p99_ms'])
+            for other_name, other in scored.items() if other_name != name
+        )
+        if not dominated:
+            front.append(name)
+    return front
+
+
+def select_model(results, policy):
+    ## best policy metric under the p99 limit; falls back to the fastest model on the Pareto front
+    metric, max_p99_ms = policy["metric"], policy.get("max_p99_ms")
+    front = pareto_front(results, metric)
+    if not front:
+        raise ValueError("no candidate was fitted that can predict probabilities")
+    allowed = [name for name in front if max_p99_ms is None or results[name]['latency_p99_ms'] <= max_p99_ms]
+    if allowed:
+        return max(allowed, key=lambda name : results[name][metric]), front
+    logger.info(f"no candidate meets p99 <= {max_p99_ms} ms, using the fastest model on the Pareto front")
+    return min(front, key=lambda name : results[name]['latency_p99_ms']), front
@@ -0,0 +1,66 @@
+import math
+import numpy as np
+import pytest
+from src.preprocessor import FittedPreprocessor
+from utils.helpers import CATEGORY_CODES, build_feature_row
+
+FORM = {
+    "Departure Delay" : "10",
+    "Arrival Delay" : "5",
+    "Flight Distance" : "1200",
+    "Online Boarding" : "4",
+    "Inflight wifi service" : "3",
+    "Class" : "Business",
+    "Type of Travel" : "Business travel",
+    "Inflight entertainment" : "5",
+    "Seat comfort" : "4",
+    "Leg room service" : "3",
+    "On-board service" : "4",
+    "Cleanliness" : "5",
+    "Ease of Online Booking" : "3",
+}
+
+
+@pytest.fixture
+def preprocessor():
+    preprocessor = FittedPreprocessor()
+    for column, mapping in CATEGORY_CODES.items():
+        preprocessor.fit_encoding(column, mapping)
+    return preprocessor
+
+
+@pytest.fixture
+def client(monkeypatch, preprocessor):
+    import application
+    monkeypatch.setattr(application.reloader.bundle, "preprocessor", preprocessor)
+    return application.app.test_client()
+
+
+def test_unseen_category_becomes_nan(preprocessor):
+    row = build_feature_row(preprocessor.transform_row(dict(FORM, Class="First")))
+    assert [math.isnan(value) for value in row].count(True) == 1
+
+
+@pytest.mark.parametrize("values", [[0, 2, 7, -1, 1.5], [0.0, 2.0, np.nan], ["0", "2", "7", "-1", "Eco", "First", None]])
+def test_row_and_array_paths_agree_on_codes(preprocessor, values):
+    ## Class has 3 categories: 7, -1 and 1.5 are no valid code and must not reach the model
+    rows = [preprocessor.transform_row({"Class" : value})["Class"] for value in values]
+    array = preprocessor.transform_columns({"Class" : np.array(values, dtype=object if isinstance(values[0], str) else None)})["Class"]
+    np.testing.assert_array_equal(np.array(rows, dtype=np.float64), array.astype(np.float64))
+    assert np.isnan(array[2])
+
+
+def test_form_scores_an_unseen_category(client):
+    response = client.post("/", data=dict(FORM, Class="First"))
+    assert response.status_code == 200
+    assert b"Prediction :" in response.data
+    assert b"Error" not in response.data
+
+
+def test_batch_scores_an_unseen_category(client):
+    records = [FORM, dict(FORM, Class="First"), dict(FORM, **{"Type of Travel" : "Space travel"})]
+    response = client.post("/predict/batch", json={"records" : records})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["count"] == 3
+    assert all(0.0 <= probability <= 1.0 for probability in body["probabilities"])
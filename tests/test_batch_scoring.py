@@ -0,0 +1,60 @@
+import shutil
+import numpy as np
+import pandas as pd
+import pytest
+from src.batch_scoring import BatchScorer
+from src.preprocessor import FittedPreprocessor
+from utils.helpers import CATEGORY_CODES, build_feature_row, read_artifact
+import joblib
+
+FIELDS = {
+    "Departure Delay" : [10, 0, 45, 3, 120, 0],
+    "Arrival Delay" : [5, 0, 50, 0, 110, 2],
+    "Flight Distance" : [1200, 300, 2500, 800, 4000, 150],
+    "Online Boarding" : [4, 2, 5, 1, 3, 5],
+    "Inflight wifi service" : [3, 1, 5, 2, 4, 0],
+    "Class" : ["Business", "Eco", "Eco Plus", "Business", "Eco", "Eco"],
+    "Type of Travel" : ["Business travel", "Personal Travel", "Business travel", "Business travel", "Personal Travel", "Business travel"],
+    "Inflight entertainment" : [5, 2, 4, 1, 3, 5],
+    "Seat comfort" : [4, 1, 5, 2, 3, 4],
+    "Leg room service" : [3, 2, 5, 1, 4, 4],
+    "On-board service" : [4, 2, 5, 3, 1, 5],
+    "Cleanliness" : [5, 1, 4, 2, 3, 5],
+    "Ease of Online Booking" : [3, 2, 5, 1, 4, 4],
+}
+
+
+@pytest.fixture
+def model_dir(tmp_path):
+    ## a model directory away from artifacts/model, with its own preprocessor that clips long flights
+    model_dir = tmp_path / "other_model"
+    model_dir.mkdir()
+    shutil.copyfile("artifacts/model/trained_model.pkl", model_dir / "trained_model.pkl")
+    preprocessor = FittedPreprocessor()
+    for column, mapping in CATEGORY_CODES.items():
+        preprocessor.fit_encoding(column, mapping)
+    preprocessor.fit_clip_bounds("Flight Distance", 0, 1000)
+    preprocessor.save(str(model_dir / "preprocessor.pkl"))
+    return model_dir
+
+
+@pytest.mark.parametrize("n_workers", [1, 2])
+def test_scores_match_the_model_with_the_preprocessor_next_to_it(tmp_path, model_dir, n_workers):
+    input_path = str(tmp_path / "input.csv")
+    pd.DataFrame(dict(FIELDS, id=range(6))).to_csv(input_path, index=False)
+    output_path = str(tmp_path / f"scores_{n_workers}.csv")
+
+    scorer = BatchScorer(input_path, output_path, model_path=str(model_dir / "trained_model.pkl"), chunk_size=4, n_workers=n_workers)
+    assert scorer.preprocessor_path == str(model_dir / "preprocessor.pkl")
+    assert scorer.run() == 6
+
+    ## expected scores through the single-row path: preprocessor.transform_row + build_feature_row
+    model = joblib.load(model_dir / "trained_model.pkl")
+    preprocessor = FittedPreprocessor.load(str(model_dir / "preprocessor.pkl"))
+    records = pd.DataFrame(FIELDS).to_dict("records")
+    X = np.array([build_feature_row(preprocessor.transform_row(record)) for record in records])
+    expected = model.predict_proba(X)[:, 1]
+
+    scores = read_artifact(output_path)
+    assert scores["id"].tolist() == list(range(6))
+    np.testing.assert_allclose(scores["probability"].to_numpy(), expected, rtol=1e-12)
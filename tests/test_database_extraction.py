@@ -0,0 +1,168 @@
+import os
+import csv
+import json
+import sqlite3
+import pandas as pd
+import pytest
+from src.database_extraction import MySQLDataExtractor
+from src.data_ingestion import DataIngestion, partition_bounds, raw_data_source, read_raw_data
+from utils.helpers import read_artifact
+
+DB_CONFIG = {"host" : "localhost", "user" : "test", "password" : "", "database" : "test", "table_name" : "train"}
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "airline.db")
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE train (id INTEGER PRIMARY KEY, rating INTEGER)")
+    connection.executemany("INSERT INTO train VALUES (?, ?)", [(i, i % 5) for i in range(1, 101)])
+    connection.commit()
+    connection.close()
+    return path
+
+
+def read_rows(path):
+    with open(path, newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def test_streaming_reuses_the_injected_connection(db_path, tmp_path):
+    connection = sqlite3.connect(db_path)
+    extractor = MySQLDataExtractor(DB_CONFIG, connection=connection)
+
+    assert extractor.extract_streaming(output_folder=str(tmp_path / "out"), batch_size=7) == 100
+    ## a second extraction on the same extractor must not hit a closed connection
+    assert extractor.extract_streaming(output_folder=str(tmp_path / "out"), batch_size=7) == 100
+    assert extractor.connection is connection
+    assert len(read_rows(tmp_path / "out" / "data.csv")) == 100
+    connection.close()
+
+
+def test_incremental_only_fetches_new_rows(db_path, tmp_path):
+    connection = sqlite3.connect(db_path)
+    extractor = MySQLDataExtractor(DB_CONFIG, connection=connection)
+    partitions_dir = str(tmp_path / "partitions")
+    watermark_path = str(tmp_path / "state" / "watermark.json")
+
+    first = extractor.extract_incremental(partitions_dir=partitions_dir, watermark_path=watermark_path, batch_size=16)
+    assert len(read_rows(first)) == 100
+
+    connection.executemany("INSERT INTO train VALUES (?, ?)", [(i, 0) for i in range(101, 111)])
+    connection.commit()
+    second = extractor.extract_incremental(partitions_dir=partitions_dir, watermark_path=watermark_path, batch_size=16)
+    assert [int(row["id"]) for row in read_rows(second)] == list(range(101, 111))
+
+    assert extractor.extract_incremental(partitions_dir=partitions_dir, watermark_path=watermark_path) is None
+    with open(watermark_path) as f:
+        assert json.load(f)["value"] == 110
+    connection.close()
+
+
+def test_parallel_covers_every_row_once(db_path, tmp_path):
+    extractor = MySQLDataExtractor(DB_CONFIG, connection_factory=lambda: sqlite3.connect(db_path))
+    output_folder = str(tmp_path / "parts")
+
+    manifest = extractor.extract_parallel(output_folder=output_folder, n_workers=3, n_partitions=4, batch_size=9)
+
+    assert manifest["rows"] == 100
+    ids = []
+    for partition in manifest["partitions"]:
+        ids += [int(row["id"]) for row in read_rows(os.path.join(output_folder, partition["file"]))]
+    assert sorted(ids) == list(range(1, 101))
+
+
+def test_ingestion_reads_the_parallel_parts_through_the_manifest(tmp_path):
+    db_path = str(tmp_path / "airline.db")
+    connection = sqlite3.connect(db_path)
+    connection.execute('CREATE TABLE train (id INTEGER PRIMARY KEY, Class TEXT, "Arrival Delay in Minutes" REAL)')
+    ## the first rows have no delay, so the first batch of the first part is all NULL in that column
+    connection.executemany("INSERT INTO train VALUES (?, ?, ?)", [(i, "Eco" if i % 2 else "Business", None if i <= 30 else i / 2) for i in range(1, 101)])
+    connection.commit()
+    connection.close()
+
+    extractor = MySQLDataExtractor(DB_CONFIG, connection_factory=lambda: sqlite3.connect(db_path))
+    output_folder = str(tmp_path / "parts")
+    extractor.extract_parallel(output_folder=output_folder, n_workers=2, n_partitions=3, batch_size=9, file_format="parquet")
+
+    manifest_path = os.path.join(output_folder, "manifest.json")
+    assert raw_data_source(str(tmp_path / "missing.csv"), manifest_path) == manifest_path
+    data = read_raw_data(manifest_path)
+
+    assert data["id"].tolist() == list(range(1, 101))
+    assert str(data["Arrival Delay in Minutes"].dtype) == "float32"
+    assert data["Arrival Delay in Minutes"].isna().sum() == 30
+    assert data["Arrival Delay in Minutes"].iloc[-1] == 50.0
+    assert str(data["Class"].dtype) == "category"
+
+    ingestion = DataIngestion(raw_data_path=manifest_path, ingested_data_path=str(tmp_path / "ingested"))
+    train_data, test_data = ingestion.split_data(train_path=None, test_path=None, save=False)
+    assert len(train_data) + len(test_data) == 100
+
+
+def test_partitions_are_ingested_in_key_order(tmp_path):
+    connection = sqlite3.connect(":memory:")
+    connection.execute("CREATE TABLE train (id INTEGER PRIMARY KEY, rating INTEGER)")
+    extractor = MySQLDataExtractor(DB_CONFIG, connection=connection)
+    partitions_dir = str(tmp_path / "partitions")
+    watermark_path = str(tmp_path / "watermark.json")
+
+    ## bounds 0-9, 9-10 and 10-100 sort out of key order as unpadded strings
+    for low, high in ((1, 9), (10, 10), (11, 100)):
+        connection.executemany("INSERT INTO train VALUES (?, ?)", [(i, 0) for i in range(low, high + 1)])
+        extractor.extract_incremental(partitions_dir=partitions_dir, watermark_path=watermark_path)
+    connection.close()
+
+    ingestion = DataIngestion(raw_data_path=None, ingested_data_path=str(tmp_path / "ingested"))
+    state_path = str(tmp_path / "ingested" / "state.json")
+    ingestion.ingest_partitions(partitions_dir=partitions_dir, state_path=state_path,
+                                train_path=str(tmp_path / "ingested" / "train.csv"), test_path=str(tmp_path / "ingested" / "test.csv"))
+
+    with open(state_path) as f:
+        ingested = json.load(f)["partitions"]
+    assert ingested == ["part-000000000000-000000000009.csv", "part-000000000009-000000000010.csv", "part-000000000010-000000000100.csv"]
+    assert sum(len(train) + len(test) for train, test in zip(ingestion.new_train_data, ingestion.new_test_data)) == 100
+
+
+def test_partition_bounds_reads_old_unpadded_names():
+    names = ["part-10-100.csv", "part-9-10.csv", "part-start-9.csv"]
+    assert sorted(names, key=partition_bounds) == ["part-start-9.csv", "part-9-10.csv", "part-10-100.csv"]
+
+
+def make_partitions(tmp_path, bounds):
+    connection = sqlite3.connect(":memory:")
+    connection.execute("CREATE TABLE train (id INTEGER PRIMARY KEY, rating INTEGER)")
+    extractor = MySQLDataExtractor(DB_CONFIG, connection=connection)
+    partitions_dir = str(tmp_path / "partitions")
+    for low, high in bounds:
+        connection.executemany("INSERT INTO train VALUES (?, ?)", [(i, i % 5) for i in range(low, high + 1)])
+        extractor.extract_incremental(partitions_dir=partitions_dir, watermark_path=str(tmp_path / "watermark.json"))
+    connection.close()
+    return partitions_dir
+
+
+@pytest.mark.parametrize("extension", ["csv", "parquet"])
+def test_crash_between_append_and_state_does_not_duplicate_rows(tmp_path, monkeypatch, extension):
+    partitions_dir = make_partitions(tmp_path, ((1, 40), (41, 100)))
+    paths = {"state_path" : str(tmp_path / "ingested" / "state.json"), "train_path" : str(tmp_path / "ingested" / f"train.{extension}"),
+             "test_path" : str(tmp_path / "ingested" / f"test.{extension}")}
+    ingestion = DataIngestion(raw_data_path=None, ingested_data_path=str(tmp_path / "ingested"))
+
+    ## the process dies after the train rows of the last batch are written, before the test rows and the state
+    append_data = ingestion.append_data
+    def crash_on_last_test_append(data, path):
+        if path == paths["test_path"] and data["id"].max() > 40:
+            raise RuntimeError("killed")
+        append_data(data, path)
+    monkeypatch.setattr(ingestion, "append_data", crash_on_last_test_append)
+    with pytest.raises(Exception):
+        ingestion.ingest_partitions(partitions_dir=partitions_dir, **paths)
+
+    monkeypatch.setattr(ingestion, "append_data", append_data)
+    assert ingestion.ingest_partitions(partitions_dir=partitions_dir, **paths) > 0
+
+    ids = pd.concat([read_artifact(paths["train_path"]), read_artifact(paths["test_path"])])["id"]
+    assert sorted(ids.tolist()) == list(range(1, 101))
+    with open(paths["state_path"]) as f:
+        state = json.load(f)
+    assert len(state["partitions"]) == 2 and state["pending"] == []
@@ -0,0 +1,81 @@
+import pytest
+from src.hyperparameter_search import SuccessiveHalvingSearch
+
+
+@pytest.mark.parametrize("n_values, eta, n_rungs, last_rung", [((3, 3, 3), 3, 3, 3), ((5, 5, 5), 5, 3, 5), ((2,), 3, 1, 2), ((4, 7), 3, 4, 1)])
+def test_last_rung_gets_at_most_eta_configs(n_values, eta, n_rungs, last_rung):
+    param_grid = {f"p{idx}" : list(range(n)) for idx, n in enumerate(n_values)}
+    search = SuccessiveHalvingSearch(param_grid, eta=eta)
+    assert search.n_rungs == n_rungs
+    assert search.min_fraction == pytest.approx(eta ** -(n_rungs - 1))
+
+    ## same cut as fit(): the best len // eta (at least one) move on after each rung
+    survivors = len(search.configs)
+    for _ in range(n_rungs - 1):
+        survivors = max(survivors // eta, 1)
+    assert survivors == last_rung
+
+
+def test_fold_fits_stop_early_on_their_training_rows_not_the_scored_fold(monkeypatch):
+    import lightgbm as lgb
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(300, 3)), columns=["a", "b", "c"])
+    y = pd.Series((X["a"] > 0).astype(int))
+    train_idx, valid_idx = np.arange(200), np.arange(200, 300)
+
+    eval_rows = []
+    fit = lgb.LGBMClassifier.fit
+    def recording_fit(self, X_fit, y_fit, eval_set=None, **kwargs):
+        eval_rows.extend(eval_set[0][0].index)
+        return fit(self, X_fit, y_fit, eval_set=eval_set, **kwargs)
+    monkeypatch.setattr(lgb.LGBMClassifier, "fit", recording_fit)
+
+    search = SuccessiveHalvingSearch({"n_estimators" : [50]}, early_stopping_fraction=0.2)
+    search._fit_fold({"n_estimators" : 50}, X, y, train_idx, valid_idx, threads=1)
+
+    assert len(eval_rows) == 40
+    assert set(eval_rows) <= set(train_idx) and not set(eval_rows) & set(valid_idx)
+
+
+def test_shared_dataset_scores_match_separately_fitted_models():
+    import lightgbm as lgb
+    import numpy as np
+    import pandas as pd
+    from sklearn.metrics import accuracy_score
+    from sklearn.model_selection import StratifiedKFold
+    from src.hyperparameter_search import SharedDatasetGridSearch, expand_grid
+
+    rng = np.random.default_rng(1)
+    X = pd.DataFrame(rng.normal(size=(600, 4)), columns=["a", "b", "c", "d"])
+    y = pd.Series(((X["a"] + X["b"] * X["c"] + rng.normal(scale=0.5, size=600)) > 0).astype(int))
+    param_grid = {"n_estimators" : [5, 20, 40], "learning_rate" : [0.05, 0.2], "num_leaves" : [7]}
+
+    search = SharedDatasetGridSearch(param_grid, cv=3).fit(X, y)
+
+    ## every grid point fitted on its own: a fresh boosting run of exactly n_estimators rounds per fold,
+    ## binned like the search (bins of the whole split) so the trees can be compared one for one
+    full = lgb.Dataset(X, label=y, params={"verbose" : -1, "feature_pre_filter" : False}, free_raw_data=False).construct()
+    folds = list(StratifiedKFold(n_splits=3).split(X, y))
+    expected = {}
+    for params in expand_grid(param_grid):
+        n_trees = params.pop("n_estimators")
+        native_params = dict(params, objective="binary", verbose=-1, feature_pre_filter=False)
+        scores = []
+        for train_idx, valid_idx in folds:
+            booster = lgb.train(native_params, full.subset(sorted(train_idx)), num_boost_round=n_trees)
+            y_pred = (booster.predict(X.iloc[valid_idx]) > 0.5).astype(int)
+            scores.append(accuracy_score(y.iloc[valid_idx], y_pred))
+        expected[tuple(sorted(dict(params, n_estimators=n_trees).items()))] = float(np.mean(scores))
+
+    results = {tuple(sorted(result["params"].items())) : result["mean_accuracy"] for result in search.results}
+    assert results == expected
+    assert search.timings["boosting_runs"] == 2 * 3
+
+    ## plain LGBMClassifier fits bin each fold on its own, so they only agree approximately
+    for params in ({"n_estimators" : 20, "learning_rate" : 0.2, "num_leaves" : 7}, {"n_estimators" : 40, "learning_rate" : 0.05, "num_leaves" : 7}):
+        scores = [accuracy_score(y.iloc[valid_idx], lgb.LGBMClassifier(**params, verbose=-1).fit(X.iloc[train_idx], y.iloc[train_idx]).predict(X.iloc[valid_idx]))
+                  for train_idx, valid_idx in folds]
+        assert abs(results[tuple(sorted(params.items()))] - np.mean(scores)) < 0.03
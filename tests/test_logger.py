@@ -0,0 +1,38 @@
+import logging
+import logging.config
+from src.logger import BatchFileHandler
+
+
+def make_record(msg):
+    return logging.makeLogRecord({"name" : "test", "levelno" : logging.INFO, "levelname" : "INFO", "msg" : msg})
+
+
+def test_closed_handler_never_writes_into_a_reused_descriptor(tmp_path):
+    log_path = tmp_path / "app.log"
+    handler = BatchFileHandler(str(log_path))
+    handler.handle(make_record("before"))
+    handler.flush()
+
+    ## what mlflow's dictConfig does to every existing handler
+    handler.close()
+    with open(tmp_path / "train.csv", "w") as data:
+        data.write("id,rating\n")
+        handler.handle(make_record("after"))
+        handler.flush()
+
+    assert (tmp_path / "train.csv").read_text() == "id,rating\n"
+    assert log_path.read_text() == "before\nafter\n"
+    handler.close()
+
+
+def test_handler_survives_dict_config(tmp_path):
+    handler = BatchFileHandler(str(tmp_path / "app.log"))
+    handler.handle(make_record("before"))
+    handler.flush()
+
+    logging.config.dictConfig({"version" : 1, "disable_existing_loggers" : False})
+    handler.handle(make_record("after"))
+    handler.flush()
+
+    assert (tmp_path / "app.log").read_text() == "before\nafter\n"
+    handler.close()
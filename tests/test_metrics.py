@@ -0,0 +1,41 @@
+import pytest
+from src.metrics import MetricsRegistry
+
+## only used to check the exposition format against the reference parser
+text_string_to_metric_families = pytest.importorskip("prometheus_client.parser").text_string_to_metric_families
+
+
+def parse(text):
+    return {family.name : family for family in text_string_to_metric_families(text)}
+
+
+def test_counters_and_histograms_parse_as_typed_families():
+    registry = MetricsRegistry()
+    errors = registry.counter("airline_errors", "Requests that ended in an error", ["endpoint"])
+    latency = registry.histogram("airline_predict_latency_seconds", "Time spent in the model call", ["path"])
+    errors.labels("home").inc()
+    errors.labels("home").inc(2)
+    latency.labels("batch").observe(0.003)
+
+    families = parse(registry.render())
+
+    assert families["airline_errors"].type == "counter"
+    assert [(sample.name, sample.labels, sample.value) for sample in families["airline_errors"].samples] == [("airline_errors_total", {"endpoint" : "home"}, 3.0)]
+    histogram = families["airline_predict_latency_seconds"]
+    assert histogram.type == "histogram"
+    assert {sample.name for sample in histogram.samples} == {"airline_predict_latency_seconds_bucket", "airline_predict_latency_seconds_sum", "airline_predict_latency_seconds_count"}
+
+
+def test_metrics_endpoint_parses():
+    import application
+    client = application.app.test_client()
+    client.post("/predict/batch", json={"records" : []})
+
+    response = client.get("/metrics")
+    families = parse(response.get_data(as_text=True))
+
+    assert families["airline_errors"].type == "counter"
+    assert any(sample.labels == {"endpoint" : "predict_batch"} for sample in families["airline_errors"].samples)
+    assert families["airline_request_latency_seconds"].type == "histogram"
+    ## nothing left over as an untyped family next to the counters
+    assert all(family.type != "unknown" for family in families.values())
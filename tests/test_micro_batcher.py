@@ -0,0 +1,65 @@
+import os
+import threading
+import numpy as np
+import pytest
+from concurrent.futures import TimeoutError
+from src.custom_exception import CustomException
+from src.micro_batcher import MicroBatcher
+
+
+def row_sums(X):
+    return X.sum(axis=1)
+
+
+def test_scores_rows_in_order():
+    batcher = MicroBatcher(row_sums, max_batch_size=8, max_wait_ms=1)
+    assert [batcher.predict([i, 1.0], timeout=5) for i in range(5)] == [1.0, 2.0, 3.0, 4.0, 5.0]
+    batcher.stop()
+
+
+def test_failing_on_flush_does_not_stop_the_worker():
+    def on_flush(rows, seconds):
+        raise RuntimeError("metrics backend down")
+
+    batcher = MicroBatcher(row_sums, max_batch_size=4, max_wait_ms=1, on_flush=on_flush)
+    assert batcher.predict([1.0, 2.0], timeout=5) == 3.0
+    assert batcher.predict([3.0, 4.0], timeout=5) == 7.0
+    assert batcher.worker.is_alive()
+    batcher.stop()
+
+
+def test_child_process_gets_its_own_worker():
+    batcher = MicroBatcher(row_sums, max_batch_size=4, max_wait_ms=1)
+    ## started in the parent, like a warm-up request under gunicorn --preload
+    assert batcher.predict([1.0, 1.0], timeout=5) == 2.0
+
+    pid = os.fork()
+    if pid == 0:
+        try:
+            ok = batcher.predict([2.0, 2.0], timeout=5) == 4.0
+        except Exception:
+            ok = False
+        os._exit(0 if ok else 1)
+
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    batcher.stop()
+
+
+def test_short_result_fails_every_row_in_the_batch():
+    ## a model that drops the last row of each batch
+    batcher = MicroBatcher(lambda X : row_sums(X)[:-1], max_batch_size=4, max_wait_ms=50)
+    futures = [batcher.submit([i, 1.0]) for i in range(3)]
+    for future in futures:
+        with pytest.raises(CustomException, match="2 results for 3 rows"):
+            future.result(timeout=5)
+    batcher.stop()
+
+
+def test_predict_gives_up_after_the_default_timeout():
+    release = threading.Event()
+    batcher = MicroBatcher(lambda X : release.wait(5) and row_sums(X), max_batch_size=4, max_wait_ms=1, timeout=0.1)
+    with pytest.raises(TimeoutError):
+        batcher.predict([1.0, 2.0])
+    release.set()
+    batcher.stop()
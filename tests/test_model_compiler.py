@@ -0,0 +1,23 @@
+import numpy as np
+import lightgbm as lgb
+from src.model_compiler import CompiledTreeModel, verify_compiled_model
+
+
+def make_model(n_rows = 20000, seed = 0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_rows, 12))
+    X[rng.random(X.shape) < 0.05] = np.nan
+    y = (np.nan_to_num(X[:, 0]) + np.nan_to_num(X[:, 1]) * 0.5 > 0).astype(int)
+    model = lgb.LGBMClassifier(n_estimators=100, verbose=-1).fit(X, y)
+    return model, X
+
+
+def test_compiled_matches_lightgbm():
+    model, X = make_model()
+    compiled = CompiledTreeModel.from_lgbm(model)
+
+    assert np.array_equal(compiled.predict_raw(X), model.predict(X, raw_score=True))
+    assert np.allclose(compiled.predict_proba(X), model.predict_proba(X), rtol=1e-12, atol=1e-12)
+    assert np.array_equal(compiled.predict(X), model.predict(X))
+    verify_compiled_model(model, compiled, X)
+
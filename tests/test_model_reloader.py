@@ -0,0 +1,129 @@
+import os
+import joblib
+import numpy as np
+import pandas as pd
+import lightgbm as lgb
+import pytest
+from src.model_reloader import ModelReloader
+from utils.helpers import FEATURE_ORDER, file_checksum
+
+
+def train_model(seed, columns=FEATURE_ORDER):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.integers(0, 6, size=(200, len(columns))).astype(float), columns=columns)
+    y = (X.iloc[:, 0] + rng.normal(size=200) > 2.5).astype(int)
+    return lgb.LGBMClassifier(n_estimators=5, verbose=-1, random_state=seed).fit(X, y), X
+
+
+def write_model(path, model):
+    joblib.dump(model, path)
+    ## a new mtime even when two writes land in the same clock tick
+    os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 1_000_000))
+
+
+def write_canary(path, model, X, model_path, probabilities=None):
+    X = X.head(16).to_numpy(dtype="float64")
+    probabilities = model.predict_proba(X)[:, 1] if probabilities is None else probabilities
+    np.savez(path, X=X, probabilities=probabilities, model_checksum=np.array(file_checksum(model_path)))
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return {name : str(tmp_path / name) for name in ("model.pkl", "compiled.npz", "preprocessor.pkl", "canary.npz")}
+
+
+def make_reloader(paths, **kwargs):
+    return ModelReloader(paths["model.pkl"], paths["compiled.npz"], paths["preprocessor.pkl"], paths["canary.npz"], check_interval=None, **kwargs)
+
+
+def test_good_model_is_swapped_in(paths):
+    first, X = train_model(0)
+    write_model(paths["model.pkl"], first)
+    write_canary(paths["canary.npz"], first, X, paths["model.pkl"])
+    swaps = []
+    reloader = make_reloader(paths, on_swap=lambda previous, bundle : swaps.append((previous.checksum, bundle.checksum)))
+    old_checksum = reloader.bundle.checksum
+
+    second, X = train_model(1)
+    write_model(paths["model.pkl"], second)
+    write_canary(paths["canary.npz"], second, X, paths["model.pkl"])
+    bundle = reloader.reload()
+
+    assert bundle.checksum != old_checksum and reloader.bundle is bundle
+    assert swaps == [(old_checksum, bundle.checksum)]
+    assert reloader.reloads == 1 and reloader.failures == 0
+
+
+def test_model_failing_the_canary_is_rejected(paths):
+    first, X = train_model(0)
+    write_model(paths["model.pkl"], first)
+    reloader = make_reloader(paths)
+    current = reloader.bundle
+
+    second, X = train_model(1)
+    write_model(paths["model.pkl"], second)
+    write_canary(paths["canary.npz"], second, X, paths["model.pkl"], probabilities=np.full(16, 0.5))
+    with pytest.raises(Exception):
+        reloader.reload()
+
+    assert reloader.bundle is current
+    assert reloader.failures == 1 and "canary" in reloader.last_error
+
+
+def test_model_with_other_features_is_rejected(paths):
+    first, _ = train_model(0)
+    write_model(paths["model.pkl"], first)
+    reloader = make_reloader(paths)
+    current = reloader.bundle
+
+    ## same number of features, but not the columns serving builds rows from
+    other, _ = train_model(1, columns=["Gate location"] + FEATURE_ORDER[1:])
+    write_model(paths["model.pkl"], other)
+    with pytest.raises(Exception):
+        reloader.reload()
+
+    assert reloader.bundle is current
+    assert "serving feature order" in reloader.last_error
+
+
+def test_unstable_and_half_written_files_are_not_swapped_in(paths):
+    first, _ = train_model(0)
+    write_model(paths["model.pkl"], first)
+    reloader = make_reloader(paths)
+    current = reloader.bundle
+
+    ## a file still being copied: changed again before the second poll, so never loaded
+    with open(paths["model.pkl"], "r+b") as f:
+        f.truncate(100)
+    assert reloader.check() is False
+    with open(paths["model.pkl"], "ab") as f:
+        f.write(b"more")
+    assert reloader.check() is False
+    assert reloader.bundle is current and reloader.failures == 0
+
+    ## stable but broken: tried once, then left alone until the files change again
+    assert reloader.check() is False
+    assert reloader.bundle is current and reloader.failures == 1
+    assert reloader.check() is False
+    assert reloader.failures == 1
+
+    second, _ = train_model(1)
+    write_model(paths["model.pkl"], second)
+    assert reloader.check() is False
+    assert reloader.check() is True
+    assert reloader.bundle.checksum == file_checksum(paths["model.pkl"])
+
+
+def test_admin_reload_needs_loopback_or_token(monkeypatch):
+    import application
+    monkeypatch.setattr(application.reloader, "reload", lambda : application.reloader.bundle)
+    client = application.app.test_client()
+
+    monkeypatch.setitem(application.SERVING_CONFIG, "admin_token", None)
+    assert client.post("/admin/reload").status_code == 200
+    assert client.post("/admin/reload", environ_base={"REMOTE_ADDR" : "10.0.0.7"}).status_code == 403
+
+    monkeypatch.setitem(application.SERVING_CONFIG, "admin_token", "secret")
+    assert client.post("/admin/reload").status_code == 403
+    assert client.post("/admin/reload", headers={"X-Admin-Token" : "wrong"}).status_code == 403
+    assert client.post("/admin/reload", headers={"X-Admin-Token" : "secret"}, environ_base={"REMOTE_ADDR" : "10.0.0.7"}).status_code == 200
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.feature_selection import mutual_info_classif
+from src.mutual_info import mutual_info_ranking, data_fingerprint, load_cached_ranking, save_cached_ranking
+
+CONFIG = {"top_k" : 2, "sample_size" : None}
+
+
+def make_data(seed=0, n_rows=2000):
+    rng = np.random.default_rng(seed)
+    y = pd.Series(rng.integers(0, 2, size=n_rows), name="satisfaction")
+    X = pd.DataFrame({
+        ## rating that follows the label most of the time
+        "Online boarding" : np.where(rng.random(n_rows) < 0.7, y * 3 + 1, rng.integers(0, 6, size=n_rows)).astype("int8"),
+        "Class" : rng.integers(0, 3, size=n_rows).astype("int8"),
+        "Seat comfort" : rng.integers(0, 6, size=n_rows).astype("int8"),
+        ## continuous values are treated as categories too, as in discrete_features=True
+        "Delay Ratio" : np.round(rng.random(n_rows), 2),
+    })
+    return X, y
+
+
+def test_contingency_scores_match_sklearn_discrete_mutual_info():
+    X, y = make_data()
+    ranking = mutual_info_ranking(X, y, n_jobs=2).set_index("Feature")["Mutual Information"]
+    expected = mutual_info_classif(X, y, discrete_features=True)
+
+    np.testing.assert_allclose(ranking[X.columns].to_numpy(), expected, rtol=1e-10, atol=1e-12)
+    assert ranking.index[0] == "Online boarding"
+
+
+def test_cached_ranking_is_only_reused_for_the_same_data_and_config(tmp_path):
+    cache_path = str(tmp_path / "cache" / "mutual_info.json")
+    X, y = make_data()
+    df = X.assign(satisfaction=y)
+    fingerprint = data_fingerprint(df, CONFIG)
+    save_cached_ranking(cache_path, fingerprint, mutual_info_ranking(X, y))
+
+    assert load_cached_ranking(cache_path, data_fingerprint(df.copy(), CONFIG)) is not None
+
+    changed_value = df.copy()
+    changed_value.loc[0, "Seat comfort"] = (changed_value.loc[0, "Seat comfort"] + 1) % 6
+    changed_dtype = df.astype({"Class" : "int16"})
+    changed_rows = df.iloc[:-1]
+    for changed in (changed_value, changed_dtype, changed_rows):
+        assert data_fingerprint(changed, CONFIG) != fingerprint
+        assert load_cached_ranking(cache_path, data_fingerprint(changed, CONFIG)) is None
+
+    assert load_cached_ranking(cache_path, data_fingerprint(df, dict(CONFIG, top_k=3))) is None
@@ -0,0 +1,74 @@
+import os
+import pytest
+from src.prediction_cache import PredictionCache
+
+
+def row(value):
+    return [value] + [0.0] * 11
+
+
+@pytest.fixture
+def model_path(tmp_path):
+    path = tmp_path / "model.pkl"
+    path.write_bytes(b"model v1")
+    return str(path)
+
+
+def test_least_recently_used_entry_is_evicted_first(model_path):
+    cache = PredictionCache(model_path, max_entries=3)
+    keys = [cache.key(row(i)) for i in range(4)]
+    for idx in range(3):
+        cache.put(keys[idx], idx)
+
+    ## touching 0 makes 1 the least recently used
+    assert cache.get(keys[0]) == 0
+    cache.put(keys[3], 3)
+
+    assert cache.get(keys[1]) is None
+    assert [cache.get(key) for key in (keys[0], keys[2], keys[3])] == [0, 2, 3]
+    assert len(cache.entries) == 3
+
+
+def test_cache_stays_bounded_by_entry_count(model_path):
+    cache = PredictionCache(model_path, max_entries=50)
+    for i in range(1000):
+        cache.put(cache.key(row(i)), i)
+    assert len(cache.entries) == 50 and cache.stats()["evictions"] == 950
+    with pytest.raises(ValueError):
+        PredictionCache(model_path, max_entries=0)
+
+
+@pytest.mark.parametrize("change", ["mtime", "size"])
+def test_model_file_change_empties_the_cache(model_path, change):
+    cache = PredictionCache(model_path, check_interval=0)
+    key = cache.key(row(1))
+    cache.put(key, 1)
+    assert cache.get(key) == 1
+
+    if change == "mtime":
+        stat = os.stat(model_path)
+        os.utime(model_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    else:
+        ## same mtime, different size
+        stat = os.stat(model_path)
+        with open(model_path, "ab") as f:
+            f.write(b"!")
+        os.utime(model_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    assert cache.get(key) is None
+    assert cache.stats()["invalidations"] == 1 and cache.stats()["entries"] == 0
+
+
+def test_counters(model_path):
+    cache = PredictionCache(model_path, max_entries=2, check_interval=0)
+    keys = [cache.key(row(i)) for i in range(3)]
+    cache.get(keys[0])
+    for idx, key in enumerate(keys):
+        cache.put(key, idx)
+    cache.get(keys[2])
+    cache.get(keys[1])
+    cache.get(keys[0])
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["invalidations"]) == (2, 2, 1, 0)
+    assert stats["hit_rate"] == 0.5 and stats["entries"] == 2
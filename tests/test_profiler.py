@@ -0,0 +1,27 @@
+import threading
+from src.profiler import PipelineProfiler
+
+
+def test_overlapping_stages_on_two_threads_share_their_peak():
+    profiler = PipelineProfiler()
+    started, release = threading.Event(), threading.Event()
+
+    def background_save():
+        with profiler.stage("save"):
+            started.set()
+            release.wait(5)
+
+    with profiler.stage("alone") as alone:
+        pass
+
+    with profiler.stage("train") as train:
+        thread = threading.Thread(target=background_save)
+        thread.start()
+        started.wait(5)
+        release.set()
+        thread.join()
+
+    save = next(record for record in profiler.records if record["stage"] == "save")
+    assert alone["peak_rss_scope"] in ("stage", "process")
+    assert train["peak_rss_scope"] == "shared" and save["peak_rss_scope"] == "shared"
+    assert not profiler._open and "_thread" not in train
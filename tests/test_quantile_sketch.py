@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from src.quantile_sketch import QuantileSketch
+
+QS = [0.01, 0.25, 0.5, 0.75, 0.99]
+
+
+def merged_sketch(values, n_chunks, epsilon):
+    ## one sketch per chunk merged together, like DataProcessor.sketch_quantiles with a process pool
+    sketch = QuantileSketch(epsilon)
+    for chunk in np.array_split(values, n_chunks):
+        sketch.merge(QuantileSketch(epsilon).update(chunk))
+    return sketch
+
+
+def rank_range(values, answer):
+    ## fraction of values below / at most the answer: any q in between is exactly answered
+    ordered = np.sort(values)
+    return np.searchsorted(ordered, answer, side="left") / len(values), np.searchsorted(ordered, answer, side="right") / len(values)
+
+
+@pytest.mark.parametrize("epsilon", [0.01, 0.005])
+@pytest.mark.parametrize("kind", ["continuous", "integer"])
+def test_merged_chunks_stay_within_the_rank_error(epsilon, kind):
+    rng = np.random.default_rng(7)
+    if kind == "continuous":
+        values = rng.lognormal(3, 1, size=200_000)
+    else:
+        values = rng.integers(0, 180, size=200_000).astype(np.float64)
+    values[rng.random(values.size) < 0.01] = np.nan
+    present = values[~np.isnan(values)]
+
+    answers = merged_sketch(values, n_chunks=13, epsilon=epsilon).quantiles(QS)
+
+    for q, answer in zip(QS, answers):
+        ## between numpy's quantiles epsilon either side of q ...
+        assert np.quantile(present, max(q - epsilon, 0), method="lower") <= answer <= np.quantile(present, min(q + epsilon, 1), method="higher")
+        ## ... which is the same as a rank within epsilon of q
+        low, high = rank_range(present, answer)
+        assert low - epsilon <= q <= high + epsilon
+
+
+def test_integer_median_is_a_value_not_an_interpolation():
+    sketch = QuantileSketch().update([3, 4, 3, 4])
+    assert sketch.quantile(0.5) in (3.0, 4.0)
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+from config.schema_config import RAW_DTYPES, PROCESSED_DTYPES, ENGINEERED_DTYPES
+from src.data_processing import DataProcessor, PROCESSING_COLUMNS
+from utils.helpers import TRAINING_COLUMNS, ChunkedArtifactWriter, apply_dtypes, read_artifact, write_artifact
+
+
+def raw_frame():
+    ## Checkin service quartiles are 3 and 4, so the lower clip bound is 1.5
+    checkin = [1, 3, 3, 3, 4, 4, 4, 4]
+    return pd.DataFrame({
+        "MyUnknownColumn" : np.arange(8, dtype="int32"),
+        "id" : np.arange(8, dtype="int32"),
+        "Checkin service" : np.array(checkin, dtype="int8"),
+        "Flight Distance" : np.linspace(100, 800, 8).astype("float32"),
+        "Departure Delay in Minutes" : np.array([0, 5, 0, 10, 0, 0, 3, 0], dtype="float32"),
+        "Arrival Delay in Minutes" : np.array([0, 4, np.nan, 12, 0, 1, 2, 0], dtype="float32"),
+    })
+
+
+def test_fractional_clip_bound_survives_the_dtype_plans():
+    processor = DataProcessor()
+    processed = processor.run(raw_frame(), save=False)
+
+    assert processor.preprocessor.clip_bounds["Checkin service"][0] == 1.5
+    assert processed["Checkin service"].min() == 1.5
+    assert apply_dtypes(processed, ENGINEERED_DTYPES)["Checkin service"].min() == 1.5
+
+
+@pytest.mark.parametrize("extension", ["csv", "parquet", "feather"])
+def test_chunked_writer_uses_the_planned_schema(tmp_path, extension):
+    path = str(tmp_path / f"processed.{extension}")
+    ## the first chunk only holds whole ratings, so its inferred type would be int8
+    writer = ChunkedArtifactWriter(path, dtypes=PROCESSED_DTYPES)
+    writer.write(pd.DataFrame({"Checkin service" : np.array([3, 4], dtype="int8")}))
+    writer.write(pd.DataFrame({"Checkin service" : [1.5, 5.0]}))
+    writer.close()
+
+    assert read_artifact(path, dtypes=PROCESSED_DTYPES)["Checkin service"].tolist() == [3.0, 4.0, 1.5, 5.0]
+
+
+def planned_frame(dtypes, n_rows=6):
+    rng = np.random.default_rng(0)
+    columns = {}
+    for column, dtype in dtypes.items():
+        if dtype == "category":
+            columns[column] = pd.Categorical(rng.choice(["a", "b"], size=n_rows))
+        else:
+            columns[column] = rng.integers(0, 5, size=n_rows).astype(dtype)
+    return pd.DataFrame(columns)
+
+
+@pytest.mark.parametrize("extension", ["parquet", "feather"])
+@pytest.mark.parametrize("dtypes, columns", [(RAW_DTYPES, PROCESSING_COLUMNS), (PROCESSED_DTYPES, PROCESSING_COLUMNS),
+                                             (ENGINEERED_DTYPES, TRAINING_COLUMNS)])
+def test_columnar_artifacts_keep_the_planned_dtypes(tmp_path, extension, dtypes, columns):
+    path = str(tmp_path / f"data.{extension}")
+    write_artifact(planned_frame(dtypes), path)
+
+    ## no dtype plan on the way back in: the file itself has to carry the types
+    df = read_artifact(path, columns=columns)
+
+    assert df.columns.tolist() == columns
+    assert {column : str(dtype) for column, dtype in df.dtypes.items()} == {column : dtypes[column] for column in columns}
+
+
+def test_ages_outside_the_bins_still_get_an_int8_age_group():
+    from src.feature_engineering import FeaturEngineering
+    from src.preprocessor import FittedPreprocessor
+
+    engineer = FeaturEngineering(preprocessor=FittedPreprocessor())
+    engineer.df = pd.DataFrame({"Age" : np.array([0, 7, 25, 40, 85, 100, 120], dtype="int8")})
+    engineer.bin_age()
+
+    assert engineer.df["Age Group"].tolist() == ["Child", "Child", "Youngster", "Adult", "Senior", "Senior", "Senior"]
+    engineer.preprocessor.encoder.fit(engineer.df, ["Age Group"])
+    encoded = apply_dtypes(engineer.preprocessor.encoder.transform(engineer.df), ENGINEERED_DTYPES)
+    assert str(encoded["Age Group"].dtype) == "int8"
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from sklearn.svm import SVC
+from src.selection_policy import pareto_front, select_model
+
+POLICY = {"metric" : "f1_score", "max_p99_ms" : 1.0}
+
+
+def candidate(f1_score, latency_p99_ms, predict_proba=True):
+    return {"f1_score" : f1_score, "latency_p99_ms" : latency_p99_ms, "predict_proba" : predict_proba}
+
+
+def test_svc_wins_when_it_gives_probabilities():
+    X, y = np.random.default_rng(0).normal(size=(60, 3)), np.tile([0, 1], 30)
+    svc = SVC(probability=True).fit(X, y)
+    results = {
+        "Support Vector Classifier" : candidate(0.95, 0.4, hasattr(svc, "predict_proba")),
+        "LightGBM" : candidate(0.93, 0.3),
+        "Logistic Regression" : candidate(0.80, 0.05),
+        "XGBoost" : {"error" : "timed out after 600s"},
+    }
+
+    selected, front = select_model(results, POLICY)
+
+    assert selected == "Support Vector Classifier"
+    assert set(front) == {"Support Vector Classifier", "LightGBM", "Logistic Regression"}
+    ## what save_model's canary batch and /predict/batch call on the saved model
+    assert svc.predict_proba(X[:5]).shape == (5, 2)
+
+
+def test_candidates_without_probabilities_are_never_selected():
+    results = {
+        "Support Vector Classifier" : candidate(0.95, 0.4, hasattr(SVC(), "predict_proba")),
+        "LightGBM" : candidate(0.93, 0.3),
+    }
+    assert pareto_front(results, "f1_score") == ["LightGBM"]
+    assert select_model(results, POLICY)[0] == "LightGBM"
+
+    with pytest.raises(ValueError):
+        select_model({"Support Vector Classifier" : results["Support Vector Classifier"]}, POLICY)
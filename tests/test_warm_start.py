@@ -0,0 +1,70 @@
+import joblib
+import mlflow
+import numpy as np
+import pandas as pd
+import lightgbm as lgb
+import pytest
+from src.model_training import ModelTraining
+from utils.helpers import FEATURE_ORDER, file_checksum, serving_feature_names
+
+COLUMNS = ["f0", "f1", "f2"]
+
+
+@pytest.fixture(autouse=True)
+def tracking_uri(tmp_path):
+    previous = mlflow.get_tracking_uri()
+    mlflow.set_tracking_uri(f"file://{tmp_path}/mlruns")
+    yield
+    mlflow.set_tracking_uri(previous)
+
+
+def make_data(seed, n_rows, flip=False):
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame(rng.normal(size=(n_rows, len(COLUMNS))), columns=COLUMNS)
+    data["satisfaction"] = (data["f0"] > 0).astype(int)
+    if flip:
+        data["satisfaction"] = 1 - data["satisfaction"]
+    return data
+
+
+def make_trainer(tmp_path):
+    model_path = str(tmp_path / "model" / "trained_model.pkl")
+    (tmp_path / "model").mkdir()
+    initial = make_data(0, 500)
+    model = lgb.LGBMClassifier(n_estimators=20, verbose=-1).fit(initial[COLUMNS], initial["satisfaction"])
+    joblib.dump(model, model_path)
+    return ModelTraining(data_path=None, params_path=None, model_save_path=model_path, compiled_model_path=str(tmp_path / "model" / "compiled.npz"),
+                         preprocessor_path=str(tmp_path / "missing.pkl"))
+
+
+def test_warm_start_replaces_the_model_when_the_holdout_holds(tmp_path):
+    trainer = make_trainer(tmp_path)
+    before = file_checksum(trainer.model_save_path)
+
+    replaced = trainer.run_warm_start(make_data(1, 300), make_data(2, 200), {"method" : "continue", "n_estimators" : 10, "tolerance" : 0.05})
+
+    assert replaced is True
+    assert file_checksum(trainer.model_save_path) != before
+    assert joblib.load(trainer.model_save_path).booster_.num_trees() == 30
+    assert (tmp_path / "model" / "compiled.npz").exists()
+
+
+def test_warm_start_keeps_the_previous_model_when_the_holdout_gets_worse(tmp_path):
+    trainer = make_trainer(tmp_path)
+    before = file_checksum(trainer.model_save_path)
+
+    ## new rows with the labels flipped pull the model away from the hold-out
+    replaced = trainer.run_warm_start(make_data(1, 500, flip=True), make_data(2, 200), {"method" : "continue", "n_estimators" : 50})
+
+    assert replaced is False
+    assert file_checksum(trainer.model_save_path) == before
+    assert not (tmp_path / "model" / "compiled.npz").exists()
+
+
+def test_warm_start_columns_of_a_model_without_feature_names_in():
+    from main import warm_start_columns
+    ## the committed model was pickled by an older LightGBM and records no feature_names_in_
+    assert getattr(joblib.load("artifacts/model/trained_model.pkl"), "feature_names_in_", None) is None
+    columns = warm_start_columns("artifacts/model/trained_model.pkl")
+    assert columns[-1] == "satisfaction"
+    assert serving_feature_names(columns[:-1]) == FEATURE_ORDER
@@ -1,12 +1,284 @@
+import os
+import sys
+import hashlib
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pandas as pd 
-from sklearn.preprocessing import LabelEncoder
 
-def label_encode(df, columns):
-    le = LabelEncoder()
-    label_mapping = {}
+## Raw input fields accepted by the serving app (same names as the form in templates/index.html)
+DELAY_FIELDS = ["Departure Delay", "Arrival Delay"]
+DISTANCE_FIELD = "Flight Distance"
+INTEGER_FIELDS = [
+    "Online Boarding",
+    "Inflight wifi service",
+    "Class",
+    "Type of Travel",
+    "Inflight entertainment",
+    "Seat comfort",
+    "Leg room service",
+    "On-board service",
+    "Cleanliness",
+    "Ease of Online Booking",
+]
+INPUT_FIELDS = DELAY_FIELDS + [DISTANCE_FIELD] + INTEGER_FIELDS
 
-    for col in columns:
-        df[col] = le.fit_transform(df[col])
-        label_mapping[col] = dict(zip(le.classes_, le.transform(le.classes_)))
+## Column order the trained model expects (same order as final_df.csv without the target)
+FEATURE_ORDER = [
+    "Online Boarding",
+    "Delay Ratio",
+    "Inflight wifi service",
+    "Class",
+    "Type of Travel",
+    "Inflight entertainment",
+    "Flight Distance",
+    "Seat comfort",
+    "Leg room service",
+    "On-board service",
+    "Cleanliness",
+    "Ease of Online Booking",
+]
 
-    return df, label_mapping
\ No newline at end of file
+## raw dataset column names that differ from the serving field names
+RAW_COLUMN_MAPPING = {
+    "Departure Delay in Minutes" : "Departure Delay",
+    "Arrival Delay in Minutes" : "Arrival Delay",
+    "Online boarding" : "Online Boarding",
+    "Ease of Online booking" : "Ease of Online Booking",
+}
+
+## what the trainers read from the engineered data: the serving features under their dataset names, plus the target
+TRAINING_COLUMNS = [{serving : raw for raw, serving in RAW_COLUMN_MAPPING.items()}.get(name, name) for name in FEATURE_ORDER] + ["satisfaction"]
+
+## codes the categorical encoder gives the raw categories (sorted alphabetically)
+CATEGORY_CODES = {
+    "Class" : {"Business" : 0, "Eco" : 1, "Eco Plus" : 2},
+    "Type of Travel" : {"Business travel" : 0, "Personal Travel" : 1},
+}
+
+def model_feature_names(model):
+    ## input column names of a fitted model: feature_names_in_ when sklearn recorded them (missing or None in models
+    ## pickled by older LightGBM versions, like the committed one), otherwise the booster's names; None if there are none
+    names = getattr(model, "feature_names_in_", None)
+    if names is None and hasattr(model, "booster_"):
+        names = model.booster_.feature_name()
+    return list(names) if names is not None else None
+
+def serving_feature_names(names):
+    ## model column names (raw dataset names, spaces possibly replaced by underscores) -> serving field names
+    names = [name.replace("_", " ") for name in names]
+    return [RAW_COLUMN_MAPPING.get(name, name) for name in names]
+
+def records_to_columns(records):
+    ## turn a list of {field: value} records into {field: list of values}, keeping input order
+    return {field: [record[field] for record in records] for field in INPUT_FIELDS}
+
+def frame_to_columns(df, encode_categories=True):
+    ## accept either raw dataset columns or serving field names; categorical text is mapped to its code
+    ## (pass encode_categories=False when a fitted preprocessor does the encoding)
+    df = df.rename(columns=RAW_COLUMN_MAPPING)
+    columns = {}
+    for field in INPUT_FIELDS:
+        values = df[field]
+        if encode_categories and field in CATEGORY_CODES and not pd.api.types.is_numeric_dtype(values):
+            values = values.map(CATEGORY_CODES[field])
+            if values.isna().any():
+                raise ValueError(f"unknown category in {field}")
+        columns[field] = values.to_numpy()
+    return columns
+
+def build_feature_row(values):
+    ## values is {field: raw value} for one passenger; returns the 12 model features as a python list
+    departure_delay = float(values["Departure Delay"])
+    arrival_delay = float(values["Arrival Delay"])
+    flight_distance = float(values[DISTANCE_FIELD])
+
+    row = []
+    for field in FEATURE_ORDER:
+        if field == "Delay Ratio":
+            row.append((departure_delay + arrival_delay) / (flight_distance + 1))
+        elif field == DISTANCE_FIELD:
+            row.append(flight_distance)
+        elif field in CATEGORY_CODES:
+            ## NaN for a category the encoder has not seen, the model sends it down its missing-value branch
+            code = float(values[field])
+            row.append(code if code != code else int(code))
+        else:
+            row.append(int(values[field]))
+    return row
+
+def build_feature_matrix(columns):
+    ## columns is {field: array-like of raw values}; returns a contiguous (n_rows, 12) float64 matrix
+    departure_delay = np.asarray(columns["Departure Delay"], dtype=np.float64)
+    arrival_delay = np.asarray(columns["Arrival Delay"], dtype=np.float64)
+    flight_distance = np.asarray(columns[DISTANCE_FIELD], dtype=np.float64)
+
+    n_rows = flight_distance.shape[0]
+    X = np.empty((n_rows, len(FEATURE_ORDER)), dtype=np.float64)
+
+    for idx, field in enumerate(FEATURE_ORDER):
+        if field == "Delay Ratio":
+            np.divide(departure_delay + arrival_delay, flight_distance + 1, out=X[:, idx])
+        elif field == DISTANCE_FIELD:
+            X[:, idx] = flight_distance
+        else:
+            values = np.asarray(columns[field], dtype=np.float64)
+            ## unseen categories arrive as NaN and are left to the model's missing-value branch
+            known = ~np.isnan(values) if field in CATEGORY_CODES else slice(None)
+            if not np.array_equal(values[known], np.trunc(values[known])):
+                raise ValueError(f"{field} must contain integer values")
+            X[:, idx] = values
+
+    return X
+
+def file_checksum(path, chunk_size=1 << 20):
+    ## sha256 of a file's bytes, used to tie derived artifacts to the model they came from
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+@contextmanager
+def atomic_write(path):
+    ## yields a temporary path next to `path`; once the block finishes it replaces `path` with one rename,
+    ## so a reader (e.g. the serving app's model watcher) sees the old file or the new one, never half of it
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    try:
+        yield tmp_path
+        with open(tmp_path, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def read_artifact(path, columns=None, memory_map=True, dtypes=None):
+    ## read a pipeline artifact by extension; columns limits what is parsed, parquet/feather are memory-mapped
+    ## dtypes ({column: dtype}, see config/schema_config.py) is applied to the columns that are present
+    if path.endswith(".parquet"):
+        df = pd.read_parquet(path, columns=columns, memory_map=memory_map)
+    elif path.endswith(".feather") or path.endswith(".arrow"):
+        import pyarrow.feather as feather
+        df = feather.read_table(path, columns=columns, memory_map=memory_map).to_pandas()
+    else:
+        return pd.read_csv(path, usecols=columns, dtype=dtypes)
+    return apply_dtypes(df, dtypes)
+
+def apply_dtypes(df, dtypes):
+    if not dtypes:
+        return df
+    casts = {column : dtype for column, dtype in dtypes.items() if column in df.columns and str(df[column].dtype) != dtype}
+    return df.astype(casts) if casts else df
+
+def memory_footprint(df):
+    ## (bytes used now, estimated bytes with pandas' default int64/float64/object inference)
+    used = int(df.memory_usage(deep=True, index=False).sum())
+    default = 0
+    for column in df.columns:
+        values = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            ## object column: one pointer per row plus one python string per row
+            counts = values.value_counts(sort=False)
+            default += 8 * len(values) + sum(sys.getsizeof(category) * count for category, count in counts.items())
+        elif values.dtype == object:
+            default += int(values.memory_usage(deep=True, index=False))
+        else:
+            default += 8 * len(values)
+    return used, default
+
+def log_memory_footprint(logger, df, label):
+    used, default = memory_footprint(df)
+    logger.info(f"{label} memory : {used / 2**20:.2f} MB ({default / 2**20:.2f} MB with default dtypes, {default / max(used, 1):.1f}x)")
+
+def write_artifact(df, path):
+    ## write a pipeline artifact by extension, without the index
+    if path.endswith(".parquet"):
+        df.to_parquet(path, index=False)
+    elif path.endswith(".feather") or path.endswith(".arrow"):
+        df.reset_index(drop=True).to_feather(path)
+    else:
+        df.to_csv(path, index=False)
+
+def iter_artifact_chunks(path, chunk_size, columns=None, dtypes=None):
+    ## yield DataFrames of at most chunk_size rows without loading the whole file
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=columns):
+            yield apply_dtypes(batch.to_pandas(), dtypes)
+    elif path.endswith(".feather") or path.endswith(".arrow"):
+        import pyarrow.feather as feather
+        table = feather.read_table(path, columns=columns, memory_map=True)
+        for start in range(0, table.num_rows, chunk_size):
+            yield apply_dtypes(table.slice(start, chunk_size).to_pandas(), dtypes)
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size, usecols=columns, dtype=dtypes)
+
+def arrow_schema(df, dtypes):
+    ## arrow schema for df's columns taken from a dtype plan (config/schema_config.py), not from the values;
+    ## columns outside the plan keep the type arrow infers for them
+    import pyarrow as pa
+    inferred = pa.Schema.from_pandas(df, preserve_index=False)
+    fields = []
+    for field in inferred:
+        dtype = dtypes.get(field.name)
+        if dtype is None or dtype == "category":
+            fields.append(field)
+        else:
+            fields.append(pa.field(field.name, pa.from_numpy_dtype(np.dtype(dtype))))
+    return pa.schema(fields)
+
+class ChunkedArtifactWriter:
+    ## appends DataFrame chunks to a csv/parquet/feather file; call close() when done
+    ## dtypes ({column: dtype}) is applied to every chunk and fixes the file schema, so a chunk that
+    ## happens to hold only whole numbers cannot decide the type of a column
+
+    def __init__(self, path, dtypes=None):
+        self.path = path
+        self.dtypes = dtypes
+        self.schema = None
+        self.writer = None
+        self.rows = 0
+
+    def write(self, df):
+        df = apply_dtypes(df, self.dtypes)
+        if self.path.endswith(".csv"):
+            df.to_csv(self.path, mode="w" if self.rows == 0 else "a", header=self.rows == 0, index=False)
+        else:
+            import pyarrow as pa
+            if self.writer is None:
+                self.schema = arrow_schema(df, self.dtypes) if self.dtypes else pa.Schema.from_pandas(df, preserve_index=False)
+                if self.path.endswith(".parquet"):
+                    import pyarrow.parquet as pq
+                    self.writer = pq.ParquetWriter(self.path, self.schema)
+                else:
+                    import pyarrow.ipc as ipc
+                    self.writer = ipc.new_file(self.path, self.schema)
+            table = pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
+            self.writer.write_table(table)
+        self.rows += len(df)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+class BackgroundWriter:
+    ## runs artifact writes on one background thread so the pipeline keeps going; call wait() before exiting
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="artifact-writer")
+        self.futures = []
+
+    def submit(self, fn, *args):
+        self.futures.append(self.executor.submit(fn, *args))
+
+    def wait(self):
+        ## re-raises the first write error, if any
+        try:
+            for future in self.futures:
+                future.result()
+        finally:
+            self.futures = []
+            self.executor.shutdown(wait=True)